@@ -0,0 +1,79 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 4096))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", 3600))
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation."""
+    return _SPACE_RE.sub(" ", question.lower()).strip().rstrip("?.! ")
+
+
+class AnswerCache:
+    """Bounded LRU of /ask answers with a TTL and per-case invalidation.
+
+    Keys carry the case's generation number, so invalidating a case bumps
+    its generation and drops its entries in one step under the lock; an
+    answer computed against the old database can never be served again,
+    even if it is stored after the invalidation.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evicted": 0, "invalidated": 0}
+
+    def key(self, case_id, question, route):
+        intent, entities = route
+        with self._lock:
+            generation = self._generations.get(case_id, 0)
+        return (case_id, generation, normalize_question(question), intent, tuple(sorted(entities.items())))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            stored, answer = entry
+            if time.monotonic() - stored > self.ttl:
+                del self._entries[key]
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return answer
+
+    def put(self, key, answer):
+        with self._lock:
+            if key[1] != self._generations.get(key[0], 0):
+                return
+            self._entries[key] = (time.monotonic(), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evicted"] += 1
+
+    def invalidate(self, case_id):
+        with self._lock:
+            self._generations[case_id] = self._generations.get(case_id, 0) + 1
+            stale = [k for k in self._entries if k[0] == case_id]
+            for k in stale:
+                del self._entries[k]
+            self.counters["invalidated"] += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return dict(self.counters, entries=len(self._entries), max_entries=self.max_entries,
+                        ttl=self.ttl, hit_rate=round(self.counters["hits"] / lookups, 3) if lookups else None)
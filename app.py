@@ -1,98 +1,113 @@
 import os
+import queue
 import sqlite3
+import tempfile
+import time
 import traceback
-import re
+import threading
 import csv
-from flask import Flask, request, jsonify, render_template, Response
+import json
+from urllib.parse import quote, urlencode
+from flask import Flask, g, request, jsonify, render_template, Response
+from markupsafe import escape
 from werkzeug.utils import secure_filename
-from win32com.client import Dispatch
-import pythoncom
+from answer_cache import AnswerCache
+from case_diff import DIFF_EXAMPLES, diff_cases
+from case_store import CaseStore, save_hashed
+from exports import EXPORT_FORMATS, check_format, gzip_stream, iter_table, zip_stream
+from case_stats import stats_for
+import column_store
+from ingest import CASE_SEARCH
+from intents import answer_question, case_index, route_question
+from jobs import JobRegistry, TERMINAL_STATES
+from latency import LatencyWindow
+import metrics
+from metrics import counted, timed, timed_chunks
+from llm_engine import LLM_BACKEND, InferenceEngine, case_context, open_backend
+from retrieval import retrieval_context
+from simauto_pool import SimAutoPool
+from tables import case_tables, count_query, fetch_page, iter_page, page_query, table_columns
 
 app = Flask(__name__)
 UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-def init_db():
-    conn = sqlite3.connect('caseinfo.db')
-    c = conn.cursor()
-    c.execute("PRAGMA writable_schema = 1;")
-    c.execute("DELETE FROM sqlite_master WHERE type IN ('table','index','trigger');")
-    c.execute("PRAGMA writable_schema = 0;")
-    conn.commit()
-    conn.close()
-
-def ensure_text(x):
-    return "" if x is None else str(x)
-
-def transpose_simauto(data, fields):
-    if not data:
-        return []
-    column_major = (
-        len(data) == len(fields) and
-        all(hasattr(col, "__iter__") and not isinstance(col, (str, bytes)) for col in data)
-    )
-    if column_major:
-        n_elems = min(len(col) for col in data) if data else 0
-        rows = []
-        for i in range(n_elems):
-            row = [data[f_idx][i] if i < len(data[f_idx]) else None for f_idx in range(len(fields))]
-            rows.append(row)
-        return rows
-    else:
-        return [r[:len(fields)] for r in data]
+store = CaseStore()
+jobs = JobRegistry()
+answers = AnswerCache()
+ask_latency = LatencyWindow()
+pool = None
+pool_lock = threading.Lock()
+engine = None
+engine_lock = threading.Lock()
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 120))
+STREAM_KEEPALIVE = 15
 
-def is_valid_row(obj, fields, row):
-    try:
-        if obj == "Bus":
-            return str(row[0]).strip().isdigit() and len(str(row[1]).strip()) > 0
-        elif obj == "Gen":
-            return str(row[0]).strip().isdigit() and len(str(row[1]).strip()) > 0
-        elif obj == "Load":
-            return str(row[0]).strip().isdigit() and len(str(row[1]).strip()) > 0
-        elif obj == "Branch":
-            return str(row[0]).strip().isdigit() and str(row[1]).strip().isdigit() and len(str(row[2]).strip()) > 0
-        else:
-            return True
-    except Exception:
-        return False
-
-def extract_and_store_case_data(pw):
-    conn = sqlite3.connect("caseinfo.db")
-    c = conn.cursor()
-    schema = {
-        "Bus":    ["BusNum", "BusName", "NomKV",     "AreaNum", "ZoneNum"],
-        "Gen":    ["BusNum", "GenID",   "GenMW",     "GenMvar", "Status"],
-        "Load":   ["BusNum", "LoadID",  "LoadMW",    "LoadMvar","Status"],
-        "Branch": ["BusNum", "BusNum:1","LineCircuit","MW",     "Mvar",   "Status"],
-    }
-
-    for obj, fields in schema.items():
-        try:
-            print(f"Extracting {obj} with fields: {fields}")
-            result, data = pw.GetParametersMultipleElement(obj, fields, "")
-            if result != "":
-                print(f"Could not get {obj} data: {result}")
-                continue
-            col_defs = ", ".join([f'"{f}" TEXT' for f in fields])
-            c.execute(f'CREATE TABLE IF NOT EXISTS "{obj}" ({col_defs})')
-            rows = transpose_simauto(data, fields)
-            placeholders = ", ".join(["?"] * len(fields))
-            insert_sql = f'INSERT INTO "{obj}" VALUES ({placeholders})'
-            inserted = 0
-            for row in rows:
-                if not is_valid_row(obj, fields, row):
-                    continue
-                clean_row = [ensure_text(x) for x in row[:len(fields)]]
-                if len(clean_row) == len(fields):
-                    c.execute(insert_sql, clean_row)
-                    inserted += 1
-            print(f"Inserted {inserted} {obj} rows")
-        except Exception as e:
-            print(f"Error extracting {obj}: {e}")
-            traceback.print_exc()
-    conn.commit()
-    conn.close()
+def get_pool():
+    # Created lazily so the worker processes are not spawned at import time.
+    global pool
+    with pool_lock:
+        if pool is None:
+            pool = SimAutoPool(backend=os.environ.get("SIMAUTO_BACKEND", "simauto"))
+    return pool
+
+def get_engine():
+    # None when no model is configured (LLM_BACKEND=none); loaded on first use.
+    global engine
+    if LLM_BACKEND == "none":
+        return None
+    with engine_lock:
+        if engine is None:
+            engine = InferenceEngine(open_backend(LLM_BACKEND))
+    return engine
+
+# ----------------------
+# Request metrics
+# ----------------------
+# Every request is counted and timed until its (possibly streamed) body is
+# closed; handlers time their own stages with metrics.timed. See /metrics
+# and /metrics/trace.
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    metrics.start_trace(method=request.method, path=request.full_path.rstrip("?"))
+
+@app.after_request
+def finish_request_metrics(response):
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    method, status, start = request.method, response.status_code, g.metrics_start
+    metrics.inc("pw_http_requests_total", endpoint=endpoint, method=method, status=status)
+    spans = metrics.current_spans()
+    if spans:
+        response.headers["Server-Timing"] = ", ".join(
+            f"{s.get('stage', s['name'])};dur={s['seconds'] * 1000:.2f}" for s in spans)
+
+    def on_close():
+        metrics.REGISTRY.observe("pw_http_request_seconds", time.perf_counter() - start,
+                                 endpoint=endpoint, method=method)
+        metrics.end_trace(endpoint=endpoint, status=status)
+    response.call_on_close(on_close)
+    return response
+
+def collect_app_metrics():
+    yield "pw_answer_cache_entries", "gauge", {}, answers.stats()["entries"]
+    if pool is not None:
+        status = pool.status()
+        for name in ("workers", "busy", "pending"):
+            yield f"pw_pool_{name}", "gauge", {}, status[name]
+        yield "pw_pool_restarts_total", "counter", {}, status["restarts"]
+
+metrics.REGISTRY.add_collector(collect_app_metrics)
+
+def request_case_id():
+    case_id = request.args.get("case_id")
+    if case_id is None and request.is_json:
+        case_id = (request.get_json(silent=True) or {}).get("case_id")
+    return case_id or store.latest()
+
+def case_db_path():
+    return store.resolve(request_case_id())
 
 @app.route('/')
 def index():
@@ -100,137 +115,462 @@ def index():
 
 @app.route('/upload', methods=['POST'])
 def upload():
-    pythoncom.CoInitialize()
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
     file = request.files['file']
     if file.filename == '':
         return jsonify({'error': 'No selected file'}), 400
     filename = secure_filename(file.filename)
-    pwb_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(pwb_path)
-    print(f"Trying to open case: {pwb_path}")
+    # Each upload streams to its own temp file, so concurrent uploads with the same
+    # name can't overwrite each other; it is only published under its content hash.
+    fd, tmp_path = tempfile.mkstemp(suffix=".pwb", dir=app.config['UPLOAD_FOLDER'])
+    os.close(fd)
+    try:
+        case_id = save_hashed(file.stream, tmp_path)
+    except Exception:
+        remove_upload(tmp_path)
+        raise
+    if store.has(case_id):
+        remove_upload(tmp_path)
+        store.touch(case_id)
+        print(f"Case {case_id} already stored, skipping extraction")
+        job = jobs.create(case_id, filename)
+        jobs.finish(job.job_id, cached=True)
+        return jsonify({"message": f"Case already loaded: {filename}", "job_id": job.job_id,
+                        "case_id": case_id, "cached": True}), 200
+    # A revision of a stored case (same file name, or an explicit base_case_id)
+    # is loaded on top of a copy of that case, writing only the rows that changed.
+    base_case_id = request.form.get("base_case_id") or store.latest_version(filename)
+    if base_case_id and not store.has(base_case_id):
+        if request.form.get("base_case_id"):
+            remove_upload(tmp_path)
+            return jsonify({'error': f"Unknown base case: {base_case_id}"}), 404
+        base_case_id = None
+    job, created = jobs.get_or_create(case_id, filename)
+    if not created:
+        # The running job already has an identical file.
+        remove_upload(tmp_path)
+    else:
+        pwb_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{case_id}.pwb")
+        os.replace(tmp_path, pwb_path)
+        try:
+            future = get_pool().submit(
+                pwb_path, store.staging_path(case_id),
+                on_progress=lambda obj, state, rows: jobs.progress(job.job_id, obj, state, rows),
+                base_path=store.db_path(base_case_id) if base_case_id else None,
+            )
+        except Exception as e:
+            traceback.print_exc()
+            remove_upload(pwb_path)
+            jobs.fail(job.job_id, str(e))
+            return jsonify({'error': f"Failed to open or extract case: {e}"}), 500
+        future.add_done_callback(lambda f: finish_upload(job, f, base_case_id, pwb_path))
+    return jsonify({"message": f"Extracting case: {filename}", "job_id": job.job_id,
+                    "case_id": case_id, "base_case_id": base_case_id, "cached": False}), 202
+
+def remove_upload(path):
     try:
-        pw = Dispatch("pwrworld.SimulatorAuto")
-        result = pw.OpenCase(pwb_path)
-        print("OpenCase result:", result)
-        init_db()
-        extract_and_store_case_data(pw)
-        return jsonify({"message": f"Successfully opened and stored case: {filename}"}), 200
+        os.remove(path)
+    except OSError:
+        pass
+
+def finish_upload(job, future, base_case_id=None, pwb_path=None):
+    try:
+        stats = future.result()
+        store.add(job.case_id, job.filename, base_case_id)
+        answers.invalidate(job.case_id)
+        column_store.invalidate(store.db_path(job.case_id))
+        jobs.finish(job.job_id, stats)
     except Exception as e:
         traceback.print_exc()
-        return jsonify({'error': f"Failed to open or extract case: {e}"}), 500
+        jobs.fail(job.job_id, f"Failed to open or extract case: {e}")
+    finally:
+        if pwb_path:
+            remove_upload(pwb_path)
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f"Unknown job: {job_id}"}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    if jobs.get(job_id) is None:
+        return jsonify({'error': f"Unknown job: {job_id}"}), 404
+    def generate_events():
+        version = -1
+        while True:
+            version, job = jobs.wait(job_id, version)
+            if job is None:
+                return
+            yield f"data: {json.dumps(job)}\n\n"
+            if job["state"] in TERMINAL_STATES:
+                return
+    return Response(generate_events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route('/view/<table>')
 def view_table(table):
-    conn = sqlite3.connect("caseinfo.db")
-    c = conn.cursor()
+    as_json = request.args.get("format") == "json"
+    def error(message, status):
+        if as_json:
+            return jsonify({"error": message}), status
+        return f"<h3>Error: {escape(message)}</h3>", status
+
+    db_path = case_db_path()
+    if db_path is None:
+        return error("no case loaded", 404)
+    conn = sqlite3.connect(db_path, check_same_thread=False)
     try:
-        c.execute(f'SELECT * FROM "{table}"')
-        rows = c.fetchall()
-        cols = [desc[0] for desc in c.description]
+        cols = table_columns(conn, table)
+        if cols is None:
+            conn.close()
+            return error(f"no such table: {table}", 404)
+        query = page_query(table, cols, request.args)
+        count_sql, count_params = count_query(table, cols, request.args)
     except Exception as e:
-        return f"<h3>Error: {e}</h3>"
-    finally:
         conn.close()
-    html = f"<h2>{table} (rows: {len(rows)})</h2>"
-    html += f'<p><a href="/download/{table}">Download {table} as CSV</a> | <a href="/">Back</a></p>'
-    html += "<div style='overflow:auto; max-height:75vh; border:1px solid #ddd;'>"
-    html += "<table border='1' cellpadding='5' style='border-collapse:collapse; width:100%;'>"
-    html += "<tr>" + "".join([f"<th>{col}</th>" for col in cols]) + "</tr>"
-    for row in rows:
-        html += "<tr>" + "".join([f"<td>{'' if v is None else v}</td>" for v in row]) + "</tr>"
-    html += "</table></div>"
-    return html
+        return error(str(e), 400)
+
+    if as_json:
+        try:
+            with timed("pw_stage_seconds", stage="db_query"):
+                rows, next_after = fetch_page(conn.cursor(), query, cols)
+                total = None if request.args.get("after") else conn.execute(count_sql, count_params).fetchone()[0]
+        finally:
+            conn.close()
+        with timed("pw_stage_seconds", stage="render"):
+            return jsonify({"table": table, "columns": cols, "rows": rows, "next": next_after, "total": total})
+
+    args = request.args.to_dict()
+    def page_url(**changes):
+        params = {k: v for k, v in {**args, **changes}.items() if v not in (None, "")}
+        return f"/view/{quote(table)}?{urlencode(params)}"
+
+    def generate_html():
+        try:
+            total = conn.execute(count_sql, count_params).fetchone()[0]
+            yield f"<h2>{escape(table)} (rows: {total})</h2>"
+            yield (f'<p><a href="/download/{quote(table)}?case_id={quote(args.get("case_id", ""))}">Download {escape(table)} as CSV</a>'
+                   f' | <a href="/grid/{quote(table)}?case_id={quote(args.get("case_id", ""))}">Scrollable view</a> | <a href="/">Back</a></p>')
+            yield "<div style='overflow:auto; max-height:75vh; border:1px solid #ddd;'>"
+            yield "<table border='1' cellpadding='5' style='border-collapse:collapse; width:100%;'><tr>"
+            for col in cols:
+                desc = query.sort == col and not query.desc
+                arrow = "" if query.sort != col else (" &#9660;" if query.desc else " &#9650;")
+                yield f'<th><a href="{escape(page_url(sort=col, dir="desc" if desc else "asc", after=None))}">{escape(col)}</a>{arrow}</th>'
+            yield "</tr>"
+            pages = iter_page(conn.cursor(), query, cols)
+            while True:
+                try:
+                    with timed("pw_stage_seconds", stage="db_query"):
+                        chunk = next(pages)
+                except StopIteration as stop:
+                    next_after = stop.value
+                    break
+                with timed("pw_stage_seconds", stage="render"):
+                    html = "".join(
+                        "<tr>" + "".join(f"<td>{'' if v is None else escape(v)}</td>" for v in row) + "</tr>"
+                        for row in chunk
+                    )
+                yield html
+            yield "</table></div>"
+            if next_after:
+                yield f'<p><a href="{escape(page_url(after=next_after))}">Next {query.limit} rows &raquo;</a></p>'
+        finally:
+            conn.close()
+
+    return Response(counted(generate_html(), endpoint=request.url_rule.rule), mimetype="text/html")
+
+@app.route('/grid/<table>')
+def grid_table(table):
+    return render_template('table.html', table=table, case_id=request.args.get("case_id", ""))
+
+def export_response(chunks, filename, mimetype):
+    # Export chunks interleave the table scan and the encoding, so each chunk is timed as one "export" stage.
+    chunks = counted(timed_chunks(chunks, "export"), endpoint=request.url_rule.rule)
+    return Response(chunks, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment;filename={filename}"})
 
 @app.route('/download/<table>')
 def download_table(table):
-    conn = sqlite3.connect("caseinfo.db")
-    c = conn.cursor()
+    fmt = request.args.get("format", "csv")
+    compress = request.args.get("gzip") in ("1", "true", "yes")
+    db_path = case_db_path()
+    if db_path is None:
+        return "<h3>Error: no case loaded</h3>", 404
     try:
-        c.execute(f'SELECT * FROM "{table}"')
-        rows = c.fetchall()
-        cols = [desc[0] for desc in c.description]
-    except Exception as e:
+        check_format(fmt)
+    except ValueError as e:
+        return f"<h3>Error: {escape(str(e))}</h3>", 400
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    if table_columns(conn, table) is None:
+        conn.close()
+        return f"<h3>Error: no such table: {escape(table)}</h3>", 404
+
+    def generate():
+        try:
+            chunks = iter_table(conn, table, fmt)
+            yield from gzip_stream(chunks) if compress else chunks
+        finally:
+            conn.close()
+
+    ext, mimetype = EXPORT_FORMATS[fmt]
+    if compress:
+        return export_response(generate(), f"{table}.{ext}.gz", "application/gzip")
+    return export_response(generate(), f"{table}.{ext}", mimetype)
+
+@app.route('/download')
+def download_case():
+    fmt = request.args.get("format", "csv")
+    db_path = case_db_path()
+    if db_path is None:
+        return "<h3>Error: no case loaded</h3>", 404
+    try:
+        check_format(fmt)
+    except ValueError as e:
+        return f"<h3>Error: {escape(str(e))}</h3>", 400
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    tables = case_tables(conn)
+
+    def generate():
+        try:
+            yield from zip_stream(conn, tables, fmt)
+        finally:
+            conn.close()
+
+    case_id = os.path.splitext(os.path.basename(db_path))[0]
+    return export_response(generate(), f"case_{case_id}_{fmt}.zip", "application/zip")
+
+def ask_question():
+    data = request.get_json(silent=True) or {}
+    return " ".join((data.get("question") or data.get("query") or "").lower().split())
+
+def direct_answer(question, case_id, db_path):
+    """Route a question and answer it from the case database or the answer cache.
+
+    Returns (route, answer, cached); answer is None when the question should
+    go to the model instead.
+    """
+    with timed("pw_stage_seconds", stage="route"):
+        route = route_question(question, case_index(db_path))
+    key = answers.key(case_id, question, route)
+    answer = answers.get(key) if route.intent else None
+    if answer is not None:
+        metrics.inc("pw_cache_requests_total", cache="answers", result="hit")
+        return route, answer, True
+    if route.intent is None and get_engine() is not None:
+        return route, None, False
+    if route.intent:
+        metrics.inc("pw_cache_requests_total", cache="answers", result="miss")
+    conn = sqlite3.connect(db_path)
+    try:
+        with timed("pw_stage_seconds", stage="db_query"):
+            answer = answer_question(conn, route, question)
+    finally:
         conn.close()
-        return f"<h3>Error: {e}</h3>"
+    if route.intent:
+        answers.put(key, answer)
+    return route, answer, False
+
+def model_inputs(db_path, question):
+    """Case context (shared prompt prefix) and retrieved rows for a model question."""
+    conn = sqlite3.connect(db_path)
+    try:
+        with timed("pw_stage_seconds", stage="retrieval"):
+            return case_context(stats_for(conn)), retrieval_context(conn, question, CASE_SEARCH)
     finally:
         conn.close()
-    def generate_csv():
-        yield ",".join(cols) + "\n"
-        for row in rows:
-            yield ",".join([("" if v is None else str(v)) for v in row]) + "\n"
-    return Response(
-        generate_csv(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment;filename={table}.csv"}
-    )
 
 @app.route('/ask', methods=['POST'])
 def ask():
-    def match_keywords(q, keywords):
-        return any(k in q for k in keywords)
-
-    data = request.get_json() or {}
-    question = (data.get("question") or data.get("query") or "").lower().strip()
-    conn = sqlite3.connect("caseinfo.db")
-    c = conn.cursor()
+    question = ask_question()
+    case_id = request_case_id()
+    db_path = store.resolve(case_id)
+    if db_path is None:
+        return jsonify({"answer": "Please upload a case first."})
+    start = time.perf_counter()
     try:
-        if "summarize" in question or "summary" in question:
-            parts = {}
-            for table in ["Bus", "Gen", "Load", "Branch"]:
-                try:
-                    c.execute(f'SELECT COUNT(*) FROM "{table}"')
-                    parts[table] = c.fetchone()[0]
-                except:
-                    parts[table] = 0
-            return jsonify({"answer":
-                f"This case contains {parts['Bus']} buses, "
-                f"{parts['Gen']} generators, "
-                f"{parts['Load']} loads, and "
-                f"{parts['Branch']} branches."
-            })
-
-        if match_keywords(question, ["how many buses", "number of buses", "count of buses", "total buses"]):
-            c.execute('SELECT COUNT(*) FROM "Bus"')
-            count = c.fetchone()[0]
-            return jsonify({"answer": f"There are {count} buses in this case."})
-
-        if match_keywords(question, ["how many generators", "number of generators", "count of generators", "total generators", "number of gens"]):
-            c.execute('SELECT COUNT(*) FROM "Gen"')
-            count = c.fetchone()[0]
-            return jsonify({"answer": f"There are {count} generators in this case."})
-
-        if match_keywords(question, ["how many loads", "number of loads", "count of loads", "total loads"]):
-            c.execute('SELECT COUNT(*) FROM "Load"')
-            count = c.fetchone()[0]
-            return jsonify({"answer": f"There are {count} loads in this case."})
-
-        if match_keywords(question, ["how many branches", "number of branches", "count of branches", "number of lines", "total transmission lines"]):
-            c.execute('SELECT COUNT(*) FROM "Branch"')
-            count = c.fetchone()[0]
-            return jsonify({"answer": f"There are {count} branches (lines) in this case."})
-
-        if "bus" in question and "kv" in question:
-            m = re.search(r'bus\s+(\d+)', question)
-            if m:
-                busnum = m.group(1)
-                c.execute('SELECT "BusName","NomKV" FROM "Bus" WHERE "BusNum"=?', (busnum,))
-                row = c.fetchone()
-                if row:
-                    return jsonify({"answer": f"Bus {busnum} ({row[0]}) operates at {row[1]} kV"})
-                else:
-                    return jsonify({"answer": f"No info found for bus {busnum}."})
-
-        return jsonify({"answer": f"Sorry, I can’t answer that yet. You asked: {question}"})
+        route, answer, cached = direct_answer(question, case_id, db_path)
+        if answer is None:
+            context, rows = model_inputs(db_path, question)
+            future = get_engine().submit(context, question, rows=rows)
+            try:
+                with timed("pw_stage_seconds", stage="generate"):
+                    answer = future.result(LLM_TIMEOUT)
+            finally:
+                # A timed-out request is cancelled, so the model stops working on it.
+                if not future.done():
+                    future.cancel()
+                    ask_latency.count("ask_cancelled")
+            ask_latency.record("ask_seconds", time.perf_counter() - start)
+            return jsonify({"answer": answer, "intent": None, "model": LLM_BACKEND, "cached": False})
+        ask_latency.record("ask_seconds", time.perf_counter() - start)
+        return jsonify({"answer": answer, "intent": route.intent, "cached": cached})
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({"answer": f"Error querying DB: {e}"})
 
+def sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    """Server-sent events for one answer: meta, token..., then done or error.
+
+    Closing the connection cancels the generation, including work already
+    running on the model.
+    """
+    question = ask_question()
+    case_id = request_case_id()
+    db_path = store.resolve(case_id)
+    start = time.perf_counter()
+
+    def finish(answer, first):
+        ttft = first - start
+        latency = time.perf_counter() - start
+        ask_latency.record("stream_ttft_seconds", ttft)
+        ask_latency.record("stream_seconds", latency)
+        return sse("done", {"answer": answer, "ttft": round(ttft, 4), "latency": round(latency, 4)})
+
+    def generate_events():
+        if db_path is None:
+            yield sse("done", {"answer": "Please upload a case first."})
+            return
+        try:
+            route, answer, cached = direct_answer(question, case_id, db_path)
+        except Exception as e:
+            traceback.print_exc()
+            yield sse("error", {"error": f"Error querying DB: {e}"})
+            return
+        yield sse("meta", {"intent": route.intent, "cached": cached,
+                           "model": LLM_BACKEND if answer is None else None})
+        if answer is not None:
+            first = time.perf_counter()
+            yield sse("token", {"text": answer})
+            yield finish(answer, first)
+            return
+
+        pieces = queue.Queue()
+        try:
+            context, rows = model_inputs(db_path, question)
+            future = get_engine().submit(context, question, rows=rows, on_token=pieces.put)
+        except Exception as e:
+            traceback.print_exc()
+            yield sse("error", {"error": f"Model error: {e}"})
+            return
+        future.add_done_callback(lambda f: pieces.put(None))
+        first = None
+        try:
+            while True:
+                try:
+                    piece = pieces.get(timeout=STREAM_KEEPALIVE)
+                except queue.Empty:
+                    # Comment lines keep proxies from timing out and let a closed connection surface.
+                    yield ": keep-alive\n\n"
+                    continue
+                if piece is None:
+                    break
+                if first is None:
+                    first = time.perf_counter()
+                yield sse("token", {"text": piece})
+            answer = future.result()
+            yield finish(answer, first or time.perf_counter())
+        except Exception as e:
+            traceback.print_exc()
+            yield sse("error", {"error": f"Model error: {e}"})
+        finally:
+            if not future.done():
+                future.cancel()
+                ask_latency.count("stream_cancelled")
+
+    return Response(generate_events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/query', methods=['POST'])
+def query_columns():
+    """Filter/group-by/top-k/histogram query over the case's column store (see column_store.run_query)."""
+    db_path = case_db_path()
+    if db_path is None:
+        return jsonify({'error': 'Please upload a case first.'}), 404
+    query = request.get_json(silent=True)
+    if not isinstance(query, dict):
+        return jsonify({'error': 'Expected a JSON object'}), 400
+    conn = sqlite3.connect(db_path)
+    try:
+        cols = column_store.columns_for(conn, db_path)
     finally:
         conn.close()
+    try:
+        with timed("pw_stage_seconds", stage="column_query") as t:
+            result = column_store.run_query(cols, query)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    result["seconds"] = round(t.seconds, 6)
+    return jsonify(result)
+
+@app.route('/diff')
+def diff_view():
+    """Added, removed and changed elements between two stored cases.
+
+    ?to= defaults to the current case and ?from= to the case it was loaded
+    on top of; ?objects=Gen,Branch limits the object types compared.
+    """
+    new_id = request.args.get("to") or request_case_id()
+    old_id = request.args.get("from") or (store.base_of(new_id) if new_id else None)
+    if not new_id or not store.has(new_id):
+        return jsonify({'error': f"Unknown case: {new_id}"}), 404
+    if not old_id:
+        return jsonify({'error': "No case to compare with; pass ?from=<case_id>"}), 400
+    if not store.has(old_id):
+        return jsonify({'error': f"Unknown case: {old_id}"}), 404
+    objects = [o for o in request.args.get("objects", "").split(",") if o] or None
+    try:
+        examples = int(request.args.get("examples", DIFF_EXAMPLES))
+        result = diff_cases(store.db_path(old_id), store.db_path(new_id), objects, examples)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(dict(result, **{"from": old_id, "to": new_id}))
+
+@app.route('/ask/cache')
+def answer_cache_status():
+    return jsonify(answers.stats())
+
+@app.route('/ask/latency')
+def ask_latency_status():
+    return jsonify(ask_latency.summary())
+
+@app.route('/metrics')
+def metrics_text():
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/metrics/trace', methods=['GET', 'POST'])
+def metrics_trace():
+    """Recent request traces; POST {"mode": "off" | "trace" | "profile"} switches tracing at runtime."""
+    if request.method == 'POST':
+        try:
+            metrics.set_trace_mode((request.get_json(silent=True) or {}).get("mode"))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        metrics.traces.clear()
+    return jsonify({"mode": metrics.trace_mode(), "traces": list(metrics.traces)})
+
+@app.route('/llm')
+def llm_status():
+    if get_engine() is None:
+        return jsonify({"backend": "none"})
+    return jsonify(get_engine().status())
+
+@app.route('/pool')
+def pool_status():
+    return jsonify(get_pool().status())
+
+@app.route('/cases')
+def list_cases():
+    return jsonify({"cases": store.list_cases()})
 
 if __name__ == '__main__':
-    init_db()
     app.run(debug=True)
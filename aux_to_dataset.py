@@ -1,35 +1,60 @@
 import json
 import argparse
+import os
+import sqlite3
+import tempfile
+
+from case_sources import AuxSource
+from case_stats import stats_for, summary_sentence
+from ingest import CASE_SEARCH, ingest_case
+from llm_engine import case_context
+from retrieval import retrieval_context
 
 def parse_aux(aux_path):
-    lines = []
     with open(aux_path, "r", encoding="utf-8", errors="ignore") as f:
         for line in f:
             l = line.strip()
             if l and not l.startswith("//"):
-                lines.append(l)
-    return lines
+                yield l
 
-def make_dataset(aux_path, output_path):
-    lines = parse_aux(aux_path)
-    # example: count buses, generators etc from lines (you will customize this)
-    # Here we make simple synthetic questions
-    ds = []
-    ds.append({
-        "instruction": "Summarize the power system case.",
-        "input": "\n".join(lines[:50]),
-        "output": "Summary: ..."  # you should generate or write this
-    })
-    # add more entries as desired
+def make_dataset(aux_path, output_path, db_path=None):
+    # Load the AUX into a case database so the context comes from the case
+    # statistics and retrieval index instead of the first lines of the file.
+    # Without db_path the database is scratch and goes away afterwards.
+    if db_path is None:
+        with tempfile.TemporaryDirectory() as tmp:
+            return make_dataset(aux_path, output_path, os.path.join(tmp, "case.db"))
+    ingest_case(AuxSource(aux_path), db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        stats = stats_for(conn)
+        # Here we make simple synthetic questions
+        ds = []
+        ds.append({
+            "instruction": "Summarize the power system case.",
+            "input": case_context(stats),
+            "output": summary_sentence(stats)
+        })
+        for busnum, name, kv in conn.execute('SELECT "BusNum", "BusName", "NomKV" FROM "Bus" LIMIT 10'):
+            question = f"What is the nominal voltage of bus {busnum}?"
+            ds.append({
+                "instruction": question,
+                "input": retrieval_context(conn, question, CASE_SEARCH, k=5),
+                "output": f"Bus {busnum} ({name}) operates at {kv} kV."
+            })
+        # add more entries as desired
+    finally:
+        conn.close()
 
     with open(output_path, "w", encoding="utf-8") as f:
         for entry in ds:
             json.dump(entry, f)
-            f.write("\\n")
+            f.write("\n")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--aux", required=True)
     parser.add_argument("--out", required=True)
+    parser.add_argument("--db", help="keep the case database built from the AUX at this path")
     args = parser.parse_args()
-    make_dataset(args.aux, args.out)
+    make_dataset(args.aux, args.out, args.db)
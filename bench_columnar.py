@@ -0,0 +1,77 @@
+import argparse
+import json
+import random
+import time
+
+from columnar import column_batches
+from ingest import CASE_RULES, CASE_SCHEMA, field_names, transpose_simauto, typed_rows
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def bus_columns(n, seed=0):
+    """SimAuto-shaped column-major Bus data with a few invalid rows mixed in."""
+    rng = random.Random(seed)
+    nums = [str(i + 1) if rng.random() > 0.001 else "" for i in range(n)]
+    return (
+        tuple(nums),
+        tuple(f"BUS{i + 1}" for i in range(n)),
+        tuple(str(rng.choice([69.0, 138.0, 345.0])) for _ in range(n)),
+        tuple(str(1 + i // 1000) for i in range(n)),
+        tuple(str(rng.randint(1, 50)) for _ in range(n)),
+    )
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def run_row_path(data, fields):
+    rows, t_transpose = timed(lambda: transpose_simauto(data, fields))
+    typed, t_validate = timed(lambda: list(typed_rows("Bus", rows)))
+    return len(typed), t_transpose, t_validate
+
+def run_columnar_path(data):
+    def consume():
+        total = 0
+        for count, rows in column_batches(data, CASE_SCHEMA["Bus"], CASE_RULES["Bus"], 10_000):
+            for _ in rows:
+                pass
+            total += count
+        return total
+    return timed(consume)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark row-wise vs columnar SimAuto transpose/validation.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    fields = field_names("Bus")
+    results = []
+    for n in args.sizes:
+        data = bus_columns(n)
+        kept_rows, t_transpose, t_validate = run_row_path(data, fields)
+        kept_cols, t_columnar = run_columnar_path(data)
+        assert kept_rows == kept_cols, (kept_rows, kept_cols)
+        row_total = t_transpose + t_validate
+        results.append({
+            "elements": n,
+            "rows_kept": kept_cols,
+            "row_transpose_s": round(t_transpose, 4),
+            "row_validate_s": round(t_validate, 4),
+            "row_total_s": round(row_total, 4),
+            "columnar_s": round(t_columnar, 4),
+            "speedup": round(row_total / t_columnar, 2) if t_columnar else None,
+        })
+        print(f" {n:>9,} elements: row path {row_total:.3f}s "
+              f"(transpose {t_transpose:.3f}s, validate {t_validate:.3f}s) | "
+              f"columnar {t_columnar:.3f}s | x{row_total / t_columnar:.1f}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f" Results saved to: {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import argparse
+import json
+import re
+import time
+
+from intents import CaseIndex, route_question
+
+DATASETS = ["dataset.jsonl", "cleaned_dataset.jsonl"]
+
+# The intent (and entities) each instruction should resolve to, read back
+# from the templated answers in the dataset.
+EXPECTED = [
+    (re.compile(r"^This case contains"), "summary"),
+    (re.compile(r"^There are \d+ buses"), "count_bus"),
+    (re.compile(r"^There are \d+ generators"), "count_gen"),
+    (re.compile(r"^There are \d+ loads"), "count_load"),
+    (re.compile(r"^There are \d+ branches"), "count_branch"),
+    (re.compile(r"^Bus\s+(?P<bus>\d+) \((?P<name>[^)]*)\) operates"), "bus_kv"),
+    (re.compile(r"^Generator (?P<gen_id>\S+) at bus\s+(?P<bus>\d+) produces"), "gen_mw"),
+    (re.compile(r"^Load (?P<load_id>\S+) at bus\s+(?P<bus>\d+) consumes"), "load_mw"),
+]
+
+
+def expected_route(output):
+    for pattern, intent in EXPECTED:
+        m = pattern.search(output)
+        if m:
+            return intent, m.groupdict()
+    return None, {}
+
+def load_examples(paths):
+    examples = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                item = json.loads(line)
+                examples.append((item["instruction"], item["output"]))
+    return examples
+
+def main():
+    parser = argparse.ArgumentParser(description="Check intent routing coverage and throughput on the datasets.")
+    parser.add_argument("--data", nargs="+", default=DATASETS)
+    parser.add_argument("--seconds", type=float, default=2.0, help="duration of the throughput run")
+    parser.add_argument("--show-misses", type=int, default=10)
+    args = parser.parse_args()
+
+    examples = load_examples(args.data)
+    expected = [expected_route(output) for _, output in examples]
+    # The datasets were generated from one case; rebuild its bus-name index from the answers.
+    index = CaseIndex({(int(e["bus"]), e["name"]) for _, e in expected if "name" in e})
+
+    routed = entity_ok = 0
+    misses = []
+    for (instruction, output), (intent, ents) in zip(examples, expected):
+        route = route_question(instruction.lower().strip(), index)
+        if route.intent == intent:
+            routed += 1
+            # Generator answers name the bus they found, which the question need not mention.
+            if intent == "gen_mw":
+                ok = route.entities.get("gen_id") == ents["gen_id"].upper()
+            elif intent == "load_mw":
+                ok = (route.entities.get("load_id") == ents["load_id"].upper()
+                      and route.entities.get("bus") == int(ents["bus"]))
+            else:
+                ok = "bus" not in ents or route.entities.get("bus") == int(ents["bus"])
+            entity_ok += ok
+            if not ok:
+                misses.append((instruction, intent, route))
+        else:
+            misses.append((instruction, intent, route))
+
+    questions = [instruction.lower().strip() for instruction, _ in examples]
+    n = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.seconds:
+        for q in questions:
+            route_question(q, index)
+        n += len(questions)
+    elapsed = time.perf_counter() - start
+
+    total = len(examples)
+    print(f" Examples: {total} from {', '.join(args.data)}")
+    print(f" Intent coverage: {routed}/{total} = {routed / total:.3f}")
+    print(f" Intent + entities correct: {entity_ok}/{total} = {entity_ok / total:.3f}")
+    print(f" Throughput: {n / elapsed:,.0f} questions/s ({elapsed / n * 1e6:.1f} us/question)")
+    for instruction, intent, route in misses[:args.show_misses]:
+        print(f"   MISS {instruction!r}: expected {intent}, got {route.intent} {route.entities}")
+
+if __name__ == "__main__":
+    main()
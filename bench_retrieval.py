@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from case_sources import SimAutoSource
+from fake_simauto import FakeSimAuto
+from ingest import CASE_SEARCH, ingest_case
+from retrieval import retrieval_context
+
+QUESTIONS = [
+    "generators over 800 mw",
+    "which buses are at 345 kv",
+    "loads between 50 and 51 mw",
+    "buses in area 3",
+    "what is connected to bus 4521",
+    "generator 2 at bus 5000",
+    "open branches from bus 10",
+    "how is zone 12 doing",
+    "tell me about bus77_230",
+]
+
+
+def build_case(n_buses, db_path):
+    pw = FakeSimAuto(n_buses=n_buses, seed=1)
+    pw.OpenCase("bench.pwb")
+    start = time.perf_counter()
+    ingest_case(SimAutoSource(pw), db_path)
+    return time.perf_counter() - start
+
+def time_question(conn, question, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        context = retrieval_context(conn, question, CASE_SEARCH)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return context, samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-question retrieval latency on a synthetic case.")
+    parser.add_argument("--buses", type=int, default=100_000, help="synthetic case size (about 3.4 elements per bus)")
+    parser.add_argument("--db", help="reuse or create this case database instead of a temporary one")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = args.db or os.path.join(tmp, "bench.db")
+        if not os.path.exists(db_path):
+            print(f" Ingesting synthetic case with {args.buses:,} buses, ingest took {build_case(args.buses, db_path):.2f}s")
+        conn = sqlite3.connect(db_path)
+        results = []
+        for question in QUESTIONS:
+            context, p50, p95 = time_question(conn, question, args.repeat)
+            rows = context.count("\n") + 1 if context else 0
+            results.append({"question": question, "rows": rows, "p50_ms": round(p50 * 1e3, 3), "p95_ms": round(p95 * 1e3, 3)})
+            print(f" {p50 * 1e3:7.3f} ms p50 {p95 * 1e3:7.3f} ms p95 {rows:3d} rows  {question}")
+        conn.close()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f" Results saved to: {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from case_sources import AuxSource, SimAutoSource
+from case_store import CaseStore
+from fake_simauto import FakeSimAuto, synthetic_case, write_aux
+from ingest import ingest_case
+from make_dataset import generate_dataset
+from metrics import REGISTRY
+from tables import encode_cursor
+
+SIZES = [1_000, 10_000, 100_000]
+SEED = 0
+REPEAT = 20
+TOLERANCE = 0.25
+NOISE_FLOOR_S = 0.002
+
+# {bus}, {far} and {area} are filled in per case size.
+ASK_QUESTIONS = [
+    "how many buses are there?",
+    "summarize the case",
+    "what is the nominal voltage of bus {bus}?",
+    "top 10 loads",
+    "largest 5 generators",
+    "average generator output in area {area}",
+    "total load in zone 12",
+    "which buses are connected to bus {bus}?",
+    "buses within 3 hops of bus {bus}",
+    "how many islands are there?",
+    "path from bus 1 to bus {far}",
+    "histogram of bus voltages",
+]
+
+# ----------------------
+# Benchmark suite
+# ----------------------
+# For each case size: generate a synthetic case (fake_simauto.py) and its
+# AUX export, ingest it through both sources, publish it in a CaseStore and
+# drive /view, /download and /ask through the Flask test client, then
+# generate the training dataset from it. Results are written as JSON;
+# --compare checks them against an earlier run and exits non-zero when a
+# timing got slower by more than --tolerance.
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def quiet(fn):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn()
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {"p50_ms": round(samples[len(samples) // 2] * 1e3, 3),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e3, 3)}
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def stage_seconds(snapshot):
+    """Total ingest time per stage from a drained metrics registry."""
+    totals = {}
+    for (name, labels), (_, total) in snapshot["histograms"].items():
+        if name == "pw_ingest_stage_seconds":
+            stage = dict(labels)["stage"]
+            totals[stage] = totals.get(stage, 0.0) + total
+    return {f"{stage}_s": round(total, 4) for stage, total in sorted(totals.items())}
+
+
+def bench_generate(n, seed, tmp):
+    case, t_case = timed(lambda: synthetic_case(n, seed))
+    aux_path = os.path.join(tmp, f"synthetic_{n}.aux")
+    rows, t_aux = timed(lambda: write_aux(case, aux_path))
+    return case, aux_path, {
+        "rows": rows,
+        "case_s": round(t_case, 4),
+        "aux_s": round(t_aux, 4),
+        "aux_mb": round(os.path.getsize(aux_path) / 1e6, 2),
+    }
+
+def bench_ingest(case, aux_path, db_path, tmp):
+    pw = FakeSimAuto(case=case)
+    pw.OpenCase("bench.pwb")
+    REGISTRY.drain()
+    stats, t_simauto = timed(lambda: quiet(lambda: ingest_case(SimAutoSource(pw), db_path)))
+    stages = stage_seconds(REGISTRY.drain())
+    aux_db = os.path.join(tmp, "aux.db")
+    _, t_aux = timed(lambda: quiet(lambda: ingest_case(AuxSource(aux_path), aux_db)))
+    os.remove(aux_db)
+    rows = sum(s["rows"] for s in stats.values())
+    return {
+        "rows": rows,
+        "simauto_s": round(t_simauto, 4),
+        "simauto_rows_per_sec": round(rows / t_simauto),
+        "aux_s": round(t_aux, 4),
+        "aux_rows_per_sec": round(rows / t_aux),
+        "stages": stages,
+    }
+
+def request_time(client, method, url, repeat, warmup=0, **kwargs):
+    samples, size = [], 0
+    for i in range(warmup + repeat):
+        start = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        body = response.get_data()
+        elapsed = time.perf_counter() - start
+        response.close()
+        assert response.status_code == 200, (url, response.status_code, body[:200])
+        if i >= warmup:
+            samples.append(elapsed)
+        size = len(body)
+    return samples, size
+
+def bench_view(client, case_id, n, repeat):
+    urls = {
+        "first_page": f"/view/Bus?format=json&limit=500&case_id={case_id}",
+        "deep_page": f"/view/Bus?format=json&limit=500&after={encode_cursor(None, n // 2)}&case_id={case_id}",
+        "sorted_deep_page": (f"/view/Bus?format=json&limit=500&sort=NomKV&after={encode_cursor(138.0, n // 2)}"
+                             f"&case_id={case_id}"),
+        "filtered_page": f"/view/Bus?format=json&limit=500&NomKV=345&case_id={case_id}",
+        "html_page": f"/view/Branch?limit=500&case_id={case_id}",
+    }
+    return {name: percentiles(request_time(client, "GET", url, repeat, warmup=1)[0]) for name, url in urls.items()}
+
+def bench_download(client, case_id, repeat):
+    urls = {
+        "branch_csv": f"/download/Branch?case_id={case_id}",
+        "branch_csv_gzip": f"/download/Branch?gzip=1&case_id={case_id}",
+        "case_zip": f"/download?case_id={case_id}",
+    }
+    results = {}
+    for name, url in urls.items():
+        samples, size = request_time(client, "GET", url, repeat)
+        seconds = min(samples)
+        results[name] = {"best_s": round(seconds, 4), "mb": round(size / 1e6, 2),
+                         "mb_per_sec": round(size / 1e6 / seconds, 1)}
+    return results
+
+def bench_ask(web, client, case_id, n, repeat):
+    from answer_cache import AnswerCache
+
+    fill = {"bus": n // 2, "far": n, "area": 1}
+    questions = [q.format(**fill) for q in ASK_QUESTIONS]
+    results = {}
+    # Cold: first question against the case (per-case indexes not loaded yet), answer cache empty.
+    web.answers = AnswerCache()
+    for q in questions:
+        samples, _ = request_time(client, "POST", "/ask", 1, json={"question": q, "case_id": case_id})
+        results[q] = {"cold_ms": round(samples[0] * 1e3, 3)}
+    # Warm but uncached: an answer cache that keeps nothing, so every answer is recomputed.
+    web.answers = AnswerCache(max_entries=0)
+    for q in questions:
+        samples, _ = request_time(client, "POST", "/ask", repeat, json={"question": q, "case_id": case_id})
+        results[q].update(percentiles(samples))
+    web.answers = AnswerCache()
+    for q in questions:
+        samples, _ = request_time(client, "POST", "/ask", repeat, json={"question": q, "case_id": case_id})
+        results[q]["cached_p50_ms"] = percentiles(samples)["p50_ms"]
+    return results
+
+def bench_dataset(db_path, out_dir, processes):
+    manifest, seconds = timed(lambda: quiet(lambda: generate_dataset([db_path], out_dir, processes=processes)))
+    return {"examples": manifest["examples"], "seconds_s": round(seconds, 4),
+            "examples_per_sec": round(manifest["examples"] / seconds)}
+
+def run_size(n, seed, repeat, processes, tmp):
+    import app as web
+
+    print(f" {n:,} buses: generating", flush=True)
+    case, aux_path, generate = bench_generate(n, seed, tmp)
+    store = CaseStore(os.path.join(tmp, "cases"))
+    case_id = f"synthetic{n}"
+    print(f" {n:,} buses: ingesting {generate['rows']:,} rows", flush=True)
+    ingest = bench_ingest(case, aux_path, store.staging_path(case_id), tmp)
+    del case
+    os.remove(aux_path)
+    store.add(case_id, f"synthetic_{n}.pwb")
+    web.store = store
+    client = web.app.test_client()
+    print(f" {n:,} buses: timing /view, /download and /ask", flush=True)
+    result = {
+        "generate": generate,
+        "ingest": ingest,
+        "view": bench_view(client, case_id, n, repeat),
+        "download": bench_download(client, case_id, max(1, repeat // 10)),
+        "ask": bench_ask(web, client, case_id, n, repeat),
+    }
+    print(f" {n:,} buses: generating dataset", flush=True)
+    result["dataset"] = bench_dataset(store.db_path(case_id), os.path.join(tmp, f"dataset_{n}"), processes)
+    return result
+
+
+# ----------------------
+# Reporting
+# ----------------------
+def flatten(tree, prefix=""):
+    out = {}
+    for key, value in tree.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(flatten(value, path + " / "))
+        else:
+            out[path] = value
+    return out
+
+def timings(results):
+    """Lower-is-better numbers, in seconds, keyed by their path in the results."""
+    out = {}
+    for path, value in flatten(results).items():
+        if path.endswith("_ms"):
+            out[path] = value / 1e3
+        elif path.endswith("_s"):
+            out[path] = value
+    return out
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Timings that got slower than the baseline by more than tolerance (ignoring sub-noise values)."""
+    new, old = timings(results["results"]), timings(baseline["results"])
+    regressions = []
+    for path, value in sorted(new.items()):
+        before = old.get(path)
+        if before is None or max(value, before) < NOISE_FLOOR_S:
+            continue
+        if value > before * (1 + tolerance):
+            regressions.append((path, before, value))
+    return regressions
+
+def print_summary(results):
+    for size, r in results["results"].items():
+        ask = r["ask"].values()
+        print(f"\n {int(size):,} buses ({r['generate']['rows']:,} rows)")
+        print(f"   generate  case {r['generate']['case_s']:.2f}s, aux {r['generate']['aux_s']:.2f}s")
+        print(f"   ingest    simauto {r['ingest']['simauto_s']:.2f}s ({r['ingest']['simauto_rows_per_sec']:,} rows/s), "
+              f"aux {r['ingest']['aux_s']:.2f}s ({r['ingest']['aux_rows_per_sec']:,} rows/s)")
+        print("   view      " + ", ".join(f"{k} {v['p50_ms']:.1f}ms" for k, v in r["view"].items()))
+        print("   download  " + ", ".join(f"{k} {v['best_s']:.2f}s ({v['mb_per_sec']} MB/s)"
+                                         for k, v in r["download"].items()))
+        print(f"   ask       cold max {max(a['cold_ms'] for a in ask):.1f}ms, "
+              f"uncached p50 max {max(a['p50_ms'] for a in ask):.1f}ms, "
+              f"cached p50 max {max(a['cached_p50_ms'] for a in ask):.2f}ms")
+        print(f"   dataset   {r['dataset']['examples']:,} examples in {r['dataset']['seconds_s']:.2f}s")
+
+
+# ----------------------
+# Main
+# ----------------------
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks on deterministic synthetic cases.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="bus counts (100 to 1,000,000)")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--processes", type=int, default=2, help="dataset generation processes")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--compare", help="earlier results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    # No model: questions the router can't answer get the fallback reply instead of loading one.
+    os.environ.setdefault("LLM_BACKEND", "none")
+    out = os.path.abspath(args.out) if args.out else None
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": {},
+    }
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.py creates its upload and case folders in the working directory.
+        os.chdir(tmp)
+        try:
+            for n in args.sizes:
+                results["results"][str(n)] = run_size(n, args.seed, args.repeat, args.processes, tmp)
+        finally:
+            os.chdir(cwd)
+
+    print_summary(results)
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n Results saved to: {out}")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\n Compared with {args.compare} (commit {baseline.get('commit')}): "
+              f"{len(regressions)} timings slower by more than {args.tolerance:.0%}")
+        for path, before, value in regressions:
+            print(f"   {path}: {before * 1e3:.2f}ms -> {value * 1e3:.2f}ms (x{value / before:.2f})")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
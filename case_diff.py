@@ -0,0 +1,76 @@
+import argparse
+import json
+import sqlite3
+import time
+
+from case_stats import table_exists
+from ingest import CASE_KEYS, CASE_SCHEMA, field_names, key_getter, merge_join, same_row, same_value, stored_rows
+
+DIFF_EXAMPLES = 20
+
+# ----------------------
+# Case diff
+# ----------------------
+# Both cases are read in natural-key order through their key indexes and
+# merged in one pass (see merge_join in ingest.py), so a diff costs one
+# ordered scan of each side and holds no table in memory. Per object it
+# reports added/removed/changed/unchanged counts and the first few
+# elements of each kind, with old and new values of changed fields.
+
+def _element(obj, row):
+    return dict(zip(field_names(obj), row))
+
+def diff_table(old_conn, new_conn, obj, examples=DIFF_EXAMPLES):
+    names = field_names(obj)
+    key_cols = set(CASE_KEYS[obj])
+    counts = {"added": 0, "removed": 0, "changed": 0, "unchanged": 0}
+    shown = {"added": [], "removed": [], "changed": []}
+    old_rows = stored_rows(old_conn, obj, ordered=True) if table_exists(old_conn, obj) else iter(())
+    new_rows = stored_rows(new_conn, obj, ordered=True) if table_exists(new_conn, obj) else iter(())
+    for old, new in merge_join(old_rows, new_rows, key_getter(obj)):
+        if new is None:
+            kind, detail = "removed", _element(obj, old[1])
+        elif old is None:
+            kind, detail = "added", _element(obj, new[1])
+        elif not same_row(old[1], new[1]):
+            kind = "changed"
+            detail = {
+                "key": {n: v for n, v in zip(names, new[1]) if n in key_cols},
+                "fields": {n: [a, b] for n, a, b in zip(names, old[1], new[1]) if not same_value(a, b)},
+            }
+        else:
+            counts["unchanged"] += 1
+            continue
+        counts[kind] += 1
+        if len(shown[kind]) < examples:
+            shown[kind].append(detail)
+    return dict(counts, examples=shown)
+
+def diff_cases(old_path, new_path, objects=None, examples=DIFF_EXAMPLES):
+    """Added, removed and changed elements per object type between two case databases."""
+    start = time.perf_counter()
+    old_conn, new_conn = sqlite3.connect(old_path), sqlite3.connect(new_path)
+    try:
+        result = {}
+        for obj in objects or CASE_SCHEMA:
+            if obj not in CASE_SCHEMA or not CASE_KEYS.get(obj):
+                raise ValueError(f"Cannot diff {obj}")
+            if table_exists(old_conn, obj) or table_exists(new_conn, obj):
+                result[obj] = diff_table(old_conn, new_conn, obj, examples)
+    finally:
+        old_conn.close()
+        new_conn.close()
+    return {"objects": result, "seconds": round(time.perf_counter() - start, 3)}
+
+
+# ----------------------
+# Main
+# ----------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two case databases element by element.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--objects", nargs="+")
+    parser.add_argument("--examples", type=int, default=DIFF_EXAMPLES)
+    args = parser.parse_args()
+    print(json.dumps(diff_cases(args.old, args.new, args.objects, args.examples), indent=2))
@@ -0,0 +1,170 @@
+import re
+
+from ingest import STAGE_METRIC, transpose_simauto
+from metrics import timed
+
+# ----------------------
+# Case sources
+# ----------------------
+# A case source exposes fetch(obj, fields), returning an iterable of rows in
+# `fields` order (or None when the object is unavailable). Sources that
+# already hold column-major data may also expose fetch_columns(obj, fields).
+# ingest.ingest_case consumes any source, so SimAuto and AUX exports share
+# one ingestion path.
+
+class SimAutoSource:
+    """Reads objects from a live SimAuto session (Windows only)."""
+
+    def __init__(self, pw):
+        self.pw = pw
+
+    def fetch_columns(self, obj, fields):
+        result, data = self.pw.GetParametersMultipleElement(obj, fields, "")
+        if result != "":
+            print(f"Could not get {obj} data: {result}")
+            return None
+        return data
+
+    def fetch(self, obj, fields):
+        data = self.fetch_columns(obj, fields)
+        if data is None:
+            return None
+        with timed(STAGE_METRIC, stage="transpose", object=obj):
+            return transpose_simauto(data, fields)
+
+
+# AUX exports use the long variable names; map them onto the schema names.
+FIELD_ALIASES = {
+    "BusNomVolt": "NomKV",
+    "AreaNumber": "AreaNum",
+    "ZoneNumber": "ZoneNum",
+    "GenMVR": "GenMvar",
+    "GenStatus": "Status",
+    "LoadSMW": "LoadMW",
+    "LoadSMVR": "LoadMvar",
+    "LoadStatus": "Status",
+    "LineMW": "MW",
+    "LineMVR": "Mvar",
+    "LineStatus": "Status",
+}
+
+_DATA_HEADER = re.compile(r"^DATA\s*\(\s*(\w+)\s*,\s*\[(.*?)\]", re.IGNORECASE | re.DOTALL)
+_LEGACY_HEADER = re.compile(r"^(\w+)\s*\((.*)\)\s*$", re.DOTALL)
+_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def _decode(raw):
+    return raw.decode("utf-8", "ignore").strip()
+
+def _parse_header(header):
+    m = _DATA_HEADER.match(header) or _LEGACY_HEADER.match(header)
+    if not m:
+        return None
+    fields = [f.strip() for f in m.group(2).replace("\n", " ").split(",")]
+    fields = [FIELD_ALIASES.get(f, f) for f in fields if f]
+    return m.group(1).upper(), fields
+
+def _skip_block(f):
+    for raw in iter(f.readline, b""):
+        if _decode(raw).startswith("}"):
+            return
+
+def _block_lines(f):
+    """Yield the body lines of the current block, stopping at its closing brace."""
+    in_subdata = False
+    for raw in iter(f.readline, b""):
+        line = _decode(raw)
+        if in_subdata:
+            in_subdata = not line.upper().startswith("</SUBDATA")
+            continue
+        if line.startswith("}"):
+            return
+        if not line or line.startswith("//"):
+            continue
+        if line.upper().startswith("<SUBDATA"):
+            in_subdata = True
+            continue
+        yield line
+
+def _block_records(f, n_fields):
+    tokens = []
+    for line in _block_lines(f):
+        tokens.extend(q or bare for q, bare in _TOKEN.findall(line))
+        while len(tokens) >= n_fields:
+            yield tokens[:n_fields]
+            tokens = tokens[n_fields:]
+
+def _iter_blocks(f):
+    """Yield (object, fields) for each data block in a binary AUX stream.
+
+    f is left positioned at the start of the block body; the caller must
+    consume it with _block_records or _skip_block before resuming.
+    """
+    pending = None
+    for raw in iter(f.readline, b""):
+        line = _decode(raw)
+        if not line or line.startswith("//"):
+            continue
+        if line.startswith("{"):
+            if pending is None:
+                _skip_block(f)
+            else:
+                yield pending
+                pending = None
+            continue
+        header = line
+        while header.count("(") > header.count(")") or header.count("[") > header.count("]"):
+            nxt = f.readline()
+            if not nxt:
+                break
+            header += " " + _decode(nxt)
+        pending = _parse_header(header)
+
+def iter_aux_records(path, objects=None):
+    """Stream (object, fields, values) records from an AUX file in one pass."""
+    wanted = {o.upper() for o in objects} if objects else None
+    with open(path, "rb") as f:
+        for obj, fields in _iter_blocks(f):
+            if wanted is not None and obj not in wanted:
+                _skip_block(f)
+                continue
+            for values in _block_records(f, len(fields)):
+                yield obj, fields, values
+
+
+class AuxSource:
+    """Reads objects from a PowerWorld AUX export without loading it into memory.
+
+    The first fetch scans the file once to record where each DATA block
+    starts; every fetch then seeks straight to the blocks it needs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._blocks = None
+
+    def _index(self):
+        blocks = {}
+        with open(self.path, "rb") as f:
+            for obj, fields in _iter_blocks(f):
+                blocks.setdefault(obj, []).append((f.tell(), fields))
+                _skip_block(f)
+        return blocks
+
+    def fetch(self, obj, fields):
+        if self._blocks is None:
+            self._blocks = self._index()
+        blocks = self._blocks.get(obj.upper())
+        if not blocks:
+            print(f"No {obj} data in {self.path}")
+            return None
+        return self._rows(blocks, fields)
+
+    def _rows(self, blocks, fields):
+        with open(self.path, "rb") as f:
+            for offset, block_fields in blocks:
+                pos = {name: i for i, name in enumerate(block_fields)}
+                idx = [pos.get(name) for name in fields]
+                f.seek(offset)
+                for values in _block_records(f, len(block_fields)):
+                    yield [None if i is None else values[i] for i in idx]
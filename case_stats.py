@@ -0,0 +1,130 @@
+import json
+import sqlite3
+
+STATS_TABLE = "CaseStats"
+TOP_N = 10
+ONLINE_STATUS = ("closed", "connected", "online", "1")
+
+# ----------------------
+# Case statistics
+# ----------------------
+# Counts and aggregates are computed once, at the end of ingestion, and
+# stored as one JSON value per section in the CaseStats table. Summaries and
+# aggregate answers then read a handful of small rows instead of scanning
+# the element tables.
+
+def table_exists(conn, table):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    return row is not None
+
+def _online(col='"Status"'):
+    statuses = ", ".join(f"'{s}'" for s in ONLINE_STATUS)
+    return f"LOWER(TRIM({col})) IN ({statuses})"
+
+def _injection_stats(conn, table, mw, mvar, key_cols, has_bus, top_n):
+    """Totals, status counts, per-area totals and largest units of Gen or Load."""
+    total_mw, total_mvar, online, count = conn.execute(
+        f'SELECT TOTAL("{mw}"), TOTAL("{mvar}"), TOTAL({_online()}), COUNT(*) FROM "{table}"'
+    ).fetchone()
+    online_mw = conn.execute(f'SELECT TOTAL("{mw}") FROM "{table}" WHERE {_online()}').fetchone()[0]
+    by_area = {}
+    if has_bus:
+        for area, n, a_mw, a_mvar in conn.execute(
+            f'SELECT b."AreaNum", COUNT(*), TOTAL(t."{mw}"), TOTAL(t."{mvar}") '
+            f'FROM "{table}" t JOIN "Bus" b ON b."BusNum" = t."BusNum" GROUP BY b."AreaNum"'
+        ):
+            by_area[str(area)] = {"count": n, "mw": round(a_mw, 3), "mvar": round(a_mvar, 3)}
+    cols = ", ".join(f'"{c}"' for c in key_cols)
+    top = conn.execute(
+        f'SELECT {cols}, "{mw}", "Status" FROM "{table}" WHERE "{mw}" IS NOT NULL ORDER BY "{mw}" DESC LIMIT ?',
+        (top_n,),
+    ).fetchall()
+    return {
+        "count": count,
+        "online": int(online),
+        "offline": count - int(online),
+        "total_mw": round(total_mw, 3),
+        "total_mvar": round(total_mvar, 3),
+        "online_mw": round(online_mw, 3),
+        "by_area": by_area,
+        "top": [list(r) for r in top],
+    }
+
+def online_counts(conn, tables):
+    """In-service row counts of the tables that have a Status column."""
+    return {
+        t: int(conn.execute(f'SELECT TOTAL({_online()}) FROM "{t}"').fetchone()[0])
+        for t in tables if any(col[1] == "Status" for col in conn.execute(f'PRAGMA table_info("{t}")'))
+    }
+
+def compute_stats(conn, tables, top_n=TOP_N):
+    """Statistics for the element tables present in conn."""
+    present = [t for t in tables if table_exists(conn, t)]
+    stats = {"counts": {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in present}}
+    stats["online"] = online_counts(conn, present)
+    has_bus = "Bus" in present
+    if has_bus:
+        stats["bus"] = {
+            "kv_levels": {
+                str(kv): n for kv, n in conn.execute(
+                    'SELECT "NomKV", COUNT(*) FROM "Bus" GROUP BY "NomKV" ORDER BY "NomKV" DESC'
+                )
+            },
+            "by_area": {str(a): n for a, n in conn.execute('SELECT "AreaNum", COUNT(*) FROM "Bus" GROUP BY "AreaNum"')},
+        }
+    if "Area" in present:
+        stats["areas"] = {str(a): name for a, name in conn.execute('SELECT "AreaNum", "AreaName" FROM "Area"')}
+    if "Gen" in present:
+        stats["gen"] = _injection_stats(conn, "Gen", "GenMW", "GenMvar", ["BusNum", "GenID"], has_bus, top_n)
+    if "Load" in present:
+        stats["load"] = _injection_stats(conn, "Load", "LoadMW", "LoadMvar", ["BusNum", "LoadID"], has_bus, top_n)
+    if "Branch" in present:
+        total, online = conn.execute(f'SELECT COUNT(*), TOTAL({_online()}) FROM "Branch"').fetchone()
+        stats["branch"] = {"online": int(online), "offline": total - int(online)}
+    return stats
+
+def write_stats(conn, stats):
+    conn.execute(f'DROP TABLE IF EXISTS "{STATS_TABLE}"')
+    conn.execute(f'CREATE TABLE "{STATS_TABLE}" ("key" TEXT PRIMARY KEY, "value" TEXT)')
+    conn.executemany(
+        f'INSERT INTO "{STATS_TABLE}" VALUES (?, ?)',
+        [(key, json.dumps(value)) for key, value in stats.items()],
+    )
+
+def read_stats(conn):
+    """Stored statistics for the case in conn, or None if it has none."""
+    try:
+        rows = conn.execute(f'SELECT "key", "value" FROM "{STATS_TABLE}"').fetchall()
+    except sqlite3.Error:
+        return None
+    return {key: json.loads(value) for key, value in rows}
+
+def stats_for(conn, tables=("Bus", "Gen", "Load", "Branch")):
+    """Stored statistics, computed on the fly for databases ingested before CaseStats existed."""
+    stats = read_stats(conn)
+    if stats is None:
+        return compute_stats(conn, tables)
+    if "online" not in stats:
+        # Stored before in-service counts were kept per table.
+        stats["online"] = online_counts(conn, stats.get("counts", {}))
+    return stats
+
+def load_stats(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return stats_for(conn)
+    finally:
+        conn.close()
+
+def count(stats, table):
+    return stats.get("counts", {}).get(table, 0)
+
+def online_count(stats, table):
+    """In-service rows of table, or None if it has no Status column."""
+    return stats.get("online", {}).get(table)
+
+def summary_sentence(stats):
+    return (f"This case contains {count(stats, 'Bus')} buses, "
+            f"{count(stats, 'Gen')} generators, "
+            f"{count(stats, 'Load')} loads, and "
+            f"{count(stats, 'Branch')} branches.")
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+CASES_DIR = os.environ.get("CASE_STORE_DIR", os.path.join(os.getcwd(), "cases"))
+MAX_STORE_BYTES = int(os.environ.get("CASE_STORE_MAX_BYTES", 20 * 1024 ** 3))
+MAX_CASES = int(os.environ.get("CASE_STORE_MAX_CASES", 50))
+
+
+def save_hashed(stream, path, chunk_size=1024 * 1024):
+    """Write an upload stream to path, hashing it on the way; returns its case id."""
+    h = hashlib.sha256()
+    with open(path, "wb") as f:
+        for chunk in iter(lambda: stream.read(chunk_size), b""):
+            h.update(chunk)
+            f.write(chunk)
+    return h.hexdigest()[:16]
+
+
+class CaseStore:
+    """One SQLite database per case, keyed by the hash of the uploaded file.
+
+    An index database tracks size and last use of every case so the store
+    can evict least recently used cases once it grows past its limits. It
+    also remembers which stored case a case was loaded incrementally on top
+    of (its base), so revisions can be diffed against each other.
+    """
+
+    def __init__(self, root=CASES_DIR, max_bytes=MAX_STORE_BYTES, max_cases=MAX_CASES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_cases = max_cases
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cases ("
+                "case_id TEXT PRIMARY KEY, filename TEXT, size_bytes INTEGER, "
+                "created REAL, last_used REAL, base_case_id TEXT)"
+            )
+            columns = [r[1] for r in conn.execute("PRAGMA table_info(cases)")]
+            if "base_case_id" not in columns:
+                conn.execute("ALTER TABLE cases ADD COLUMN base_case_id TEXT")
+
+    def _connect(self):
+        return sqlite3.connect(os.path.join(self.root, "index.db"), timeout=30)
+
+    def db_path(self, case_id):
+        return os.path.join(self.root, f"{case_id}.db")
+
+    def staging_path(self, case_id):
+        return os.path.join(self.root, f"{case_id}.db.tmp")
+
+    def has(self, case_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM cases WHERE case_id=?", (case_id,)).fetchone()
+        return row is not None and os.path.exists(self.db_path(case_id))
+
+    def touch(self, case_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE cases SET last_used=? WHERE case_id=?", (time.time(), case_id))
+
+    def add(self, case_id, filename, base_case_id=None):
+        """Publish the staged database for case_id and evict old cases if needed."""
+        with self._lock:
+            os.replace(self.staging_path(case_id), self.db_path(case_id))
+            now = time.time()
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cases (case_id, filename, size_bytes, created, last_used, base_case_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (case_id, filename, os.path.getsize(self.db_path(case_id)), now, now, base_case_id),
+                )
+            self._evict(keep=case_id)
+
+    def latest(self):
+        with self._connect() as conn:
+            row = conn.execute("SELECT case_id FROM cases ORDER BY last_used DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def latest_version(self, filename):
+        """Most recently added case uploaded under filename, or None."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT case_id FROM cases WHERE filename=? ORDER BY created DESC", (filename,)
+            ).fetchall()
+        return next((case_id for case_id, in rows if self.has(case_id)), None)
+
+    def base_of(self, case_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT base_case_id FROM cases WHERE case_id=?", (case_id,)).fetchone()
+        return row[0] if row else None
+
+    def list_cases(self):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT case_id, filename, size_bytes, created, last_used, base_case_id FROM cases "
+                "ORDER BY last_used DESC"
+            ).fetchall()
+        cols = ["case_id", "filename", "size_bytes", "created", "last_used", "base_case_id"]
+        return [dict(zip(cols, r)) for r in rows]
+
+    def resolve(self, case_id=None):
+        """Database path for case_id (default: most recently used case), or None."""
+        case_id = case_id or self.latest()
+        if not case_id or not self.has(case_id):
+            return None
+        self.touch(case_id)
+        return self.db_path(case_id)
+
+    def _evict(self, keep=None):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT case_id, size_bytes FROM cases ORDER BY last_used ASC").fetchall()
+            total = sum(size for _, size in rows)
+            count = len(rows)
+            for case_id, size in rows:
+                if total <= self.max_bytes and count <= self.max_cases:
+                    break
+                if case_id == keep:
+                    continue
+                print(f"Evicting case {case_id} ({size} bytes)")
+                for suffix in ("", "-wal", "-shm"):
+                    try:
+                        os.remove(self.db_path(case_id) + suffix)
+                    except FileNotFoundError:
+                        pass
+                conn.execute("DELETE FROM cases WHERE case_id=?", (case_id,))
+                total -= size
+                count -= 1
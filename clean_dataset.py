@@ -1,52 +1,305 @@
+import argparse
+import glob
+import heapq
 import json
-from collections import OrderedDict
+import multiprocessing as mp
+import os
+import re
+import tempfile
+import time
+import zlib
+from collections import deque
+from hashlib import blake2b
+
+import numpy as np
+
+from make_dataset import open_shard
 
 INPUT_FILE = "dataset.jsonl"
 OUTPUT_FILE = "cleaned_dataset.jsonl"
+CHUNK_LINES = 5000
+PARTITION_BYTES = 256 * 2**20   # input bytes per dedup partition; bounds memory per worker
+NUM_PERM = 64
+LSH_BANDS = 16                  # 16 bands of 4 rows: ~99% of pairs at 0.7 Jaccard become candidates
+SHINGLE = 2
+NEAR_THRESHOLD = 0.7            # estimated Jaccard at which a candidate counts as a near-duplicate
+SEED = 1
+
+# ----------------------
+# Normalization
+# ----------------------
+# Fixes apply to whole words only, so "gens" becomes "generators" without
+# touching "generators" itself.
+WORD_FIXES = {"buss": "buses", "gens": "generators", "branchs": "branches"}
+WORD_FIX_RE = re.compile(r"\b(" + "|".join(WORD_FIXES) + r")\b")
+CASE_CONTAINS_RE = re.compile(r"^(?:[Tt]his case|[Cc]ase) contains\b")
+ZERO_CASE_RE = re.compile(r"\b0 buses\b.*\b0 generators\b")
+SPACE_RE = re.compile(r"\s+")
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:\.[0-9]+)?")
+# Politeness words carry no content; dropping them (along with the
+# punctuation TOKEN_RE never matches) keeps "Number of lines please?" and
+# "Number of lines?" from looking like different questions.
+FILLER_WORDS = {"please", "pls", "plz", "kindly", "thanks", "thx"}
+
+def normalize_text(text):
+    return SPACE_RE.sub(" ", text).strip()
+
+def dedup_tokens(text):
+    """Lowercased content tokens of text, as compared by near-duplicate detection."""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in FILLER_WORDS]
 
 def normalize_output(text):
-    return (
-        text.replace("buss", "buses")
-            .replace("gens", "generators")
-            .replace("branchs", "branches")
-            .replace("case contains", "This case contains")
-            .replace("Case contains", "This case contains")
-    )
+    text = WORD_FIX_RE.sub(lambda m: WORD_FIXES[m.group(1)], normalize_text(text))
+    return CASE_CONTAINS_RE.sub("This case contains", text)
 
-def main():
-    seen_instructions = OrderedDict()
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                item = json.loads(line)
-                instr = item["instruction"].strip()
-                output = normalize_output(item["output"].strip())
 
-                # Skip if already seen
-                if instr in seen_instructions:
-                    continue
+# ----------------------
+# Hashing
+# ----------------------
+_rng = np.random.default_rng(SEED)
+PERM_A = _rng.integers(1, 2**32, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+PERM_B = _rng.integers(0, 2**32, NUM_PERM, dtype=np.uint64)
+BAND_MIX = _rng.integers(1, 2**63, NUM_PERM // LSH_BANDS, dtype=np.uint64) | np.uint64(1)
+MASK32 = np.uint64(0xFFFFFFFF)
+
+def hash64(*parts):
+    h = blake2b(digest_size=8)
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x1f")
+    return int.from_bytes(h.digest(), "big")
+
+def facts_key(tokens):
+    """Hash of the numbers and identifiers in a pair; only pairs with equal facts can be duplicates."""
+    return hash64(" ".join(sorted(t for t in tokens if not t.isalpha())))
+
+def minhash_batch(texts):
+    """MinHash signatures of word SHINGLE-grams for a batch of token lists, as a (len(texts), NUM_PERM) array."""
+    shingles, offsets = [], []
+    for tokens in texts:
+        offsets.append(len(shingles))
+        shingles += [" ".join(tokens[i:i + SHINGLE]) for i in range(max(1, len(tokens) - SHINGLE + 1))]
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    hashed = (PERM_A[:, None] * x[None, :] + PERM_B[:, None]) & MASK32
+    return np.minimum.reduceat(hashed, offsets, axis=1).T.astype(np.uint32)
+
+def lsh_bands(signatures, facts):
+    """Band hashes per signature, salted with the pair's facts key so only equal facts can collide."""
+    rows = NUM_PERM // LSH_BANDS
+    sig = signatures.astype(np.uint64).reshape(len(signatures), LSH_BANDS, rows)
+    bands = (sig * BAND_MIX).sum(axis=2, dtype=np.uint64)
+    bands ^= np.arange(LSH_BANDS, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    bands ^= np.array(facts, dtype=np.uint64)[:, None]
+    return bands.tolist()
+
+
+# ----------------------
+# Stages
+# ----------------------
+# 1. Workers parse, normalize and filter chunks of lines. The main process
+#    writes each surviving record, tagged with its input position, to one of
+#    N partition files chosen by its facts key. Duplicates (exact or near)
+#    always state the same facts, so they always land in the same partition.
+# 2. Each partition is deduplicated in memory by its own worker: exact
+#    matches by hash, near matches by MinHash/LSH with every candidate
+#    checked against the stored signature. Partitions are sized from the
+#    input so each fits comfortably in RAM.
+# 3. The kept records are merged back into input order. The first
+#    occurrence always wins, so the output does not depend on the process or
+#    partition count.
+
+def prepare_chunk(lines):
+    start = time.perf_counter()
+    dropped, kept = [], []
+    for line in lines:
+        try:
+            item = json.loads(line)
+            instr = normalize_text(item["instruction"])
+            output = normalize_output(item["output"])
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+            dropped.append("invalid")
+            continue
+        if not instr or not output:
+            dropped.append("empty")
+            continue
+        if ZERO_CASE_RE.search(output):
+            dropped.append("zero_case")
+            continue
+        tokens = TOKEN_RE.findall(f"{instr} {output}".lower())
+        record = json.dumps({"instruction": instr, "input": "", "output": output}, ensure_ascii=False)
+        kept.append((facts_key(tokens), record))
+    return dropped, kept, time.perf_counter() - start
 
-                # Optional: filter out zero-output examples
-                if "0 buses" in output and "0 generators" in output:
+def dedup_partition(job):
+    in_path, out_path, near = job
+    counts = {"exact_dup": 0, "near_dup": 0}
+    times = {"exact": 0.0, "near": 0.0}
+    seen, owners, signatures = set(), {}, []
+    with open(in_path, "r", encoding="utf-8") as f, open(out_path, "w", encoding="utf-8") as out:
+        while True:
+            lines = [line for _, line in zip(range(CHUNK_LINES), f)]
+            if not lines:
+                break
+            t0 = time.perf_counter()
+            unique = []
+            for line in lines:
+                seq, facts, record = line.rstrip("\n").split("\t", 2)
+                item = json.loads(record)
+                key = hash64(item["instruction"].lower(), item["output"].lower())
+                if key in seen:
+                    counts["exact_dup"] += 1
                     continue
+                seen.add(key)
+                unique.append((seq, int(facts), record, item))
+            t1 = time.perf_counter()
+            times["exact"] += t1 - t0
 
-                seen_instructions[instr] = {
-                    "instruction": instr,
-                    "input": "",
-                    "output": output
-                }
+            if near and unique:
+                sigs = minhash_batch([dedup_tokens(f"{it['instruction']} {it['output']}") for _, _, _, it in unique])
+                kept = []
+                all_bands = lsh_bands(sigs, [facts for _, facts, _, _ in unique])
+                for (seq, _, record, _), sig, bands in zip(unique, sigs, all_bands):
+                    candidates = {owners[b] for b in bands if b in owners}
+                    if any((signatures[c] == sig).mean() >= NEAR_THRESHOLD for c in candidates):
+                        counts["near_dup"] += 1
+                        continue
+                    for b in bands:
+                        owners.setdefault(b, len(signatures))
+                    signatures.append(sig)
+                    kept.append((seq, None, record, None))
+                unique = kept
+                times["near"] += time.perf_counter() - t1
 
-            except json.JSONDecodeError:
-                continue
+            for seq, _, record, _ in unique:
+                out.write(f"{seq}\t{record}\n")
+    os.remove(in_path)
+    return counts, times
 
-    # Write cleaned version
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        for item in seen_instructions.values():
-            json.dump(item, f)
-            f.write("\n")
+def input_files(paths):
+    """Expand directories written by make_dataset.py into their shards, in manifest order."""
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+        elif os.path.exists(os.path.join(path, "manifest.json")):
+            with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+                files += [os.path.join(path, s["file"]) for s in json.load(f)["shards"]]
+        else:
+            files += sorted(glob.glob(os.path.join(path, "*.jsonl*")))
+    return files
+
+def read_chunks(files, size):
+    chunk = []
+    for path in files:
+        with open_shard(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    chunk.append(line)
+                    if len(chunk) >= size:
+                        yield chunk
+                        chunk = []
+    if chunk:
+        yield chunk
+
+def bounded_map(pool, func, jobs, window):
+    """pool.imap with at most `window` chunks in flight, keeping memory flat on huge inputs."""
+    pending = deque()
+    for job in jobs:
+        pending.append(pool.apply_async(func, (job,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+def default_partitions(files):
+    # Compressed shards hold roughly five times their size in text.
+    size = sum(os.path.getsize(p) * (5 if p.endswith(".gz") else 1) for p in files)
+    return max(1, -(-size // PARTITION_BYTES))
+
+def read_partition(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            seq, record = line.split("\t", 1)
+            yield int(seq), record
+
+def clean(paths, out_path, processes=None, near=True, partitions=None, tmp_dir=None):
+    """Stream the inputs through normalization, exact and near-duplicate removal into out_path."""
+    processes = processes or os.cpu_count()
+    files = input_files(paths)
+    partitions = partitions or default_partitions(files)
+    counts = {"read": 0, "invalid": 0, "empty": 0, "zero_case": 0, "exact_dup": 0, "near_dup": 0, "written": 0}
+    times = {"prepare": 0.0, "partition": 0.0, "exact": 0.0, "near": 0.0, "merge": 0.0}
+    start = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp, mp.get_context("spawn").Pool(processes) as pool:
+        parts = [os.path.join(tmp, f"part-{i:04d}.tsv") for i in range(partitions)]
+        writers = [open(p, "w", encoding="utf-8") for p in parts]
+        seq = 0
+        for dropped, kept, worker_seconds in bounded_map(pool, prepare_chunk, read_chunks(files, CHUNK_LINES),
+                                                         processes * 2):
+            times["prepare"] += worker_seconds
+            counts["read"] += len(dropped) + len(kept)
+            for reason in dropped:
+                counts[reason] += 1
+            t0 = time.perf_counter()
+            for facts, record in kept:
+                writers[facts % partitions].write(f"{seq}\t{facts}\t{record}\n")
+                seq += 1
+            times["partition"] += time.perf_counter() - t0
+        for w in writers:
+            w.close()
+
+        jobs = [(p, p[:-4] + ".kept", near) for p in parts]
+        for part_counts, part_times in pool.imap_unordered(dedup_partition, jobs):
+            for name, n in part_counts.items():
+                counts[name] += n
+            for name, seconds in part_times.items():
+                times[name] += seconds
+
+        t0 = time.perf_counter()
+        with open_shard(out_path, "w") as out:
+            for _, record in heapq.merge(*(read_partition(job[1]) for job in jobs)):
+                out.write(record)
+                counts["written"] += 1
+        times["merge"] = time.perf_counter() - t0
+
+    report(counts, times, time.perf_counter() - start, processes, partitions)
+    return counts
+
+def report(counts, times, elapsed, processes, partitions):
+    def rate(n, seconds):
+        return f"{n / seconds:,.0f}/s" if seconds else "-"
+
+    valid = counts["read"] - counts["invalid"] - counts["empty"] - counts["zero_case"]
+    unique = valid - counts["exact_dup"]
+    print(f" Read {counts['read']:,} examples in {elapsed:.2f}s ({rate(counts['read'], elapsed)} overall, "
+          f"{processes} processes, {partitions} partitions)")
+    print(f"  parse+normalize: {rate(counts['read'], times['prepare'])} per worker, removed "
+          f"{counts['invalid']:,} invalid, {counts['empty']:,} empty, {counts['zero_case']:,} zero-case")
+    print(f"  partition: {rate(valid, times['partition'])}")
+    print(f"  exact dedup: {rate(valid, times['exact'])} per worker, removed {counts['exact_dup']:,}")
+    if times["near"]:
+        print(f"  near dedup (MinHash/LSH): {rate(unique, times['near'])} per worker, removed {counts['near_dup']:,}")
+    print(f"  merge+write: {rate(counts['written'], times['merge'])}, kept {counts['written']:,}")
+
+
+# ----------------------
+# Main
+# ----------------------
+def main():
+    parser = argparse.ArgumentParser(description="Normalize and deduplicate a JSONL instruction dataset.")
+    parser.add_argument("--input", nargs="+", default=[INPUT_FILE],
+                        help="JSONL files (.gz ok) or shard directories from make_dataset.py")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--no-near", action="store_true", help="skip MinHash near-duplicate removal")
+    parser.add_argument("--partitions", type=int,
+                        help=f"dedup partitions (default: one per {PARTITION_BYTES // 2**20} MB of input)")
+    parser.add_argument("--tmp-dir", help="where partition files go")
+    args = parser.parse_args()
 
-    print(f" Cleaned dataset written to {OUTPUT_FILE}")
-    print(f" Total examples: {len(seen_instructions)}")
+    clean(args.input, args.output, args.processes, not args.no_near, args.partitions, args.tmp_dir)
+    print(f" Cleaned dataset written to {args.output}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,308 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+from case_stats import ONLINE_STATUS, table_exists
+from ingest import CASE_SCHEMA
+from metrics import inc
+
+STORE_TABLES = ("Bus", "Gen", "Load", "Branch")
+BUS_ATTRIBUTES = ("AreaNum", "ZoneNum", "NomKV")
+CACHE_SIZE = int(os.environ.get("COLUMN_CACHE_SIZE", 8))
+HIST_BINS = 10
+MAX_TOP = 1000
+
+# ----------------------
+# Column store
+# ----------------------
+# The element tables of a case are loaded once into typed NumPy columns:
+# numbers as float64 (missing values are NaN), text as categorical codes
+# into a sorted array of distinct values. Filters, group-bys, sums, top-k
+# and histograms then run as whole-column operations instead of SQL scans
+# over TEXT columns. Gen, Load and Branch rows also see the AreaNum, ZoneNum
+# and NomKV of their (from) bus through a BusNum join computed once, and
+# every table with a Status column gets a boolean "Online" column.
+
+Categorical = namedtuple("Categorical", ["codes", "categories"])
+
+def _numbers(values):
+    try:
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        out = np.full(len(values), np.nan)
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+def _categorical(values):
+    # Codes are assigned with a dict in one pass; only the distinct values are
+    # cleaned and sorted, then the codes are remapped to that order.
+    index = {}
+    codes = np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int32, count=len(values))
+    distinct = np.array(["" if v is None else str(v).strip() for v in index] + [""], dtype=object)[:-1]
+    categories, remap = np.unique(distinct, return_inverse=True)
+    return Categorical(remap.ravel().astype(np.int32)[codes], categories)
+
+
+class CaseColumns:
+    """Typed columns of one case's element tables, with vectorized queries."""
+
+    def __init__(self, tables, types):
+        self.tables = tables
+        self.types = types
+        self._derived = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_db(cls, conn):
+        tables, types = {}, {}
+        for table in STORE_TABLES:
+            if not table_exists(conn, table):
+                continue
+            schema = CASE_SCHEMA[table]
+            col_list = ", ".join(f'"{name}"' for name, _ in schema)
+            rows = conn.execute(f'SELECT {col_list} FROM "{table}"').fetchall()
+            data = list(zip(*rows)) if rows else [()] * len(schema)
+            tables[table] = {
+                name: _categorical(values) if sql_type == "TEXT" else _numbers(values)
+                for (name, sql_type), values in zip(schema, data)
+            }
+            types[table] = dict(schema)
+        return cls(tables, types)
+
+    def rows(self, table):
+        columns = self.tables[table]
+        return len(next(iter(columns.values()))) if columns else 0
+
+    def has_column(self, table, name):
+        if table not in self.tables:
+            return False
+        return (name in self.tables[table] or (name == "Online" and "Status" in self.tables[table])
+                or (name in BUS_ATTRIBUTES and table != "Bus" and "Bus" in self.tables))
+
+    def column(self, table, name):
+        """A stored column, or one derived from Status or the joined Bus row."""
+        if table not in self.tables:
+            raise ValueError(f"No {table} data in this case")
+        columns = self.tables[table]
+        if name in columns:
+            return columns[name]
+        if not self.has_column(table, name):
+            raise ValueError(f"Unknown column {name} for {table}")
+        with self._lock:
+            key = (table, name)
+            if key not in self._derived:
+                if name == "Online":
+                    status = columns["Status"]
+                    online = np.array([c.lower() in ONLINE_STATUS for c in status.categories], dtype=bool)
+                    self._derived[key] = online[status.codes]
+                else:
+                    self._derived[key] = self._bus_column(table, name)
+            return self._derived[key]
+
+    def _bus_column(self, table, name):
+        bus_nums = self.tables["Bus"]["BusNum"]
+        order = np.argsort(bus_nums, kind="stable")
+        sorted_nums = bus_nums[order]
+        own = self.tables[table]["BusNum"]
+        pos = np.searchsorted(sorted_nums, own).clip(max=max(len(sorted_nums) - 1, 0))
+        found = (sorted_nums[pos] == own) if len(sorted_nums) else np.zeros(len(own), dtype=bool)
+        values = self.tables["Bus"][name][order][pos] if len(sorted_nums) else np.zeros(len(own))
+        return np.where(found, values, np.nan)
+
+    def numeric(self, table, name):
+        col = self.column(table, name)
+        if isinstance(col, Categorical):
+            raise ValueError(f"{table}.{name} is not numeric")
+        return col.astype(np.float64) if col.dtype == bool else col
+
+    def decode(self, table, name, index):
+        """Plain Python values of a column at the given row positions."""
+        col = self.column(table, name)
+        if isinstance(col, Categorical):
+            return col.categories[col.codes[index]].tolist()
+        return self.plain(table, name, col[index])
+
+    def plain(self, table, name, values):
+        if values.dtype == bool:
+            return values.tolist()
+        source = table if name in self.types[table] else "Bus"
+        integer = self.types[source].get(name) == "INTEGER"
+        return [None if np.isnan(v) else int(v) if integer else float(v) for v in values]
+
+    # Filters ------------------------------------------------------------
+
+    def mask(self, table, where=()):
+        """Boolean row mask for a list of [column, op, value] conditions (all must hold)."""
+        mask = np.ones(self.rows(table), dtype=bool)
+        for condition in where:
+            try:
+                name, op, value = condition
+            except (TypeError, ValueError):
+                raise ValueError(f"Conditions are [column, op, value], got {condition!r}")
+            if op not in OPS:
+                raise ValueError(f"Unknown operator {op!r}; use one of {', '.join(OPS)}")
+            col = self.column(table, name)
+            if isinstance(col, Categorical):
+                # Compare the distinct values once, then look the result up per row.
+                cats = col.categories.astype(str)
+                if op == "in":
+                    hit = np.isin(np.char.lower(cats), [str(v).lower() for v in value])
+                elif op in ("=", "!="):
+                    hit = np.char.lower(cats) == str(value).lower()
+                    hit = hit if op == "=" else ~hit
+                else:
+                    hit = OPS[op](cats, str(value))
+                mask &= hit[col.codes]
+            elif op == "in":
+                mask &= np.isin(col, [float(v) for v in value])
+            else:
+                mask &= OPS[op](col, bool(value) if col.dtype == bool else float(value))
+        return mask
+
+
+OPS = {
+    "=": np.equal, "!=": np.not_equal, "<": np.less, "<=": np.less_equal,
+    ">": np.greater, ">=": np.greater_equal, "in": None,
+}
+AGGREGATES = {
+    "count": None, "sum": np.sum, "mean": np.mean, "median": np.median, "min": np.min, "max": np.max,
+}
+
+
+# ----------------------
+# Queries
+# ----------------------
+# A query is a small dict (also the body of the /query endpoint):
+#   {"table": "Gen", "where": [["AreaNum", "=", 2], ["Online", "=", true]],
+#    then one of
+#    "agg": "sum", "column": "GenMW", optionally "group_by": "AreaNum"
+#    "top": 10, "column": "LoadMW", optionally "order": "asc", "abs": true
+#    "histogram": "NomKV", optionally "bins": 10}
+
+def _group_keys(cols, table, name, mask):
+    col = cols.column(table, name)
+    if isinstance(col, Categorical):
+        codes = col.codes[mask]
+        present = np.unique(codes)
+        return np.searchsorted(present, codes), col.categories[present].tolist()
+    keys, inverse = np.unique(col[mask], return_inverse=True)
+    return inverse.ravel(), cols.plain(table, name, keys)
+
+def aggregate(cols, table, mask, agg, column=None, group_by=None):
+    if agg not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate {agg!r}; use one of {', '.join(AGGREGATES)}")
+    if agg != "count" and column is None:
+        raise ValueError(f"{agg} needs a column")
+    if column is not None and agg != "count":
+        values = cols.numeric(table, column)
+        mask = mask & ~np.isnan(values)
+        values = values[mask]
+    if group_by is None:
+        n = int(mask.sum())
+        value = n if agg == "count" else (float(AGGREGATES[agg](values)) if n else None)
+        return {"count": n, "value": value}
+
+    inverse, labels = _group_keys(cols, table, group_by, mask)
+    counts = np.bincount(inverse, minlength=len(labels))
+    if agg == "count":
+        values_by_group = counts
+    elif agg in ("sum", "mean"):
+        sums = np.bincount(inverse, weights=values, minlength=len(labels))
+        values_by_group = sums if agg == "sum" else sums / np.maximum(counts, 1)
+    elif agg in ("min", "max"):
+        values_by_group = np.full(len(labels), np.inf if agg == "min" else -np.inf)
+        (np.minimum if agg == "min" else np.maximum).at(values_by_group, inverse, values)
+    else:
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.cumsum(counts)[:-1]
+        values_by_group = [np.median(g) for g in np.split(values[order], bounds)]
+    return {"groups": [{"key": key, "count": int(n), "value": float(v) if agg != "count" else int(v)}
+                       for key, n, v in zip(labels, counts, values_by_group)]}
+
+def top_rows(cols, table, mask, column, k, ascending=False, absolute=False):
+    """Rows with the k largest (or smallest) values of column among the masked rows."""
+    k = max(1, min(int(k), MAX_TOP))
+    values = cols.numeric(table, column)
+    candidates = np.flatnonzero(mask & ~np.isnan(values))
+    keys = values[candidates]
+    if absolute:
+        keys = np.abs(keys)
+    if not ascending:
+        keys = -keys
+    if len(candidates) > k:
+        part = np.argpartition(keys, k - 1)[:k]
+        candidates, keys = candidates[part], keys[part]
+    picked = candidates[np.argsort(keys, kind="stable")]
+    names = list(cols.tables[table])
+    decoded = {name: cols.decode(table, name, picked) for name in names}
+    return [{name: decoded[name][i] for name in names} for i in range(len(picked))]
+
+def histogram(cols, table, mask, column, bins=HIST_BINS):
+    """Counts per value when a column has at most `bins` distinct values, else per equal-width bin."""
+    values = cols.numeric(table, column)
+    values = values[mask & ~np.isnan(values)]
+    distinct, counts = np.unique(values, return_counts=True)
+    if len(distinct) <= bins:
+        return {"values": distinct.tolist(), "counts": counts.tolist()}
+    counts, edges = np.histogram(values, bins=bins)
+    return {"edges": edges.tolist(), "counts": counts.tolist()}
+
+def run_query(cols, query):
+    """Evaluate a query dict (see above) and return a JSON-ready result."""
+    table = query.get("table")
+    if table not in cols.tables:
+        raise ValueError(f"Unknown or empty table {table!r}; query one of {', '.join(cols.tables)}")
+    mask = cols.mask(table, query.get("where") or ())
+    result = {"table": table, "matched": int(mask.sum())}
+    if "histogram" in query:
+        result["histogram"] = histogram(cols, table, mask, query["histogram"], int(query.get("bins", HIST_BINS)))
+    elif "top" in query:
+        if "column" not in query:
+            raise ValueError("top needs a column")
+        result["rows"] = top_rows(cols, table, mask, query["column"], query["top"],
+                                  query.get("order") == "asc", bool(query.get("abs")))
+    else:
+        result.update(aggregate(cols, table, mask, query.get("agg", "count"), query.get("column"),
+                                query.get("group_by")))
+    return result
+
+
+# ----------------------
+# Per-case cache
+# ----------------------
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def invalidate(db_path):
+    with _cache_lock:
+        _cache.pop(db_path, None)
+
+def columns_for(conn, db_path=None):
+    """Column store for the case in conn, loaded once per database file version.
+
+    Entries are keyed by the file's mtime as well, so a re-ingested case is
+    reloaded even if invalidate() was not called.
+    """
+    path = db_path or conn.execute("PRAGMA database_list").fetchone()[2]
+    mtime = os.path.getmtime(path) if path else None
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            _cache.move_to_end(path)
+            inc("pw_cache_requests_total", cache="columns", result="hit")
+            return cached[1]
+    inc("pw_cache_requests_total", cache="columns", result="miss")
+    cols = CaseColumns.from_db(conn)
+    if path:
+        with _cache_lock:
+            _cache[path] = (mtime, cols)
+            _cache.move_to_end(path)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return cols
@@ -0,0 +1,95 @@
+import numpy as np
+
+from metrics import timed
+
+# numpy >= 2 ships the string ufuncs as np.strings; older releases only have np.char.
+_str = getattr(np, "strings", np.char)
+
+# ----------------------
+# Columnar SimAuto results
+# ----------------------
+# SimAuto returns one tuple per field. These helpers keep that layout as
+# NumPy columns, validate and type whole columns at once, and hand the
+# writer lazy row batches, so no per-row Python lists are ever built.
+
+def _text_column(values):
+    col = np.asarray(values)
+    if col.dtype.kind not in "US":
+        col = np.where(np.equal(col, None), "", col).astype(str)
+    return _str.strip(col)
+
+def simauto_columns(data, fields):
+    """Raw SimAuto data (column- or row-major) as one sequence per field."""
+    if not data:
+        return []
+    n_fields = len(fields)
+    column_major = (
+        len(data) == n_fields and
+        all(hasattr(col, "__iter__") and not isinstance(col, (str, bytes)) for col in data)
+    )
+    if column_major:
+        n = min(len(col) for col in data)
+        return [col[:n] for col in data]
+    rows = np.array([r[:n_fields] for r in data], dtype=object)
+    return [rows[:, i] for i in range(n_fields)]
+
+def valid_mask(columns, rules):
+    numeric, nonempty = rules
+    mask = np.ones(len(columns[0]), dtype=bool)
+    for i in numeric:
+        mask &= _str.isdigit(_text_column(columns[i]))
+    for i in nonempty:
+        mask &= _str.str_len(_text_column(columns[i])) > 0
+    return mask
+
+def _parse_float(v):
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+def _to_float(values):
+    # float() over the raw strings runs in C and is much faster than
+    # astype(float64) on a unicode array; blanks and junk take the slow path.
+    try:
+        return np.fromiter(map(float, values), dtype=np.float64, count=len(values))
+    except (TypeError, ValueError):
+        return np.fromiter(map(_parse_float, values), dtype=np.float64, count=len(values))
+
+def _with_nulls(values, missing):
+    values = values.astype(object)
+    values[missing] = None
+    return values.tolist()
+
+def typed_columns(columns, schema_columns, mask):
+    """Convert the rows selected by mask to Python values for the INTEGER/REAL/TEXT schema."""
+    typed = []
+    for col, (_, sql_type) in zip(columns, schema_columns):
+        if sql_type == "INTEGER":
+            f = _to_float(col)[mask]
+            missing = np.isnan(f)
+            typed.append(_with_nulls(np.where(missing, 0, f).astype(np.int64), missing))
+        elif sql_type == "REAL":
+            f = _to_float(col)[mask]
+            typed.append(_with_nulls(f, np.isnan(f)))
+        else:
+            typed.append(_text_column(col)[mask].tolist())
+    return typed
+
+def column_batches(data, schema_columns, rules, batch_size, obj=None):
+    """Yield (row_count, rows) batches; rows is a lazy iterator of tuples.
+
+    obj labels the stage timings (see metrics.py).
+    """
+    with timed("pw_ingest_stage_seconds", stage="transpose", object=obj):
+        columns = simauto_columns(data, [name for name, _ in schema_columns])
+    if not columns or len(columns[0]) == 0:
+        return
+    with timed("pw_ingest_stage_seconds", stage="validate", object=obj):
+        mask = valid_mask(columns, rules)
+    with timed("pw_ingest_stage_seconds", stage="convert", object=obj):
+        values = typed_columns(columns, schema_columns, mask)
+    n = len(values[0])
+    for start in range(0, n, batch_size):
+        stop = min(start + batch_size, n)
+        yield stop - start, zip(*(v[start:stop] for v in values))
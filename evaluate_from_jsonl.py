@@ -1,13 +1,21 @@
-import requests
-import json
+import argparse
 import csv
-import time
 import difflib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 INPUT_FILE = "cleaned_dataset.jsonl"
 OUTPUT_CSV = "eval_from_jsonl.csv"
 FLASK_URL = "http://localhost:5000/ask"  # make sure your Flask app is running
+CSV_FIELDS = ["Instruction", "Expected", "Predicted", "Exact Match", "F1 Score", "Hallucinated", "Latency (s)"]
 
+# ----------------------
+# Scoring
+# ----------------------
 def f1_score(pred, gold):
     pred_tokens = pred.lower().split()
     gold_tokens = gold.lower().split()
@@ -22,63 +30,221 @@ def hallucinated(pred, gold):
     similarity = difflib.SequenceMatcher(None, pred.lower(), gold.lower()).ratio()
     return similarity < 0.5 and pred.lower() != gold.lower()
 
-def query_flask(instruction):
-    start = time.time()
-    try:
-        response = requests.post(FLASK_URL, json={"question": instruction})
-        answer = response.json().get("answer", "").strip()
-    except Exception as e:
-        answer = f"[Error] {e}"
-    end = time.time()
-    return answer, round(end - start, 3)
+def score(pair):
+    pred, gold = pair
+    return pred.lower() == gold.lower(), round(f1_score(pred, gold), 2), hallucinated(pred, gold)
 
-results = []
 
-with open(INPUT_FILE, 'r') as f:
-    for i, line in enumerate(f, 1):
-        try:
-            item = json.loads(line)
-            instruction = item.get("instruction", "").strip()
-            expected = item.get("output", "").strip()
-            
-            print(f"[{i}] Asking: {instruction}")
-            predicted, latency = query_flask(instruction)
-
-            em = predicted.lower() == expected.lower()
-            f1 = round(f1_score(predicted, expected), 2)
-            halluc = hallucinated(predicted, expected)
-
-            print(f"   Expected: {expected}")
-            print(f"   Predicted: {predicted}")
-            print(f"   EM: {em} | F1: {f1} | Hallucinated: {halluc} | {latency}s")
-
-            results.append({
-                "Instruction": instruction,
-                "Expected": expected,
-                "Predicted": predicted,
-                "Exact Match": em,
-                "F1 Score": f1,
-                "Hallucinated": halluc,
-                "Latency (s)": latency
-            })
+# ----------------------
+# Clients
+# ----------------------
+# Each load thread gets its own client: a pooled requests.Session against a
+# running server, or a Flask test client that calls the app in-process.
+class HttpClient:
+    def __init__(self, url, pool_size):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def ask(self, payload):
+        response = self.session.post(self.url, json=payload, timeout=300)
+        response.raise_for_status()
+        return response.json().get("answer", "").strip()
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def ask(self, payload):
+        response = self.client.post("/ask", json=payload)
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return response.get_json().get("answer", "").strip()
+
+
+def client_factory(args):
+    if args.in_process:
+        import app as flask_app
+        return lambda: InProcessClient(flask_app.app)
+    return lambda: HttpClient(args.url, args.concurrency)
+
+
+# ----------------------
+# Load generation
+# ----------------------
+def load_items(path, limit=None):
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f, 1):
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {i}: {e}")
+                continue
+            items.append((item.get("instruction", "").strip(), item.get("output", "").strip()))
+            if limit and len(items) >= limit:
+                break
+    return items
+
+def run_load(items, make_client, concurrency, qps=0.0, case_id=None):
+    """Ask every question with `concurrency` threads, paced to `qps` if given.
+
+    Returns one (instruction, expected, predicted, latency, error) per item,
+    in input order, plus the wall-clock time of the run.
+    """
+    local = threading.local()
+    start = time.perf_counter()
 
+    def ask(i):
+        if qps:
+            delay = start + i / qps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if not hasattr(local, "client"):
+            local.client = make_client()
+        instruction, expected = items[i]
+        payload = {"question": instruction}
+        if case_id:
+            payload["case_id"] = case_id
+        t0 = time.perf_counter()
+        try:
+            predicted, error = local.client.ask(payload), None
         except Exception as e:
-            print(f"Error on line {i}: {e}")
-
-# Write results to CSV
-with open(OUTPUT_CSV, "w", newline="") as csvfile:
-    writer = csv.DictWriter(csvfile, fieldnames=results[0].keys())
-    writer.writeheader()
-    writer.writerows(results)
-
-# Summary
-total = len(results)
-em_total = sum(1 for r in results if r["Exact Match"])
-f1_avg = sum(r["F1 Score"] for r in results) / total
-halluc_total = sum(1 for r in results if r["Hallucinated"])
-
-print("\n Evaluation Summary")
-print(f" Exact Match Accuracy: {em_total}/{total} = {em_total / total:.2f}")
-print(f" Average F1 Score: {f1_avg:.2f}")
-print(f" Hallucination Rate: {halluc_total}/{total} = {halluc_total / total:.2f}")
-print(f" Results saved to: {OUTPUT_CSV}")
+            predicted, error = "", str(e)
+        return instruction, expected, predicted, time.perf_counter() - t0, error
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(ask, range(len(items))))
+    return results, time.perf_counter() - start
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return round(sorted_values[int(round(p / 100 * (len(sorted_values) - 1)))], 4)
+
+
+# ----------------------
+# Reports
+# ----------------------
+def summarize(results, scores, elapsed, config):
+    ok = [(r, s) for r, s in zip(results, scores) if r[4] is None]
+    latencies = sorted(r[3] for r, _ in ok)
+    n = len(ok)
+    return {
+        "config": config,
+        "requests": len(results),
+        "succeeded": n,
+        "errors": len(results) - n,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_qps": round(n / elapsed, 2) if elapsed else None,
+        "latency_s": {
+            "mean": round(sum(latencies) / n, 4) if n else None,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": percentile(latencies, 100),
+        },
+        "exact_match": round(sum(s[0] for _, s in ok) / n, 4) if n else None,
+        "f1": round(sum(s[1] for _, s in ok) / n, 4) if n else None,
+        "hallucination_rate": round(sum(s[2] for _, s in ok) / n, 4) if n else None,
+    }
+
+def compare(summary, baseline, max_regression):
+    """Print metric deltas against a previous run; True if any metric regressed past the threshold."""
+    checks = [
+        ("throughput_qps", summary["throughput_qps"], baseline.get("throughput_qps"), False),
+        ("latency p50", summary["latency_s"]["p50"], baseline.get("latency_s", {}).get("p50"), True),
+        ("latency p95", summary["latency_s"]["p95"], baseline.get("latency_s", {}).get("p95"), True),
+        ("latency p99", summary["latency_s"]["p99"], baseline.get("latency_s", {}).get("p99"), True),
+        ("exact_match", summary["exact_match"], baseline.get("exact_match"), False),
+        ("f1", summary["f1"], baseline.get("f1"), False),
+    ]
+    regressed = False
+    print("\n Comparison with baseline")
+    for name, now, before, lower_is_better in checks:
+        if now is None or not before:
+            print(f" {name}: {before} -> {now}")
+            continue
+        change = (now - before) / before
+        worse = change > max_regression if lower_is_better else change < -max_regression
+        regressed |= worse
+        print(f" {name}: {before} -> {now} ({change:+.1%}){'  REGRESSION' if worse else ''}")
+    return regressed
+
+def write_csv(path, results, scores):
+    with open(path, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(CSV_FIELDS)
+        for (instruction, expected, predicted, latency, error), (em, f1, halluc) in zip(results, scores):
+            writer.writerow([instruction, expected, predicted if error is None else f"[Error] {error}",
+                             em, f1, halluc, round(latency, 3)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test and score /ask against a JSONL dataset.")
+    parser.add_argument("--input", default=INPUT_FILE)
+    parser.add_argument("--csv", default=OUTPUT_CSV, help="per-question results")
+    parser.add_argument("--json", help="write the run summary as JSON")
+    parser.add_argument("--baseline", help="summary JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="relative change that counts as a regression (default 0.10)")
+    parser.add_argument("--url", default=FLASK_URL)
+    parser.add_argument("--in-process", action="store_true", help="call the app through Flask's test client")
+    parser.add_argument("--case-id")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--qps", type=float, default=0.0, help="target request rate (0 = as fast as possible)")
+    parser.add_argument("--warmup", type=int, default=10, help="requests sent before measuring")
+    parser.add_argument("--limit", type=int, help="only use the first N questions")
+    parser.add_argument("--repeat", type=int, default=1, help="ask the question set this many times")
+    parser.add_argument("--score-workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    items = load_items(args.input, args.limit) * args.repeat
+    if not items:
+        print(f" No questions found in {args.input}")
+        return 1
+    make_client = client_factory(args)
+
+    if args.warmup:
+        run_load(items[:args.warmup], make_client, args.concurrency, case_id=args.case_id)
+    print(f" Asking {len(items)} questions with concurrency {args.concurrency}"
+          + (f" at {args.qps} qps" if args.qps else ""))
+    results, elapsed = run_load(items, make_client, args.concurrency, args.qps, args.case_id)
+
+    with ProcessPoolExecutor(max_workers=args.score_workers) as pool:
+        scores = list(pool.map(score, [(r[2], r[1]) for r in results], chunksize=64))
+
+    config = {k: v for k, v in vars(args).items() if k not in ("csv", "json", "baseline")}
+    summary = summarize(results, scores, elapsed, config)
+    write_csv(args.csv, results, scores)
+
+    lat = summary["latency_s"]
+    print("\n Evaluation Summary")
+    print(f" Requests: {summary['succeeded']}/{summary['requests']} succeeded ({summary['errors']} errors)")
+    print(f" Throughput: {summary['throughput_qps']} q/s over {summary['elapsed_s']}s")
+    print(f" Latency: p50 {lat['p50']}s | p95 {lat['p95']}s | p99 {lat['p99']}s | max {lat['max']}s")
+    if summary["succeeded"]:
+        print(f" Exact Match Accuracy: {summary['exact_match']:.2f}")
+        print(f" Average F1 Score: {summary['f1']:.2f}")
+        print(f" Hallucination Rate: {summary['hallucination_rate']:.2f}")
+    print(f" Results saved to: {args.csv}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f" Summary saved to: {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(summary, baseline, args.max_regression):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import csv
+import io
+import zipfile
+import zlib
+
+FETCH_SIZE = 5000
+ROW_GROUP_SIZE = 65536
+
+# format -> (file extension, mimetype)
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrows", "application/vnd.apache.arrow.stream"),
+}
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file object that buffers bytes until the caller takes them.
+
+    Lets writers that expect a file (csv, zipfile, pyarrow) feed a streaming
+    HTTP response chunk by chunk.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = bytes(b)
+        self._chunks.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def column_types(conn, table):
+    return [(r[1], (r[2] or "TEXT").upper()) for r in conn.execute(f'PRAGMA table_info("{table}")')]
+
+def _select(conn, table, cols):
+    col_list = ", ".join(f'"{name}"' for name, _ in cols)
+    return conn.execute(f'SELECT {col_list} FROM "{table}"')
+
+# ----------------------
+# Per-table writers
+# ----------------------
+def iter_csv(conn, table):
+    cols = column_types(conn, table)
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow([name for name, _ in cols])
+    cursor = _select(conn, table, cols)
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    tail = buf.getvalue()
+    if tail:
+        yield tail.encode("utf-8")
+
+def _arrow_schema(pa, cols):
+    types = {"INTEGER": pa.int64(), "REAL": pa.float64()}
+    return pa.schema([(name, types.get(sql_type, pa.string())) for name, sql_type in cols])
+
+def iter_arrow(conn, table, fmt, row_group_size=ROW_GROUP_SIZE):
+    """Stream a table as Parquet (one row group per fetch) or an Arrow IPC stream."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    cols = column_types(conn, table)
+    schema = _arrow_schema(pa, cols)
+    sink = ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    cursor = _select(conn, table, cols)
+    try:
+        while True:
+            rows = cursor.fetchmany(row_group_size)
+            if not rows:
+                break
+            columns = [list(c) for c in zip(*rows)]
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            )
+            if fmt == "parquet":
+                writer.write_batch(batch, row_group_size=row_group_size)
+            else:
+                writer.write_batch(batch)
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+def iter_table(conn, table, fmt):
+    if fmt == "csv":
+        return iter_csv(conn, table)
+    return iter_arrow(conn, table, fmt)
+
+def check_format(fmt):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt} (choose from {', '.join(EXPORT_FORMATS)})")
+    if fmt != "csv":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError(f"{fmt} export requires pyarrow (pip install pyarrow)")
+
+# ----------------------
+# Stream wrappers
+# ----------------------
+def gzip_stream(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def zip_stream(conn, tables, fmt):
+    """Stream a zip archive holding one file per table."""
+    ext = EXPORT_FORMATS[fmt][0]
+    # Parquet is already compressed; deflating it again only costs CPU.
+    compression = zipfile.ZIP_DEFLATED if fmt == "csv" else zipfile.ZIP_STORED
+    sink = ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=compression) as zf:
+        for table in tables:
+            with zf.open(f"{table}.{ext}", mode="w", force_zip64=True) as entry:
+                for chunk in iter_table(conn, table, fmt):
+                    entry.write(chunk)
+                    yield sink.take()
+            yield sink.take()
+    yield sink.take()
@@ -0,0 +1,220 @@
+import argparse
+import os
+import random
+import time
+import zlib
+
+FAKE_BUSES = int(os.environ.get("FAKE_SIMAUTO_BUSES", 2000))
+
+KV_LEVELS = [13.8, 69.0, 115.0, 138.0, 230.0, 345.0, 500.0]
+
+
+def synthetic_case(n_buses, seed=0):
+    """Column-major data for every object in case_schema.json, shaped like SimAuto results.
+
+    Element counts follow typical planning-case ratios (about one generator
+    per five buses, three loads per five buses, 1.3 branches, one
+    transformer per four buses, one shunt per ten buses, an interface
+    between neighbouring areas). All values are strings, as SimAuto returns
+    them. The same (n_buses, seed) always gives the same case.
+    """
+    rng = random.Random(seed)
+    n_areas = max(1, n_buses // 1000)
+    buses = range(1, n_buses + 1)
+    bus_kv = [rng.choice(KV_LEVELS) for _ in buses]
+    bus_area = [1 + (b - 1) * n_areas // n_buses for b in buses]
+
+    def status(p_open=0.05):
+        return "Open" if rng.random() < p_open else "Closed"
+
+    case = {
+        "Bus": {
+            "BusNum": [str(b) for b in buses],
+            "BusName": [f"BUS{b}_{int(bus_kv[b - 1])}" for b in buses],
+            "NomKV": [str(kv) for kv in bus_kv],
+            "AreaNum": [str(a) for a in bus_area],
+            "ZoneNum": [str(10 * a + rng.randint(0, 4)) for a in bus_area],
+        },
+    }
+    zones = sorted(set(case["Bus"]["ZoneNum"]), key=int)
+    case["Area"] = {
+        "AreaNum": [str(a) for a in range(1, n_areas + 1)],
+        "AreaName": [f"AREA{a}" for a in range(1, n_areas + 1)],
+    }
+    case["Zone"] = {"ZoneNum": zones, "ZoneName": [f"ZONE{z}" for z in zones]}
+
+    def element_ids(n, prefix_field, id_field):
+        at_bus = sorted(rng.randint(1, n_buses) for _ in range(n))
+        ids, counter = [], {}
+        for b in at_bus:
+            counter[b] = counter.get(b, 0) + 1
+            ids.append(str(counter[b]))
+        return {prefix_field: [str(b) for b in at_bus], id_field: ids}
+
+    gens = element_ids(max(1, n_buses // 5), "BusNum", "GenID")
+    gens["GenMW"] = [f"{rng.uniform(5, 900):.2f}" for _ in gens["BusNum"]]
+    gens["GenMvar"] = [f"{rng.uniform(-100, 300):.2f}" for _ in gens["BusNum"]]
+    gens["Status"] = [status() for _ in gens["BusNum"]]
+    case["Gen"] = gens
+
+    loads = element_ids(max(1, n_buses * 3 // 5), "BusNum", "LoadID")
+    loads["LoadMW"] = [f"{rng.uniform(0, 400):.2f}" for _ in loads["BusNum"]]
+    loads["LoadMvar"] = [f"{rng.uniform(-20, 150):.2f}" for _ in loads["BusNum"]]
+    loads["Status"] = [status(0.02) for _ in loads["BusNum"]]
+    case["Load"] = loads
+
+    # A random spanning tree keeps the network connected; extra branches add meshing.
+    pairs = [(rng.randint(1, b - 1), b) for b in range(2, n_buses + 1)]
+    while n_buses > 1 and len(pairs) < int(n_buses * 1.3):
+        pairs.append(tuple(sorted(rng.sample(buses, 2))))
+    circuits, counter = [], {}
+    for pair in pairs:
+        counter[pair] = counter.get(pair, 0) + 1
+        circuits.append(str(counter[pair]))
+    case["Branch"] = {
+        "BusNum": [str(a) for a, _ in pairs],
+        "BusNum:1": [str(b) for _, b in pairs],
+        "LineCircuit": circuits,
+        "MW": [f"{rng.uniform(-500, 500):.2f}" for _ in pairs],
+        "Mvar": [f"{rng.uniform(-100, 100):.2f}" for _ in pairs],
+        "Status": [status(0.03) for _ in pairs],
+    }
+    add_equipment(case, n_buses, n_areas, bus_kv, seed)
+    return case
+
+def add_equipment(case, n_buses, n_areas, bus_kv, seed):
+    # A separate random stream, so the tables above stay identical to earlier versions.
+    rng = random.Random(f"{seed}:equipment")
+
+    # Transformers tie each bus to a nearby bus at another voltage level.
+    pairs, counter, circuits = [], {}, []
+    for _ in range(n_buses // 4 if n_buses > 1 else 0):
+        a = rng.randint(1, n_buses)
+        b = min(n_buses, a + rng.randint(1, 20)) if a < n_buses else a - 1
+        if bus_kv[a - 1] == bus_kv[b - 1] or a == b:
+            continue
+        pair = (min(a, b), max(a, b))
+        counter[pair] = counter.get(pair, 0) + 1
+        pairs.append(pair)
+        circuits.append(str(counter[pair]))
+    case["Transformer"] = {
+        "BusNum": [str(a) for a, _ in pairs],
+        "BusNum:1": [str(b) for _, b in pairs],
+        "LineCircuit": circuits,
+        "MW": [f"{rng.uniform(-300, 300):.2f}" for _ in pairs],
+        "Mvar": [f"{rng.uniform(-80, 80):.2f}" for _ in pairs],
+        "Status": ["Open" if rng.random() < 0.01 else "Closed" for _ in pairs],
+    }
+
+    at_bus = sorted(rng.randint(1, n_buses) for _ in range(max(1, n_buses // 10)))
+    ids, counter = [], {}
+    for b in at_bus:
+        counter[b] = counter.get(b, 0) + 1
+        ids.append(str(counter[b]))
+    case["Shunt"] = {
+        "BusNum": [str(b) for b in at_bus],
+        "ShuntID": ids,
+        "ShuntMW": ["0.00"] * len(at_bus),
+        # Mostly capacitor banks, some reactors.
+        "ShuntMvar": [f"{rng.uniform(10, 150) if rng.random() < 0.8 else -rng.uniform(10, 100):.2f}" for _ in at_bus],
+        "Status": ["Open" if rng.random() < 0.1 else "Closed" for _ in at_bus],
+    }
+
+    names = [f"AREA{a}-AREA{a + 1}" for a in range(1, n_areas)]
+    case["Interface"] = {
+        "InterfaceName": names,
+        "InterfaceMW": [f"{rng.uniform(-1500, 1500):.2f}" for _ in names],
+    }
+
+
+# ----------------------
+# AUX export
+# ----------------------
+# The same case written as a PowerWorld AUX file, with the long field names
+# PowerWorld uses where they differ from the schema (see FIELD_ALIASES in
+# case_sources.py), so AuxSource can load it back into the same tables.
+
+AUX_FIELDS = {
+    "Bus": {"NomKV": "BusNomVolt", "AreaNum": "AreaNumber", "ZoneNum": "ZoneNumber"},
+    "Gen": {"GenMvar": "GenMVR", "Status": "GenStatus"},
+    "Load": {"LoadMW": "LoadSMW", "LoadMvar": "LoadSMVR", "Status": "LoadStatus"},
+    "Branch": {"MW": "LineMW", "Mvar": "LineMVR", "Status": "LineStatus"},
+    "Transformer": {"MW": "LineMW", "Mvar": "LineMVR", "Status": "LineStatus"},
+}
+AUX_ROWS = 10000
+
+def _aux_value(value):
+    try:
+        float(value)
+        return value
+    except ValueError:
+        return '"' + value.replace('"', "'") + '"'
+
+def write_aux(case, path):
+    """Write a synthetic case as DATA blocks; returns the number of rows written."""
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for obj, table in case.items():
+            fields = list(table)
+            names = [AUX_FIELDS.get(obj, {}).get(name, name) for name in fields]
+            f.write(f"DATA ({obj.upper()}, [{', '.join(names)}])\n{{\n")
+            columns = [table[name] for name in fields]
+            n = len(columns[0]) if columns else 0
+            for start in range(0, n, AUX_ROWS):
+                rows = zip(*(col[start:start + AUX_ROWS] for col in columns))
+                f.write("".join(" ".join(_aux_value(v) for v in row) + "\n" for row in rows))
+            f.write("}\n\n")
+            written += n
+    return written
+
+
+class FakeSimAuto:
+    """Pure-Python stand-in for the pwrworld.SimulatorAuto COM object.
+
+    Each opened path maps to a deterministic synthetic case, so the worker
+    pool and ingestion can be exercised on machines without PowerWorld.
+    """
+
+    def __init__(self, n_buses=None, seed=None, case=None):
+        self.n_buses = n_buses or FAKE_BUSES
+        self.seed = seed
+        self.case = case
+        self._case = None
+        self.CurrentDir = os.getcwd()
+
+    def OpenCase(self, path):
+        # A case given up front (e.g. by a benchmark) is served for every path.
+        if self.case is not None:
+            self._case = self.case
+            return ("",)
+        seed = self.seed if self.seed is not None else zlib.crc32(os.path.basename(path).encode())
+        self._case = synthetic_case(self.n_buses, seed)
+        return ("",)
+
+    def CloseCase(self):
+        self._case = None
+        return ("",)
+
+    def GetParametersMultipleElement(self, obj, fields, filter_name):
+        if self._case is None:
+            return ("Error: no case is open", None)
+        table = self._case.get(obj)
+        if table is None:
+            return (f"Error: object type {obj} not found", None)
+        n = len(next(iter(table.values())))
+        return ("", tuple(tuple(table.get(f, [""] * n)) for f in fields))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic case as a PowerWorld AUX file.")
+    parser.add_argument("--buses", type=int, default=FAKE_BUSES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--aux", required=True)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    case = synthetic_case(args.buses, args.seed)
+    generated = time.perf_counter() - start
+    rows = write_aux(case, args.aux)
+    print(f" Generated {args.buses:,} buses ({rows:,} rows) in {generated:.2f}s, "
+          f"wrote {args.aux} in {time.perf_counter() - start - generated:.2f}s")
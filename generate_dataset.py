@@ -2,20 +2,18 @@ import sqlite3
 import json
 import argparse
 
+from case_stats import count, stats_for
+
 def make_dataset_from_db(db_path, out_path):
     conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
 
     ds = []
 
-    cur.execute("SELECT COUNT(*) FROM Bus")
-    n_bus = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM Gen")
-    n_gen = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM Load")
-    n_load = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM Branch")
-    n_branch = cur.fetchone()[0]
+    stats = stats_for(conn)
+    n_bus = count(stats, "Bus")
+    n_gen = count(stats, "Gen")
+    n_load = count(stats, "Load")
+    n_branch = count(stats, "Branch")
 
     summary = (
         f"The case contains {n_bus} buses, {n_gen} generators, "
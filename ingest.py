@@ -0,0 +1,487 @@
+import argparse
+import json
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from operator import itemgetter
+
+from case_stats import compute_stats, table_exists, write_stats
+from columnar import column_batches
+from metrics import inc, timed
+from retrieval import SEARCH_TABLE, build_search_index, update_search_index
+from topology import EDGE_TABLES, END_FIELDS, TOPOLOGY_TABLE, Topology, build_arrays, read_topology, update_edge_status, write_topology
+
+DB_PATH = "caseinfo.db"
+SCHEMA_PATH = os.environ.get("CASE_SCHEMA_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "case_schema.json"))
+BATCH_SIZE = 10000
+FETCH_SIZE = 10000
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 2))
+QUEUE_DEPTH = 16
+STAGE_METRIC = "pw_ingest_stage_seconds"
+
+# ----------------------
+# Case schema
+# ----------------------
+# Objects, column types, natural keys, validation rules, indexes and search
+# templates (see retrieval.py) come from case_schema.json, so new object types only
+# need a schema entry. Numbers are stored as INTEGER/REAL so lookups and
+# aggregates don't have to cast TEXT on every query. Indexes are built after the bulk load, which is much
+# cheaper than maintaining them row by row during the inserts.
+def load_schema(path=SCHEMA_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    schema, indexes, rules, search, keys = {}, {}, {}, {}, {}
+    for obj, entry in spec.items():
+        columns = [(name, sql_type.upper()) for name, sql_type in entry["columns"]]
+        names = [name for name, _ in columns]
+        schema[obj] = columns
+        indexes[obj] = [tuple(cols) for cols in entry.get("indexes", [])]
+        keys[obj] = tuple(entry.get("key", []))
+        rules[obj] = (
+            [names.index(f) for f in entry.get("numeric", [])],
+            [names.index(f) for f in entry.get("nonempty", [])],
+        )
+        if "search" in entry:
+            search[obj] = {
+                "template": entry["search"],
+                "tag": entry.get("tag", obj.lower()),
+                "words": entry.get("words", []),
+                "ranges": entry.get("ranges", {}),
+            }
+    return schema, indexes, rules, search, keys
+
+CASE_SCHEMA, CASE_INDEXES, CASE_RULES, CASE_SEARCH, CASE_KEYS = load_schema()
+
+
+def field_names(obj):
+    return [name for name, _ in CASE_SCHEMA[obj]]
+
+
+# ----------------------
+# Row conversion
+# ----------------------
+def ensure_text(x):
+    return "" if x is None else str(x).strip()
+
+def to_int(x):
+    try:
+        return int(float(str(x).strip()))
+    except (TypeError, ValueError):
+        return None
+
+def to_real(x):
+    try:
+        return float(str(x).strip())
+    except (TypeError, ValueError):
+        return None
+
+CASTS = {"INTEGER": to_int, "REAL": to_real, "TEXT": ensure_text}
+
+
+def transpose_simauto(data, fields):
+    if not data:
+        return []
+    column_major = (
+        len(data) == len(fields) and
+        all(hasattr(col, "__iter__") and not isinstance(col, (str, bytes)) for col in data)
+    )
+    if column_major:
+        n_elems = min(len(col) for col in data) if data else 0
+        rows = []
+        for i in range(n_elems):
+            row = [data[f_idx][i] if i < len(data[f_idx]) else None for f_idx in range(len(fields))]
+            rows.append(row)
+        return rows
+    else:
+        return [r[:len(fields)] for r in data]
+
+def is_valid_row(obj, fields, row):
+    if obj not in CASE_RULES:
+        return True
+    numeric, nonempty = CASE_RULES[obj]
+    try:
+        return (all(str(row[i]).strip().isdigit() for i in numeric) and
+                all(len(str(row[i]).strip()) > 0 for i in nonempty))
+    except Exception:
+        return False
+
+def typed_rows(obj, rows):
+    """Yield validated rows converted to the column types in CASE_SCHEMA."""
+    fields = field_names(obj)
+    casts = [CASTS[sql_type] for _, sql_type in CASE_SCHEMA[obj]]
+    n = len(fields)
+    for row in rows:
+        if len(row) < n or not is_valid_row(obj, fields, row):
+            continue
+        yield tuple(cast(v) for cast, v in zip(casts, row))
+
+
+# ----------------------
+# Bulk loading
+# ----------------------
+def connect_for_ingest(db_path=DB_PATH):
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -65536")
+    return conn
+
+def create_table(conn, obj):
+    col_defs = ", ".join(f'"{name}" {sql_type}' for name, sql_type in CASE_SCHEMA[obj])
+    conn.execute(f'DROP TABLE IF EXISTS "{obj}"')
+    conn.execute(f'CREATE TABLE "{obj}" ({col_defs})')
+
+def row_batches(obj, rows, batch_size=BATCH_SIZE):
+    """Yield (row_count, rows) batches of typed rows (see typed_rows) from a row iterable.
+
+    Reading and validating with typing ("convert") are timed per batch (see metrics.py).
+    """
+    rows = iter(rows)
+    while True:
+        with timed(STAGE_METRIC, stage="read", object=obj):
+            chunk = list(islice(rows, batch_size))
+        if not chunk:
+            return
+        with timed(STAGE_METRIC, stage="convert", object=obj):
+            batch = list(typed_rows(obj, chunk))
+        if batch:
+            yield len(batch), batch
+
+def build_indexes(conn, obj):
+    for cols in CASE_INDEXES.get(obj, []):
+        name = "idx_" + obj + "_" + "_".join(c.replace(":", "_") for c in cols)
+        col_list = ", ".join(f'"{c}"' for c in cols)
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{obj}" ({col_list})')
+
+# ----------------------
+# Incremental loading
+# ----------------------
+# A revised case can be loaded on top of a copy of its previous version.
+# Rows are matched on their object's natural key (see "key" in
+# case_schema.json). apply_changes hash-joins the incoming rows against
+# the stored table and writes only the inserts, updates and deletes, so
+# unchanged rows are never rewritten. Key columns are typed and non-empty
+# (see the validation rules), so keys compare the same in Python and SQLite.
+
+def key_getter(obj):
+    return itemgetter(*[field_names(obj).index(c) for c in CASE_KEYS[obj]])
+
+def stored_rows(conn, obj, ordered=False):
+    """(rowid, row) for every row of obj, in natural-key order if asked (through the key index)."""
+    col_list = ", ".join(f'"{n}"' for n in field_names(obj))
+    order = " ORDER BY " + ", ".join(f'"{c}"' for c in CASE_KEYS[obj]) + ", rowid" if ordered else ""
+    cursor = conn.execute(f'SELECT rowid, {col_list} FROM "{obj}"{order}')
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for r in rows:
+            yield r[0], r[1:]
+
+def merge_join(old, new, key):
+    """Match two key-ordered streams of (rowid, row) on key(row).
+
+    Yields (old, new) pairs with None on the side that lacks the key; rows
+    repeating a key are paired in order of appearance.
+    """
+    def numbered(pairs):
+        last, n = None, 0
+        for item in pairs:
+            k = key(item[1])
+            n = n + 1 if k == last else 0
+            last = k
+            yield (k, n), item
+
+    old, new = numbered(old), numbered(new)
+    a, b = next(old, None), next(new, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield a[1], None
+            a = next(old, None)
+        elif a is None or b[0] < a[0]:
+            yield None, b[1]
+            b = next(new, None)
+        else:
+            yield a[1], b[1]
+            a, b = next(old, None), next(new, None)
+
+def _missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+def same_value(a, b):
+    """Equality that treats NaN and NULL alike (SQLite stores NaN as NULL)."""
+    return a == b or (_missing(a) and _missing(b))
+
+def same_row(a, b):
+    return a == b or (len(a) == len(b) and all(map(same_value, a, b)))
+
+def apply_changes(conn, obj, rows):
+    """Bring table obj in line with the typed rows, writing only what changed.
+
+    Returns counts of added, removed, changed and unchanged rows (and, under
+    "fields", how many changed rows changed each field), and the rowids
+    whose old content went away and whose new content was written (for
+    updating the search index).
+    """
+    key = key_getter(obj)
+    names = field_names(obj)
+    fields = {}
+    stored = {}
+    for rowid, row in stored_rows(conn, obj):
+        stored.setdefault(key(row), deque()).append((rowid, row))
+    inserts, updates = [], []
+    unchanged = 0
+    for row in rows:
+        matches = stored.get(key(row))
+        if not matches:
+            inserts.append(row)
+            continue
+        rowid, old = matches.popleft()
+        if not same_row(old, row):
+            updates.append(row + (rowid,))
+            for name, a, b in zip(names, old, row):
+                if not same_value(a, b):
+                    fields[name] = fields.get(name, 0) + 1
+        else:
+            unchanged += 1
+    deletes = [(rowid,) for matches in stored.values() for rowid, _ in matches]
+
+    conn.executemany(f'DELETE FROM "{obj}" WHERE rowid = ?', deletes)
+    assignments = ", ".join(f'"{n}" = ?' for n in names)
+    conn.executemany(f'UPDATE "{obj}" SET {assignments} WHERE rowid = ?', updates)
+    # New rows get consecutive rowids after the largest one left.
+    first_new = (conn.execute(f'SELECT MAX(rowid) FROM "{obj}"').fetchone()[0] or 0) + 1
+    placeholders = ", ".join(["?"] * len(names))
+    conn.executemany(f'INSERT INTO "{obj}" VALUES ({placeholders})', inserts)
+    counts = {"added": len(inserts), "removed": len(deletes), "changed": len(updates), "unchanged": unchanged,
+              "fields": fields}
+    updated = [u[-1] for u in updates]
+    return counts, ([d[0] for d in deletes] + updated, updated + list(range(first_new, first_new + len(inserts))))
+
+def can_apply_changes(conn, obj):
+    """Whether obj already exists with the current columns and has a natural key."""
+    if not CASE_KEYS.get(obj) or not table_exists(conn, obj):
+        return False
+    columns = [r[1] for r in conn.execute(f'PRAGMA table_info("{obj}")')]
+    return columns == field_names(obj)
+
+
+def copy_case(base_path, db_path):
+    """Start db_path as a copy of the case database at base_path."""
+    src, dst = sqlite3.connect(base_path), sqlite3.connect(db_path)
+    try:
+        src.backup(dst)
+    finally:
+        src.close()
+        dst.close()
+
+def ingest_case(source, db_path=DB_PATH, progress=None, workers=INGEST_WORKERS, base_path=None):
+    """Load every object in CASE_SCHEMA into db_path in a single transaction.
+
+    source is any case source (see case_sources.py) whose fetch(obj, fields)
+    returns an iterable of raw rows, or None when the object could not be
+    read. Sources with fetch_columns(obj, fields) hand back raw column-major
+    data, which is validated and typed as NumPy columns (see columnar.py).
+    Fetches run one after another on the calling thread (SimAuto sessions
+    are bound to it); transposing, validating and typing run in a thread
+    pool across object types, and a single writer thread owns the
+    connection and does all inserts, then stores the case statistics (see
+    case_stats.py), search index (see retrieval.py) and topology index
+    (see topology.py) in the same transaction. progress, if given, is called as
+    progress(obj, state, rows) while loading. Returns per-object row counts
+    and timings.
+
+    With base_path (the database of a previous version of the same case),
+    db_path starts as a copy of it and each object whose table is already
+    there is updated in place: only added, removed and changed rows are
+    written (see apply_changes), and the stats carry those counts.
+    """
+    def report(obj, state, rows=0):
+        if progress:
+            progress(obj, state, rows)
+
+    batches = queue.Queue(maxsize=QUEUE_DEPTH)
+    started = {}
+    stats = {}
+    errors = []
+
+    def produce(obj, batches_for):
+        try:
+            batches.put(("start", obj, None))
+            for batch in batches_for():
+                batches.put(("rows", obj, batch))
+            batches.put(("end", obj, None))
+        except Exception as e:
+            traceback.print_exc()
+            batches.put(("fail", obj, e))
+
+    def write():
+        if base_path:
+            copy_case(base_path, db_path)
+        conn = connect_for_ingest(db_path)
+        inserted = {}
+        pending = {}   # obj -> rows still to merge into the copied table
+        touched = {}   # obj -> (stale, fresh) rowids of merged tables
+        recreated = set()
+        try:
+            conn.execute("BEGIN")
+            for kind, obj, payload in iter(batches.get, None):
+                if errors:
+                    continue
+                try:
+                    if kind == "start":
+                        if base_path and can_apply_changes(conn, obj):
+                            pending[obj] = []
+                        else:
+                            create_table(conn, obj)
+                            recreated.add(obj)
+                        inserted[obj] = 0
+                    elif kind == "rows":
+                        count, rows = payload
+                        if obj in pending:
+                            pending[obj].extend(rows)
+                        else:
+                            placeholders = ", ".join(["?"] * len(CASE_SCHEMA[obj]))
+                            with timed(STAGE_METRIC, stage="insert", object=obj):
+                                conn.executemany(f'INSERT INTO "{obj}" VALUES ({placeholders})', rows)
+                        inserted[obj] += count
+                        report(obj, "running", inserted[obj])
+                    elif kind == "end":
+                        changes = None
+                        if obj in pending:
+                            with timed(STAGE_METRIC, stage="merge", object=obj):
+                                changes, touched[obj] = apply_changes(conn, obj, pending.pop(obj))
+                        with timed(STAGE_METRIC, stage="index", object=obj):
+                            build_indexes(conn, obj)
+                        inc("pw_ingest_rows_total", inserted[obj], object=obj)
+                        elapsed = time.perf_counter() - started[obj]
+                        rate = inserted[obj] / elapsed if elapsed > 0 else 0.0
+                        stats[obj] = {"rows": inserted[obj], "seconds": round(elapsed, 3), "rows_per_sec": round(rate, 1)}
+                        if changes is None:
+                            print(f"Inserted {inserted[obj]} {obj} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+                        else:
+                            stats[obj]["changes"] = changes
+                            print(f"Merged {inserted[obj]} {obj} rows in {elapsed:.2f}s: {changes['added']} added, "
+                                  f"{changes['removed']} removed, {changes['changed']} changed")
+                        report(obj, "done", inserted[obj])
+                    elif kind == "drop":
+                        if table_exists(conn, obj):
+                            conn.execute(f'DROP TABLE "{obj}"')
+                            recreated.add(obj)
+                    else:
+                        conn.execute(f'DROP TABLE IF EXISTS "{obj}"')
+                        recreated.add(obj)
+                        print(f"Error extracting {obj}: {payload}")
+                        report(obj, "failed")
+                except Exception as e:
+                    traceback.print_exc()
+                    errors.append(e)
+            if not errors:
+                try:
+                    with timed(STAGE_METRIC, stage="stats", object="case") as t:
+                        write_stats(conn, compute_stats(conn, list(CASE_SCHEMA)))
+                    print(f"Computed case statistics in {t.seconds:.2f}s")
+                    # After an incremental load only the changed rows are re-indexed, and the
+                    # topology is patched or kept where it can be (below).
+                    in_place = base_path and not recreated
+                    reindex = in_place and table_exists(conn, SEARCH_TABLE)
+                    with timed(STAGE_METRIC, stage="search_index", object="case") as t:
+                        if reindex:
+                            docs = update_search_index(conn, CASE_SEARCH, touched)
+                        else:
+                            docs = build_search_index(conn, CASE_SEARCH)
+                    if reindex:
+                        print(f"Re-indexed {docs} changed elements for search in {t.seconds:.2f}s")
+                    else:
+                        print(f"Indexed {docs} elements for search in {t.seconds:.2f}s")
+                    # Buses or branch ends coming and going change the graph; a change of
+                    # branch status only switches edges in the stored index.
+                    changes = {obj: stats[obj]["changes"] for obj in ("Bus",) + EDGE_TABLES
+                               if "changes" in stats.get(obj, {})}
+                    rebuild = not (in_place and table_exists(conn, TOPOLOGY_TABLE)) or any(
+                        c["added"] or c["removed"] or set(c["fields"]) & END_FIELDS for c in changes.values())
+                    switching = {obj: touched[obj][1] for obj, c in changes.items()
+                                 if obj in EDGE_TABLES and "Status" in c["fields"]}
+                    if rebuild:
+                        with timed(STAGE_METRIC, stage="topology", object="case") as t:
+                            topo = Topology(build_arrays(conn))
+                            write_topology(conn, topo.arrays())
+                        print(f"Built topology index of {topo.n_buses} buses and "
+                              f"{len(topo.edge_from)} branches in {t.seconds:.2f}s")
+                    elif switching:
+                        with timed(STAGE_METRIC, stage="topology", object="case") as t:
+                            topo = Topology(read_topology(conn))
+                            switched = update_edge_status(conn, topo, switching)
+                            write_topology(conn, topo.arrays())
+                        print(f"Switched {switched} branches in the topology index in {t.seconds:.2f}s")
+                    else:
+                        print("Topology unchanged")
+                except Exception as e:
+                    traceback.print_exc()
+                    errors.append(e)
+            if errors:
+                conn.execute("ROLLBACK")
+            else:
+                with timed(STAGE_METRIC, stage="commit", object="case"):
+                    conn.execute("COMMIT")
+                    conn.execute("ANALYZE")
+        finally:
+            conn.close()
+
+    writer = threading.Thread(target=write, name="ingest-writer")
+    writer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as pool:
+            for obj in CASE_SCHEMA:
+                fields = field_names(obj)
+                print(f"Extracting {obj} with fields: {fields}")
+                started[obj] = time.perf_counter()
+                report(obj, "running")
+                try:
+                    # For SimAuto this is the GetParametersMultipleElement call.
+                    with timed(STAGE_METRIC, stage="fetch", object=obj):
+                        if hasattr(source, "fetch_columns"):
+                            data = source.fetch_columns(obj, fields)
+                            batches_for = partial(column_batches, data, CASE_SCHEMA[obj], CASE_RULES[obj],
+                                                  BATCH_SIZE, obj)
+                        else:
+                            data = source.fetch(obj, fields)
+                            batches_for = partial(row_batches, obj, data)
+                except Exception as e:
+                    print(f"Error extracting {obj}: {e}")
+                    traceback.print_exc()
+                    report(obj, "failed")
+                    batches.put(("drop", obj, None))
+                    continue
+                if data is None:
+                    # A copied base table would otherwise outlive an object the case no longer has.
+                    report(obj, "skipped")
+                    batches.put(("drop", obj, None))
+                    continue
+                pool.submit(produce, obj, batches_for)
+    finally:
+        batches.put(None)
+        writer.join()
+    if errors:
+        raise errors[0]
+    return stats
+
+
+if __name__ == "__main__":
+    from case_sources import AuxSource
+
+    parser = argparse.ArgumentParser(description="Load a PowerWorld AUX export into a case database.")
+    parser.add_argument("--aux", required=True)
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--base", help="database of a previous version of the case; only changed rows are written")
+    args = parser.parse_args()
+    ingest_case(AuxSource(args.aux), args.db, base_path=args.base)
@@ -0,0 +1,529 @@
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+
+from case_stats import TOP_N, count, online_count, stats_for, summary_sentence
+from column_store import aggregate, columns_for, histogram, top_rows
+from metrics import inc
+from topology import topology_for
+
+# ----------------------
+# Intent patterns
+# ----------------------
+# Every phrase of every intent is compiled into one alternation with a named
+# group per intent, so a question is scanned once no matter how many intents
+# exist. Entity-bearing intents only win when their entity is present.
+INTENT_PATTERNS = {
+    "gen_mw": [
+        r"\bmw\b", r"how much power", r"output of (?:gen|generator)", r"(?:gen|generator)\s+\S+\s+produce",
+        r"status and mw", r"megawatts?", r"what is it producing",
+    ],
+    "load_mw": [
+        r"\bload\s+(?:id\s+)?#?['\"]?[a-z]?\d[a-z0-9]?\b", r"\bconsumes?\b",
+    ],
+    "bus_kv": [
+        r"\bkv\b", r"nominal voltage", r"voltage rating", r"voltage of", r"voltage level",
+    ],
+    "summary": [
+        r"summar", r"overview", r"what does (?:this|the) (?:case|system|network) contain",
+        r"describe (?:this|the) (?:case|system|network)",
+    ],
+    "count_bus": [
+        r"how many buses", r"number of buses", r"count of buses", r"total buses", r"bus count",
+    ],
+    "count_gen": [
+        r"how many (?:generators|gens|units)", r"number of (?:generators|gens)", r"count of (?:generators|gens)",
+        r"total (?:generators|gens)", r"generator count",
+    ],
+    "count_load": [
+        r"how many loads", r"number of loads", r"count of loads", r"total loads", r"load count",
+    ],
+    "count_branch": [
+        r"how many (?:branches|lines)", r"number of (?:branches|lines)", r"count of (?:branches|lines)",
+        r"total (?:branches|lines|transmission lines)", r"branch count",
+    ],
+    "count_area": [
+        r"how many areas", r"number of areas", r"count of areas", r"total areas", r"area count",
+    ],
+    "count_zone": [
+        r"how many zones", r"number of zones", r"count of zones", r"total zones", r"zone count",
+    ],
+    "count_transformer": [
+        r"how many transformers", r"number of transformers", r"count of transformers", r"total transformers",
+        r"transformer count",
+    ],
+    "count_shunt": [
+        r"how many shunts", r"number of shunts", r"count of shunts", r"total shunts", r"shunt count",
+    ],
+    "count_interface": [
+        r"how many interfaces", r"number of interfaces", r"count of interfaces", r"total interfaces",
+        r"interface count",
+    ],
+    "gen_total": [
+        r"total (?:generation|generated|gen mw|generator mw|generator output)", r"how much (?:power is|is being) generated",
+        r"generation in area", r"system generation",
+    ],
+    "load_total": [
+        r"total (?:load|demand)(?!s)", r"system (?:load|demand)", r"load in area", r"how much load",
+    ],
+    "largest_gens": [
+        r"(?:largest|biggest) \d* ?(?:generators|gens|units)", r"top \d* ?(?:generators|gens|units)",
+    ],
+    "top_elements": [
+        r"(?:largest|biggest|heaviest|smallest|top|highest|lowest) \d* ?(?:loads|buses|branches|lines|flows|generators|gens|units)",
+    ],
+    "aggregate": [
+        r"\b(?:average|mean|avg|median|maximum|minimum|max|min)\b",
+    ],
+    "histogram": [
+        r"histogram", r"distribution of",
+    ],
+    "bus_path": [
+        r"path (?:between|from)", r"how many (?:hops|branches) (?:between|from)", r"hops? (?:between|from)",
+        r"route (?:between|from)",
+    ],
+    "bus_neighbors": [
+        r"connected to", r"neighbou?rs? of", r"adjacent to", r"within \d+ hops?", r"next to",
+    ],
+    "islands": [
+        r"\bislands?\b", r"connected components?", r"isolated buses",
+    ],
+}
+
+# Order in which matched intents are considered.
+INTENT_PRIORITY = [
+    "bus_path", "bus_neighbors", "islands",
+    "gen_mw", "load_mw", "bus_kv", "summary", "count_bus", "count_gen", "count_load", "count_branch",
+    "count_area", "count_zone", "count_transformer", "count_shunt", "count_interface",
+    "gen_total", "load_total", "largest_gens", "top_elements", "aggregate", "histogram",
+]
+REQUIRES = {
+    "gen_mw": ("gen_id",), "load_mw": ("load_id",), "bus_kv": ("bus",), "bus_path": ("bus", "bus2"), "bus_neighbors": ("bus",),
+    "top_elements": ("measure",), "aggregate": ("measure",), "histogram": ("measure",),
+}
+
+INTENT_RE = re.compile(
+    "|".join(f"(?P<{name}>{'|'.join(patterns)})" for name, patterns in INTENT_PATTERNS.items())
+)
+BUS_NUM_RE = re.compile(r"\bbus(?:\s+(?:number|num|no\.?))?\s*#?\s*(\d+)\b")
+GEN_ID_RE = re.compile(r"\b(?:generator|gen|unit)\s+(?:id\s+)?#?['\"]?([a-z]?\d[a-z0-9]?)\b")
+LOAD_ID_RE = re.compile(r"\bload\s+(?:id\s+)?#?['\"]?([a-z]?\d[a-z0-9]?)\b")
+AREA_RE = re.compile(r"\barea\s*#?\s*(\d+)\b")
+ZONE_RE = re.compile(r"\bzone\s*#?\s*(\d+)\b")
+AGG_RE = re.compile(r"\b(average|mean|avg|median|maximum|max|minimum|min|smallest|lowest)\b")
+ONLINE_RE = re.compile(r"\b(?:in[ -]service|online)\b")
+TOP_RE = re.compile(r"\b(?:top|largest|biggest|heaviest|smallest|highest|lowest)\s+(\d+)\b")
+BUS_PAIR_RE = re.compile(r"\bbus(?:es)?\s*#?\s*(\d+)\s+(?:and|to)\s+(?:bus\s*)?#?\s*(\d+)\b")
+HOPS_RE = re.compile(r"\b(?:within\s+)?(\d+)\s+hops?\b")
+TOKEN_RE = re.compile(r"[a-z0-9_.\-]+")
+
+# What a question measures (the first mention wins), as table and column.
+MEASURES = {
+    "kv": (r"\bkv\b|voltage", "Bus", "NomKV"),
+    "gen": (r"generat|\bgens?\b|\bunits?\b", "Gen", "GenMW"),
+    "load": (r"\bloads?\b|demand", "Load", "LoadMW"),
+    "branch": (r"branch|\blines?\b|\bflows?\b", "Branch", "MW"),
+    "bus": (r"\bbus(?:es)?\b", "Bus", "NomKV"),
+}
+MEASURE_RE = re.compile("|".join(f"(?P<{name}>{pattern})" for name, (pattern, _, _) in MEASURES.items()))
+AGG_NAMES = {"average": "mean", "mean": "mean", "avg": "mean", "median": "median", "maximum": "max", "max": "max",
+             "minimum": "min", "min": "min", "smallest": "min", "lowest": "min"}
+
+# Entities only these intents use are extracted when one of them matched.
+TOPOLOGY_INTENTS = {"bus_neighbors", "islands", "bus_path"}
+COLUMN_INTENTS = {"gen_total", "load_total", "largest_gens", "top_elements", "aggregate", "histogram"}
+COUNT_INTENTS = {name for name in INTENT_PATTERNS if name.startswith("count_")}
+
+Route = namedtuple("Route", ["intent", "entities"])
+
+def tokenize(text):
+    return [t.strip(".-") for t in TOKEN_RE.findall(text.lower()) if t.strip(".-")]
+
+
+# ----------------------
+# Case element index
+# ----------------------
+class CaseIndex:
+    """In-memory lookup of bus names for one case database."""
+
+    def __init__(self, buses):
+        self.by_name = {}
+        self.max_tokens = 1
+        for busnum, name in buses:
+            key = " ".join(tokenize(str(name)))
+            if not key:
+                continue
+            self.by_name.setdefault(key, (busnum, str(name).strip()))
+            self.max_tokens = max(self.max_tokens, key.count(" ") + 1)
+
+    @classmethod
+    def from_db(cls, db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            return cls(conn.execute('SELECT "BusNum", "BusName" FROM "Bus"'))
+        except sqlite3.Error:
+            return cls([])
+        finally:
+            conn.close()
+
+    def find_bus(self, tokens):
+        """Longest bus name found among the question tokens, as (busnum, name)."""
+        for n in range(min(self.max_tokens, len(tokens)), 0, -1):
+            for i in range(len(tokens) - n + 1):
+                hit = self.by_name.get(" ".join(tokens[i:i + n]))
+                if hit:
+                    return hit
+        return None
+
+
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+INDEX_CACHE_SIZE = 8
+
+def case_index(db_path):
+    """CaseIndex for db_path, rebuilt only when the database file changes."""
+    mtime = os.path.getmtime(db_path)
+    with _index_lock:
+        cached = _index_cache.get(db_path)
+        if cached and cached[0] == mtime:
+            _index_cache.move_to_end(db_path)
+            inc("pw_cache_requests_total", cache="case_index", result="hit")
+            return cached[1]
+    inc("pw_cache_requests_total", cache="case_index", result="miss")
+    index = CaseIndex.from_db(db_path)
+    with _index_lock:
+        _index_cache[db_path] = (mtime, index)
+        _index_cache.move_to_end(db_path)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+# ----------------------
+# Routing
+# ----------------------
+def extract_entities(question, index=None, hits=None):
+    """Entities mentioned in a question; hits (matched intents), if given, skips unused extractors."""
+    entities = {}
+    m = BUS_NUM_RE.search(question)
+    if m:
+        entities["bus"] = int(m.group(1))
+    m = GEN_ID_RE.search(question)
+    if m:
+        entities["gen_id"] = m.group(1).upper()
+    m = LOAD_ID_RE.search(question)
+    if m:
+        entities["load_id"] = m.group(1).upper()
+    m = AREA_RE.search(question)
+    if m:
+        entities["area"] = m.group(1)
+    m = TOP_RE.search(question)
+    if m:
+        entities["top"] = int(m.group(1))
+    if hits is None or hits & TOPOLOGY_INTENTS:
+        m = BUS_PAIR_RE.search(question)
+        if m:
+            entities["bus"], entities["bus2"] = int(m.group(1)), int(m.group(2))
+        m = HOPS_RE.search(question)
+        if m:
+            entities["hops"] = int(m.group(1))
+    if hits is None or hits & (COLUMN_INTENTS | COUNT_INTENTS):
+        if ONLINE_RE.search(question):
+            entities["online"] = True
+    if hits is None or hits & COLUMN_INTENTS:
+        m = ZONE_RE.search(question)
+        if m:
+            entities["zone"] = m.group(1)
+        m = AGG_RE.search(question)
+        if m:
+            entities["agg"] = AGG_NAMES[m.group(1)]
+        m = MEASURE_RE.search(question)
+        if m:
+            entities["measure"] = MEASURES[m.lastgroup][1:]
+    if "bus" not in entities and index is not None:
+        hit = index.find_bus(tokenize(question))
+        if hit:
+            entities["bus"], entities["bus_name"] = hit
+    return entities
+
+def route_question(question, index=None):
+    """Map a lowercased question to a Route(intent, entities); intent None if unknown."""
+    hits = {m.lastgroup for m in INTENT_RE.finditer(question)}
+    if not hits:
+        return Route(None, {})
+    entities = extract_entities(question, index, hits)
+    for intent in INTENT_PRIORITY:
+        if intent in hits and all(e in entities for e in REQUIRES.get(intent, ())):
+            return Route(intent, entities)
+    return Route(None, entities)
+
+
+# ----------------------
+# Answers
+# ----------------------
+COUNT_TABLES = {
+    "count_bus": ("Bus", "buses"),
+    "count_gen": ("Gen", "generators"),
+    "count_load": ("Load", "loads"),
+    "count_branch": ("Branch", "branches (lines)"),
+    "count_area": ("Area", "areas"),
+    "count_zone": ("Zone", "zones"),
+    "count_transformer": ("Transformer", "transformers"),
+    "count_shunt": ("Shunt", "shunts"),
+    "count_interface": ("Interface", "interfaces"),
+}
+STATS_INTENTS = {"summary", "gen_total", "load_total", "largest_gens"} | set(COUNT_TABLES)
+
+def area_label(stats, area):
+    name = stats.get("areas", {}).get(area)
+    return f"area {area} ({name})" if name else f"area {area}"
+
+def total_answer(stats, section, noun, units, entities):
+    info = stats.get(section)
+    if not info:
+        return f"No {noun} data in this case."
+    if "area" in entities:
+        area = info["by_area"].get(entities["area"])
+        if area is None:
+            return f"No {noun} found in {area_label(stats, entities['area'])}."
+        return (f"Total {noun} in {area_label(stats, entities['area'])} is {area['mw']} MW "
+                f"and {area['mvar']} Mvar across {area['count']} {units}.")
+    return (f"Total {noun} is {info['total_mw']} MW and {info['total_mvar']} Mvar "
+            f"({info['online_mw']} MW from {info['online']} {units} in service, {info['offline']} out of service).")
+
+def answer_from_stats(stats, intent, entities):
+    if intent == "summary":
+        return summary_sentence(stats)
+    if intent in COUNT_TABLES:
+        table, noun = COUNT_TABLES[intent]
+        n, online = count(stats, table), online_count(stats, table)
+        if entities.get("online") and online is not None:
+            return f"{online} of the {n} {noun} in this case are in service."
+        return f"There are {n} {noun} in this case."
+    if intent == "gen_total":
+        return total_answer(stats, "gen", "generation", "generators", entities)
+    if intent == "load_total":
+        return total_answer(stats, "load", "load", "loads", entities)
+    top = stats.get("gen", {}).get("top", [])[:min(entities.get("top", 5), TOP_N)]
+    if not top:
+        return "No generator data in this case."
+    units = "; ".join(f"generator {gen_id} at bus {busnum}: {mw} MW ({status})" for busnum, gen_id, mw, status in top)
+    return f"The {len(top)} largest generators are {units}."
+
+LIST_LIMIT = 20
+MAX_HOPS = 10
+
+def bus_list(buses):
+    shown = ", ".join(str(b) for b in buses[:LIST_LIMIT])
+    return shown + (f" and {len(buses) - LIST_LIMIT} more" if len(buses) > LIST_LIMIT else "")
+
+def neighbors_answer(conn, topo, entities):
+    busnum, hops = entities["bus"], min(entities.get("hops", 1), MAX_HOPS)
+    if hops > 1:
+        reached = topo.within_hops(busnum, hops)
+        if reached is None:
+            return f"No info found for bus {busnum}."
+        by_hop = {}
+        for bus, h in sorted(reached.items(), key=lambda kv: (kv[1], kv[0])):
+            by_hop.setdefault(h, []).append(bus)
+        rings = "; ".join(f"{len(buses)} at {h} hop{'s' if h > 1 else ''} ({bus_list(buses)})"
+                          for h, buses in by_hop.items())
+        return f"{len(reached)} buses are within {hops} in-service branches of bus {busnum}: {rings}."
+    links = topo.neighbors(busnum, online_only=False)
+    if links is None:
+        return f"No info found for bus {busnum}."
+    if not links:
+        return f"Bus {busnum} has no branches."
+    rows = topo.edge_rows(conn, [e for _, e in links[:LIST_LIMIT]])
+    parts = []
+    for bus, e in links[:LIST_LIMIT]:
+        table, circuit, status = rows.get(e, ("Branch", "?", "?"))
+        kind = "transformer" if table == "Transformer" else "circuit"
+        parts.append(f"bus {bus} ({kind} {circuit}, {status})")
+    online = sum(1 for _, e in links if topo.edge_online[e])
+    more = f" and {len(links) - LIST_LIMIT} more" if len(links) > LIST_LIMIT else ""
+    return (f"Bus {busnum} is connected to {', '.join(parts)}{more}. "
+            f"{online} of its {len(links)} branches are in service.")
+
+def islands_answer(topo, entities):
+    islands = topo.islands()
+    if not islands:
+        return "No bus data in this case."
+    isolated = sum(1 for _, size in islands if size == 1)
+    if "bus" in entities:
+        label = topo.island_of(entities["bus"])
+        if label is None:
+            return f"No info found for bus {entities['bus']}."
+        rank, size = next((i, size) for i, (l, size) in enumerate(islands) if l == label)
+        if rank == 0:
+            return f"Bus {entities['bus']} is in the main island of {size} buses."
+        return f"Bus {entities['bus']} is in island {rank + 1} of {len(islands)}, with {size} buses."
+    if len(islands) == 1:
+        return f"All {islands[0][1]} buses form a single island."
+    sizes = ", ".join(str(size) for _, size in islands[:5] if size > 1)
+    return (f"The in-service network forms {len(islands)} islands. The largest have {sizes} buses; "
+            f"{isolated} {'bus is' if isolated == 1 else 'buses are'} isolated.")
+
+def path_answer(topo, entities):
+    source, target = entities["bus"], entities["bus2"]
+    steps = topo.path(source, target)
+    if steps is None:
+        missing = source if topo.index_of(source) is None else target
+        return f"No info found for bus {missing}."
+    if not steps:
+        return f"Bus {source} and bus {target} are not connected through in-service branches."
+    buses = [b for b, _ in steps]
+    route = " -> ".join(str(b) for b in buses) if len(buses) <= LIST_LIMIT else \
+        " -> ".join(str(b) for b in buses[:LIST_LIMIT // 2]) + " -> ... -> " + \
+        " -> ".join(str(b) for b in buses[-LIST_LIMIT // 2:])
+    return f"Bus {source} reaches bus {target} in {len(buses) - 1} branches: {route}."
+
+MEASURE_LABELS = {
+    ("Bus", "NomKV"): ("nominal voltage", "kV", "buses"),
+    ("Gen", "GenMW"): ("output", "MW", "generators"),
+    ("Load", "LoadMW"): ("demand", "MW", "loads"),
+    ("Branch", "MW"): ("flow", "MW", "branches"),
+}
+AGG_LABELS = {"mean": "average", "median": "median", "max": "largest", "min": "smallest", "sum": "total"}
+ROW_TEMPLATES = {
+    "Bus": "bus {BusNum} ({BusName}): {NomKV} kV",
+    "Gen": "generator {GenID} at bus {BusNum}: {GenMW} MW ({Status})",
+    "Load": "load {LoadID} at bus {BusNum}: {LoadMW} MW ({Status})",
+    "Branch": "branch {BusNum}-{ToBus} circuit {LineCircuit}: {MW} MW ({Status})",
+}
+
+def needs_columns(intent, entities):
+    """Whether a stats intent asks for a filter or size the stored statistics do not cover."""
+    if intent in ("gen_total", "load_total"):
+        return "zone" in entities or "online" in entities
+    if intent == "largest_gens":
+        return any(k in entities for k in ("area", "zone", "online")) or entities.get("top", 0) > TOP_N
+    return False
+
+def column_filters(cols, table, entities):
+    """Column store conditions for the area/zone/in-service entities, and how to say them."""
+    where, text = [], ""
+    for key, column in (("area", "AreaNum"), ("zone", "ZoneNum")):
+        if key in entities and cols.has_column(table, column):
+            where.append([column, "=", int(entities[key])])
+            text += f" in {key} {entities[key]}"
+    if entities.get("online") and cols.has_column(table, "Online"):
+        where.append(["Online", "=", True])
+        text += " in service"
+    return where, text
+
+def answer_from_columns(cols, intent, entities):
+    if intent in ("gen_total", "load_total"):
+        table, column, mvar, noun = (("Gen", "GenMW", "GenMvar", "generation") if intent == "gen_total"
+                                     else ("Load", "LoadMW", "LoadMvar", "load"))
+    elif intent == "largest_gens":
+        table, column = "Gen", "GenMW"
+    else:
+        table, column = entities["measure"]
+    label, unit, plural = MEASURE_LABELS[(table, column)]
+    if table not in cols.tables:
+        return f"No {plural} data in this case."
+    where, where_text = column_filters(cols, table, entities)
+    mask = cols.mask(table, where)
+
+    if intent in ("gen_total", "load_total"):
+        mw = aggregate(cols, table, mask, "sum", column)
+        if not mw["count"]:
+            return f"No {plural} found{where_text}."
+        mvar_total = aggregate(cols, table, mask, "sum", mvar)["value"] or 0.0
+        return (f"Total {noun}{where_text} is {round(mw['value'], 3)} MW and {round(mvar_total, 3)} Mvar "
+                f"across {mw['count']} {plural}.")
+
+    if intent in ("largest_gens", "top_elements"):
+        ascending = entities.get("agg") == "min"
+        rows = top_rows(cols, table, mask, column, entities.get("top", 5), ascending, absolute=table == "Branch")
+        if not rows:
+            return f"No {plural} found{where_text}."
+        # "BusNum:1" is not a usable format field name.
+        listed = "; ".join(ROW_TEMPLATES[table].format(ToBus=row.get("BusNum:1"), **row) for row in rows)
+        return f"The {len(rows)} {'smallest' if ascending else 'largest'} {plural}{where_text} are {listed}."
+
+    if intent == "histogram":
+        h = histogram(cols, table, mask, column)
+        total = sum(h["counts"])
+        if not total:
+            return f"No {plural} found{where_text}."
+        if "values" in h:
+            parts = [f"{v:g} {unit}: {n}" for v, n in zip(h["values"], h["counts"])]
+        else:
+            edges = h["edges"]
+            parts = [f"{edges[i]:g}-{edges[i + 1]:g} {unit}: {n}" for i, n in enumerate(h["counts"])]
+        return f"Distribution of {label} across {total} {plural}{where_text}: {'; '.join(parts)}."
+
+    agg = entities.get("agg", "mean")
+    result = aggregate(cols, table, mask, agg, column)
+    if not result["count"]:
+        return f"No {plural} found{where_text}."
+    return (f"The {AGG_LABELS[agg]} {label} of {result['count']} {plural}{where_text} "
+            f"is {round(result['value'], 3)} {unit}.")
+
+def answer_question(conn, route, question):
+    c = conn.cursor()
+    intent, entities = route
+
+    if intent in COLUMN_INTENTS and (intent not in STATS_INTENTS or needs_columns(intent, entities)):
+        return answer_from_columns(columns_for(conn), intent, entities)
+
+    if intent in STATS_INTENTS:
+        return answer_from_stats(stats_for(conn), intent, entities)
+
+    if intent in TOPOLOGY_INTENTS:
+        topo = topology_for(conn)
+        if intent == "bus_neighbors":
+            return neighbors_answer(conn, topo, entities)
+        if intent == "islands":
+            return islands_answer(topo, entities)
+        return path_answer(topo, entities)
+
+    if intent == "bus_kv":
+        busnum = entities["bus"]
+        c.execute('SELECT "BusName","NomKV" FROM "Bus" WHERE "BusNum"=?', (busnum,))
+        row = c.fetchone()
+        if row:
+            return f"Bus {busnum} ({row[0]}) operates at {row[1]} kV."
+        return f"No info found for bus {busnum}."
+
+    if intent == "gen_mw":
+        gen_id = entities["gen_id"]
+        if "bus" in entities:
+            c.execute('SELECT "BusNum","GenMW","Status" FROM "Gen" WHERE "BusNum"=? AND "GenID"=?',
+                      (entities["bus"], gen_id))
+        else:
+            c.execute('SELECT "BusNum","GenMW","Status" FROM "Gen" WHERE "GenID"=? ORDER BY "BusNum"', (gen_id,))
+        rows = c.fetchall()
+        if not rows:
+            where = f" at bus {entities['bus']}" if "bus" in entities else ""
+            return f"No info found for generator {gen_id}{where}."
+        busnum, mw, status = rows[0]
+        answer = f"Generator {gen_id} at bus {busnum} produces {mw} MW. Status: {status}."
+        if len(rows) > 1:
+            others = ", ".join(str(r[0]) for r in rows[1:6])
+            answer += f" Other generators with ID {gen_id} are at buses {others}{' and others' if len(rows) > 6 else ''}."
+        return answer
+
+    if intent == "load_mw":
+        load_id = entities["load_id"]
+        if "bus" in entities:
+            c.execute('SELECT "BusNum","LoadMW","Status" FROM "Load" WHERE "BusNum"=? AND "LoadID"=?',
+                      (entities["bus"], load_id))
+        else:
+            c.execute('SELECT "BusNum","LoadMW","Status" FROM "Load" WHERE "LoadID"=? ORDER BY "BusNum"', (load_id,))
+        rows = c.fetchall()
+        if not rows:
+            where = f" at bus {entities['bus']}" if "bus" in entities else ""
+            return f"No info found for load {load_id}{where}."
+        busnum, mw, status = rows[0]
+        answer = f"Load {load_id} at bus {busnum} consumes {mw} MW. Status: {status}."
+        if len(rows) > 1:
+            others = ", ".join(str(r[0]) for r in rows[1:6])
+            answer += f" Other loads with ID {load_id} are at buses {others}{' and others' if len(rows) > 6 else ''}."
+        return answer
+
+    return f"Sorry, I can’t answer that yet. You asked: {question}"
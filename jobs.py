@@ -0,0 +1,119 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+MAX_JOBS_KEPT = 200
+TERMINAL_STATES = ("done", "failed")
+
+
+class Job:
+    def __init__(self, job_id, case_id, filename):
+        self.job_id = job_id
+        self.case_id = case_id
+        self.filename = filename
+        self.state = "queued"
+        self.objects = {}
+        self.stats = None
+        self.error = None
+        self.cached = False
+        self.created = time.time()
+        self.finished = None
+        self.version = 0
+
+    def to_dict(self):
+        end = self.finished or time.time()
+        return {
+            "job_id": self.job_id,
+            "case_id": self.case_id,
+            "filename": self.filename,
+            "state": self.state,
+            "cached": self.cached,
+            "objects": self.objects,
+            "rows_ingested": sum(o["rows"] for o in self.objects.values()),
+            "elapsed": round(end - self.created, 3),
+            "stats": self.stats,
+            "error": self.error,
+        }
+
+
+class JobRegistry:
+    """Tracks background upload jobs and wakes up listeners on every change."""
+
+    def __init__(self, max_jobs=MAX_JOBS_KEPT):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+
+    def create(self, case_id, filename):
+        with self._cond:
+            job = Job(str(next(self._ids)), case_id, filename)
+            self._jobs[job.job_id] = job
+            self._trim()
+            return job
+
+    def get_or_create(self, case_id, filename):
+        """The unfinished job for case_id, or a new one; returns (job, created).
+
+        Check and create happen under one lock so concurrent uploads of the
+        same file start a single job.
+        """
+        with self._cond:
+            job = self.active_for_case(case_id)
+            if job is not None:
+                return job, False
+            return self.create(case_id, filename), True
+
+    def get(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def active_for_case(self, case_id):
+        with self._cond:
+            for job in self._jobs.values():
+                if job.case_id == case_id and job.state not in TERMINAL_STATES:
+                    return job
+        return None
+
+    def _update(self, job_id, **fields):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            for k, v in fields.items():
+                setattr(job, k, v)
+            job.version += 1
+            self._cond.notify_all()
+
+    def progress(self, job_id, obj, state, rows):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.state = "running"
+            job.objects[obj] = {"state": state, "rows": rows}
+            job.version += 1
+            self._cond.notify_all()
+
+    def finish(self, job_id, stats=None, cached=False):
+        self._update(job_id, state="done", stats=stats, cached=cached, finished=time.time())
+
+    def fail(self, job_id, error):
+        self._update(job_id, state="failed", error=error, finished=time.time())
+
+    def wait(self, job_id, version, timeout=15):
+        """Block until the job changes past `version`; return (version, snapshot)."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: job_id not in self._jobs or self._jobs[job_id].version > version,
+                timeout=timeout,
+            )
+            job = self._jobs.get(job_id)
+            return (job.version, job.to_dict()) if job else (version, None)
+
+    def _trim(self):
+        finished = [jid for jid, j in self._jobs.items() if j.state in TERMINAL_STATES]
+        while len(self._jobs) > self.max_jobs and finished:
+            del self._jobs[finished.pop(0)]
@@ -0,0 +1,38 @@
+import threading
+from collections import deque
+
+WINDOW = 1000
+
+
+class LatencyWindow:
+    """Rolling window of timings per metric name, summarized as count/p50/p95/max."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def count(self, name):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            out = {}
+            for name, n in self._counts.items():
+                samples = sorted(self._samples.get(name, ()))
+                entry = {"count": n}
+                if samples:
+                    entry.update({
+                        "p50": round(samples[len(samples) // 2], 4),
+                        "p95": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+                        "max": round(samples[-1], 4),
+                    })
+                out[name] = entry
+            return out
@@ -0,0 +1,386 @@
+import argparse
+import hashlib
+import os
+import queue
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import Future
+
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "none")
+LLM_MODEL_PATH = os.environ.get("LLM_MODEL_PATH", "")
+LLM_THREADS = int(os.environ.get("LLM_THREADS", os.cpu_count() or 4))
+LLM_BATCH_THREADS = int(os.environ.get("LLM_BATCH_THREADS", LLM_THREADS))
+LLM_CTX = int(os.environ.get("LLM_CTX", 4096))
+LLM_MAX_TOKENS = int(os.environ.get("LLM_MAX_TOKENS", 256))
+LLM_MAX_BATCH = int(os.environ.get("LLM_MAX_BATCH", 8))
+LLM_BATCH_WAIT = float(os.environ.get("LLM_BATCH_WAIT_MS", 20)) / 1000
+LLM_PREFIX_CACHE = int(os.environ.get("LLM_PREFIX_CACHE", 8))
+
+SYSTEM_PROMPT = (
+    "You are a power systems assistant. Use this power system info to answer "
+    "questions about the PowerWorld case. If the data does not contain the answer, say so."
+)
+
+# ----------------------
+# Prompts
+# ----------------------
+# The prompt is split into a prefix (system prompt + case data), which is
+# identical for every question about a case, and a short per-question
+# suffix (retrieved rows + question). Backends evaluate the prefix once
+# and reuse its KV state.
+
+def case_context(stats):
+    """Plain-text case data for the prompt, built from the stored case statistics."""
+    counts = stats.get("counts", {})
+    lines = [", ".join(f"{table}: {n}" for table, n in counts.items())]
+    for section, label in [("gen", "Generation"), ("load", "Load")]:
+        info = stats.get(section)
+        if info:
+            lines.append(f"{label}: {info['total_mw']} MW, {info['total_mvar']} Mvar, "
+                         f"{info['online']} in service, {info['offline']} out of service")
+    kv_levels = stats.get("bus", {}).get("kv_levels")
+    if kv_levels:
+        lines.append("Bus kV levels: " + ", ".join(f"{kv} kV x{n}" for kv, n in kv_levels.items()))
+    top = stats.get("gen", {}).get("top")
+    if top:
+        lines.append("Largest generators: " + "; ".join(f"bus {b} id {g} {mw} MW {s}" for b, g, mw, s in top))
+    return "\n".join(lines)
+
+def build_prefix(context):
+    return f"[INST] <<SYS>>\n{SYSTEM_PROMPT}\n\nCase data:\n{context}\n<</SYS>>\n\n"
+
+def build_suffix(question, rows=""):
+    # Retrieved rows depend on the question, so they go after the cached prefix.
+    if rows:
+        return f"Relevant case rows:\n{rows}\n\n{question} [/INST]"
+    return f"{question} [/INST]"
+
+def prefix_key(prefix):
+    return hashlib.sha1(prefix.encode("utf-8")).hexdigest()
+
+
+class PrefixCache:
+    """LRU of evaluated prompt-prefix states, keyed by prefix hash."""
+
+    def __init__(self, max_entries=LLM_PREFIX_CACHE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        state = self._entries.get(key)
+        if state is not None:
+            self._entries.move_to_end(key)
+        return state
+
+    def put(self, key, state):
+        self._entries[key] = state
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ----------------------
+# Backends
+# ----------------------
+# A backend generates answers for a group of requests sharing one prefix:
+# generate(prefix, requests, max_tokens) returns one string per request,
+# calls request.emit(text) for each new piece of text and stops decoding a
+# request as soon as request.cancelled() is true. Backends are only ever
+# used from the engine's batching thread.
+
+class StubBackend:
+    """CPU-only stand-in for a model, for tests and load tests.
+
+    Tokens are whitespace-separated words. token_cost and step_cost simulate
+    prompt evaluation (per token) and decoding (per step, shared by the
+    whole batch, like a batched forward pass).
+    """
+
+    name = "stub"
+
+    def __init__(self, token_cost=0.0, step_cost=0.0, prefix_cache=LLM_PREFIX_CACHE):
+        self.token_cost = token_cost
+        self.step_cost = step_cost
+        self.cache = PrefixCache(prefix_cache)
+        self.counters = {"prefix_hits": 0, "prefix_misses": 0, "prompt_tokens": 0,
+                         "reused_tokens": 0, "generated_tokens": 0}
+
+    def _eval(self, n_tokens):
+        self.counters["prompt_tokens"] += n_tokens
+        if self.token_cost:
+            time.sleep(self.token_cost * n_tokens)
+
+    def generate(self, prefix, requests, max_tokens):
+        key = prefix_key(prefix)
+        prefix_tokens = prefix.split()
+        if self.cache.get(key) is None:
+            self.counters["prefix_misses"] += 1
+            self._eval(len(prefix_tokens))
+            self.cache.put(key, len(prefix_tokens))
+        else:
+            self.counters["prefix_hits"] += 1
+        context_line = prefix.split("Case data:\n", 1)[-1].split("\n", 1)[0]
+        answers = []
+        for r in requests:
+            self.counters["reused_tokens"] += len(prefix_tokens)
+            self._eval(len(r.suffix.split()))
+            question = r.suffix.rsplit(" [/INST]", 1)[0].rsplit("\n", 1)[-1]
+            answers.append(f"Based on the case data ({context_line}), here is what I can tell about: {question}".split()[:max_tokens])
+        outputs = [[] for _ in requests]
+        for step in range(max(len(a) for a in answers)):
+            live = [i for i, words in enumerate(answers) if step < len(words) and not requests[i].cancelled()]
+            if not live:
+                break
+            if self.step_cost:
+                time.sleep(self.step_cost)
+            for i in live:
+                piece = answers[i][step] if step == 0 else " " + answers[i][step]
+                outputs[i].append(piece)
+                self.counters["generated_tokens"] += 1
+                requests[i].emit(piece)
+        return ["".join(o) for o in outputs]
+
+
+class LlamaCppBackend:
+    """llama.cpp model via llama-cpp-python.
+
+    The evaluated prefix state (KV cache) of each recent case is kept in a
+    PrefixCache; a group of questions loads it once, and llama.cpp's own
+    longest-common-prefix check skips re-evaluating it for every question
+    in the group. Questions in a group are decoded one after another:
+    llama-cpp-python's high-level API runs a single sequence.
+    """
+
+    name = "llama_cpp"
+
+    def __init__(self, model_path=LLM_MODEL_PATH, n_ctx=LLM_CTX, n_threads=LLM_THREADS,
+                 n_threads_batch=LLM_BATCH_THREADS, prefix_cache=LLM_PREFIX_CACHE):
+        from llama_cpp import Llama
+
+        if not model_path:
+            raise ValueError("LLM_MODEL_PATH must point to a GGUF model for the llama_cpp backend")
+        self.llm = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads,
+                         n_threads_batch=n_threads_batch, verbose=False)
+        self.cache = PrefixCache(prefix_cache)
+        self._loaded = None
+        self.counters = {"prefix_hits": 0, "prefix_misses": 0, "prompt_tokens": 0,
+                         "reused_tokens": 0, "generated_tokens": 0}
+
+    def _load_prefix(self, prefix):
+        key = prefix_key(prefix)
+        if self._loaded == key:
+            self.counters["prefix_hits"] += 1
+            return
+        state = self.cache.get(key)
+        if state is not None:
+            self.counters["prefix_hits"] += 1
+            self.llm.load_state(state)
+        else:
+            self.counters["prefix_misses"] += 1
+            tokens = self.llm.tokenize(prefix.encode("utf-8"))
+            self.llm.reset()
+            self.llm.eval(tokens)
+            self.counters["prompt_tokens"] += len(tokens)
+            self.cache.put(key, self.llm.save_state())
+        self._loaded = key
+
+    def generate(self, prefix, requests, max_tokens):
+        self._load_prefix(prefix)
+        answers = []
+        for r in requests:
+            before = self.llm.n_tokens
+            pieces = []
+            if not r.cancelled():
+                # Closing the stream early stops llama.cpp from decoding further.
+                for chunk in self.llm.create_completion(prefix + r.suffix, max_tokens=max_tokens,
+                                                        temperature=0.0, stream=True):
+                    piece = chunk["choices"][0]["text"]
+                    pieces.append(piece)
+                    self.counters["generated_tokens"] += 1
+                    r.emit(piece)
+                    if r.cancelled():
+                        break
+            self.counters["reused_tokens"] += before
+            answers.append("".join(pieces).strip())
+        return answers
+
+
+def open_backend(backend):
+    if backend == "stub":
+        return StubBackend()
+    if backend == "llama_cpp":
+        return LlamaCppBackend()
+    raise ValueError(f"Unknown LLM backend: {backend}")
+
+
+# ----------------------
+# Engine
+# ----------------------
+class Generation(Future):
+    """Future for one request; cancel() also stops a generation already running."""
+
+    def __init__(self):
+        super().__init__()
+        self.stopped = threading.Event()
+
+    def cancel(self):
+        self.stopped.set()
+        return super().cancel()
+
+
+class Request:
+    def __init__(self, prefix, suffix, max_tokens, on_token):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.max_tokens = max_tokens
+        self.on_token = on_token
+        self.future = Generation()
+        self.queued = time.monotonic()
+
+    def cancelled(self):
+        return self.future.stopped.is_set()
+
+    def emit(self, piece):
+        if self.on_token:
+            self.on_token(piece)
+
+
+class InferenceEngine:
+    """Queue of /ask generation requests served by one batching thread.
+
+    The thread waits up to batch_wait for up to max_batch requests, groups
+    them by prompt prefix (case) and hands each group to the backend in one
+    call, so concurrent questions about the same case share one prefix
+    evaluation. submit() returns a Generation future resolving to the
+    answer text; on_token, if given, is called from the batching thread with
+    each piece of text as it is decoded. Cancelling the future drops a
+    queued request or stops decoding a running one.
+    """
+
+    def __init__(self, backend, max_batch=LLM_MAX_BATCH, batch_wait=LLM_BATCH_WAIT,
+                 max_tokens=LLM_MAX_TOKENS):
+        self.backend = backend
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.max_tokens = max_tokens
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.counters = {"requests": 0, "done": 0, "failed": 0, "cancelled": 0, "batches": 0, "batched": 0,
+                         "groups": 0, "largest_batch": 0, "queue_seconds": 0.0}
+        self._thread = threading.Thread(target=self._run, name="llm-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, context, question, rows="", max_tokens=None, on_token=None):
+        request = Request(build_prefix(context), build_suffix(question, rows),
+                          min(max_tokens or self.max_tokens, self.max_tokens), on_token)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("inference engine is closed")
+            self.counters["requests"] += 1
+            self._queue.put(request)
+        return request.future
+
+    def generate(self, context, question, timeout=None, **kwargs):
+        return self.submit(context, question, **kwargs).result(timeout)
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            now = time.monotonic()
+            # Requests cancelled while still queued are dropped here.
+            self.counters["cancelled"] += sum(1 for r in batch if r.cancelled())
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.counters["batches"] += 1
+            self.counters["batched"] += len(batch)
+            self.counters["largest_batch"] = max(self.counters["largest_batch"], len(batch))
+            self.counters["queue_seconds"] += sum(now - r.queued for r in batch)
+            groups = OrderedDict()
+            for request in batch:
+                groups.setdefault((request.prefix, request.max_tokens), []).append(request)
+            for (prefix, max_tokens), requests in groups.items():
+                self.counters["groups"] += 1
+                try:
+                    answers = self.backend.generate(prefix, requests, max_tokens)
+                except Exception as e:
+                    traceback.print_exc()
+                    for r in requests:
+                        self.counters["failed"] += 1
+                        r.future.set_exception(e)
+                    continue
+                for r, answer in zip(requests, answers):
+                    self.counters["cancelled" if r.cancelled() else "done"] += 1
+                    r.future.set_result(answer)
+
+    def status(self):
+        return {
+            "backend": self.backend.name,
+            "pending": self._queue.qsize(),
+            "prefix_cache_entries": len(self.backend.cache),
+            "avg_batch": round(self.counters["batched"] / self.counters["batches"], 2) if self.counters["batches"] else None,
+            **self.counters,
+            **self.backend.counters,
+        }
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+
+# ----------------------
+# Load test
+# ----------------------
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+
+    parser = argparse.ArgumentParser(description="Load-test the inference engine with the stub backend.")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--cases", type=int, default=2)
+    parser.add_argument("--max-batch", type=int, default=LLM_MAX_BATCH)
+    parser.add_argument("--token-cost", type=float, default=0.0002, help="simulated seconds per prompt token")
+    parser.add_argument("--step-cost", type=float, default=0.002, help="simulated seconds per decode step")
+    parser.add_argument("--max-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    contexts = [f"Bus: {1000 * (i + 1)}, Gen: {200 * (i + 1)}\n" + "case data " * 400 for i in range(args.cases)]
+    engine = InferenceEngine(StubBackend(args.token_cost, args.step_cost), max_batch=args.max_batch,
+                             max_tokens=args.max_tokens)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.users) as users:
+        list(users.map(lambda i: engine.generate(contexts[i % args.cases], f"question {i}?"), range(args.questions)))
+    elapsed = time.perf_counter() - start
+    engine.close()
+    print(f"\n {args.questions} questions from {args.users} users in {elapsed:.2f}s ({args.questions / elapsed:.1f} q/s)")
+    print(f" Engine status: {engine.status()}")
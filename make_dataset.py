@@ -1,180 +1,230 @@
-import sqlite3
+import argparse
+import gzip
 import json
-import random
+import multiprocessing as mp
 import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from case_stats import count, load_stats
 
 # ----------------------
 # Config
 # ----------------------
 DB_PATH = "caseinfo.db"
 OUT_FILE = "dataset.jsonl"
-NUM_EXAMPLES = 1000
+SHARD_ROWS = 50_000
+PER_ELEMENT = 2
+FETCH_SIZE = 5000
+SEED = 0
+
+# ----------------------
+# Templates
+# ----------------------
+# Case-level questions are answered from the case statistics; element
+# questions are rendered for every row of their table. Answers use the same
+# wording as the /ask router so training data and live answers agree.
+SUMMARY_QUESTIONS = [
+    "Can you summarize the case?",
+    "Give me an overview of this system.",
+    "What does this case contain?",
+    "Provide a short summary of the network.",
+    "Summarize the case in terms of buses, gens, loads, branches.",
+]
+
+COUNT_QUESTIONS = [
+    ("Bus", "buses", ["How many buses are there?", "Number of buses?", "Count of buses?", "Total buses in the system?"]),
+    ("Gen", "generators", ["How many generators are in the system?", "Number of generators?", "Count of generators?", "Total generators?"]),
+    ("Load", "loads", ["How many loads does the case have?", "Number of loads?", "Count of loads?", "Total loads?"]),
+    ("Branch", "branches", ["How many branches are there?", "Number of lines?", "Count of branches?", "Total transmission lines?"]),
+]
+
+ELEMENT_TEMPLATES = {
+    "Bus": {
+        "columns": ["BusNum", "BusName", "NomKV"],
+        "questions": [
+            "What is the nominal voltage of bus {BusNum}?",
+            "At what kV does {BusName} operate?",
+            "Bus {BusNum} nominal kV?",
+            "Voltage rating of {BusName}?",
+            "What voltage level is bus {BusNum} ({BusName}) at?",
+            "Tell me the kV of bus {BusNum}.",
+        ],
+        "answer": "Bus {BusNum} ({BusName}) operates at {NomKV} kV.",
+    },
+    "Gen": {
+        "columns": ["BusNum", "GenID", "GenMW", "Status"],
+        "questions": [
+            "What is the MW output of generator {GenID} at bus {BusNum}?",
+            "How much power does generator {GenID} at bus {BusNum} produce?",
+            "Generator {GenID} at bus {BusNum}, what is its MW?",
+            "Status and MW of generator {GenID} at bus {BusNum}?",
+            "Is generator {GenID} at bus {BusNum} online, and what is it producing?",
+        ],
+        "answer": "Generator {GenID} at bus {BusNum} produces {GenMW} MW. Status: {Status}.",
+    },
+    "Load": {
+        "columns": ["BusNum", "LoadID", "LoadMW", "Status"],
+        "questions": [
+            "How much does load {LoadID} at bus {BusNum} consume?",
+            "What is the MW of load {LoadID} at bus {BusNum}?",
+            "Load {LoadID} at bus {BusNum}, what is its demand?",
+            "Status and MW of load {LoadID} at bus {BusNum}?",
+        ],
+        "answer": "Load {LoadID} at bus {BusNum} consumes {LoadMW} MW. Status: {Status}.",
+    },
+}
+
 
 # ----------------------
 # Utility functions
 # ----------------------
-def get_counts():
-    """Fetch counts for each table from the PowerWorld SQLite DB."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    counts = {}
-    for table in ["Bus", "Gen", "Load", "Branch"]:
-        try:
-            c.execute(f'SELECT COUNT(*) FROM "{table}"')
-            counts[table] = c.fetchone()[0]
-        except Exception:
-            counts[table] = 0
-    conn.close()
+def get_counts(db_path=DB_PATH):
+    """Fetch counts for each table from the case statistics in the SQLite DB."""
+    stats = load_stats(db_path)
+    counts = {table: count(stats, table) for table in ["Bus", "Gen", "Load", "Branch"]}
 
     print(" Counts from DB:", counts)
     return counts
 
+def example(instruction, output):
+    return {"instruction": instruction, "input": "", "output": output}
 
-def get_sample_buses(n=5):
-    """Fetch sample bus info (BusNum, BusName, NomKV)."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    try:
-        c.execute('SELECT "BusNum","BusName","NomKV" FROM "Bus" LIMIT ?', (n,))
-        rows = c.fetchall()
-    except Exception:
-        rows = []
-    conn.close()
-    return rows
-
-
-def get_sample_gens(n=5):
-    """Fetch sample generator info (BusNum, GenID, GenMW, Status)."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    try:
-        c.execute('SELECT "BusNum","GenID","GenMW","Status" FROM "Gen" LIMIT ?', (n,))
-        rows = c.fetchall()
-    except Exception:
-        rows = []
-    conn.close()
-    return rows
-
-
-# ----------------------
-# Dataset generation
-# ----------------------
-def generate_examples():
-    counts = get_counts()
-    buses = get_sample_buses(10)
-    gens = get_sample_gens(10)
-
-    qas = []
-
-    # --- Summary style questions ---
-    summary_phrases = [
-        "Can you summarize the case?",
-        "Give me an overview of this system.",
-        "What does this case contain?",
-        "Provide a short summary of the network.",
-        "Summarize the case in terms of buses, gens, loads, branches."
-    ]
+def case_examples(db_path):
+    counts = get_counts(db_path)
     summary_output = (
         f"This case contains {counts.get('Bus', 0)} buses, "
         f"{counts.get('Gen', 0)} generators, "
         f"{counts.get('Load', 0)} loads, and "
         f"{counts.get('Branch', 0)} branches."
     )
-    for q in summary_phrases:
-        qas.append({
-            "instruction": q,
-            "input": "",
-            "output": summary_output
-        })
-
-    # --- Count questions ---
-    count_templates = [
-        ("Bus", ["How many buses are there?", "Number of buses?", "Count of buses?", "Total buses in the system?"]),
-        ("Gen", ["How many generators are in the system?", "Number of generators?", "Count of generators?", "Total generators?"]),
-        ("Load", ["How many loads does the case have?", "Number of loads?", "Count of loads?", "Total loads?"]),
-        ("Branch", ["How many branches are there?", "Number of lines?", "Count of branches?", "Total transmission lines?"])
-    ]
-
-    for table, qs in count_templates:
-        plural_name = {
-            "Bus": "buses",
-            "Gen": "generators",
-            "Load": "loads",
-            "Branch": "branches"
-        }[table]
-
+    for q in SUMMARY_QUESTIONS:
+        yield example(q, summary_output)
+    for table, plural_name, qs in COUNT_QUESTIONS:
         for q in qs:
-            qas.append({
-                "instruction": q,
-                "input": "",
-                "output": f"There are {counts.get(table, 0)} {plural_name} in this case."
-            })
-
-    # --- Bus KV questions ---
-    for busnum, busname, kv in buses:
-        kv_qs = [
-            f"What is the nominal voltage of bus {busnum}?",
-            f"At what kV does {busname} operate?",
-            f"Bus {busnum} nominal kV?",
-            f"Voltage rating of {busname}?"
-        ]
-        for q in kv_qs:
-            qas.append({
-                "instruction": q,
-                "input": "",
-                "output": f"Bus {busnum} ({busname}) operates at {kv} kV."
-            })
-
-    # --- Generator MW questions ---
-    for busnum, genid, mw, status in gens:
-        gen_qs = [
-            f"What is the MW output of generator {genid} at bus {busnum}?",
-            f"How much power does generator {genid} produce?",
-            f"Generator {genid} at bus {busnum}, what is its MW?",
-            f"Status and MW of generator {genid}?"
-        ]
-        for q in gen_qs:
-            qas.append({
-                "instruction": q,
-                "input": "",
-                "output": f"Generator {genid} at bus {busnum} produces {mw} MW. Status: {status}."
-            })
-
-    # --- Random paraphrased variations ---
-    more_qas = []
-    all_templates = list(qas)
-    while len(more_qas) + len(qas) < NUM_EXAMPLES:
-        ex = random.choice(all_templates)
-        var_q = ex["instruction"].rstrip("?").capitalize() + " please?"
-        more_qas.append({
-            "instruction": var_q,
-            "input": ex["input"],
-            "output": ex["output"]
-        })
-
-    dataset = qas + more_qas[: NUM_EXAMPLES - len(qas)]
-
-    # --- Save to file ---
-    with open(OUT_FILE, "w", encoding="utf-8") as f:
-        for ex in dataset:
-            json.dump(ex, f, ensure_ascii=False)
-            f.write("\n")
+            yield example(q, f"There are {counts.get(table, 0)} {plural_name} in this case.")
+
+def element_examples(conn, table, lo, hi, rng, per_element):
+    """Stream examples for rows lo <= rowid < hi of table, per_element distinct phrasings each."""
+    spec = ELEMENT_TEMPLATES[table]
+    col_list = ", ".join(f'"{c}"' for c in spec["columns"])
+    cursor = conn.execute(f'SELECT {col_list} FROM "{table}" WHERE rowid >= ? AND rowid < ? ORDER BY rowid', (lo, hi))
+    k = min(per_element, len(spec["questions"]))
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            break
+        for row in rows:
+            values = dict(zip(spec["columns"], row))
+            answer = spec["answer"].format(**values)
+            for q in rng.sample(spec["questions"], k):
+                yield example(q.format(**values), answer)
 
-    print(f"\n Dataset saved to {OUT_FILE} with {len(dataset)} examples")
-    print(" Example preview:")
-    for ex in dataset[:5]:
-        print(f"  Q: {ex['instruction']}")
-        print(f"  A: {ex['output']}\n")
 
-    return dataset
+# ----------------------
+# Sharded generation
+# ----------------------
+# Work is split into units of at most shard_rows rows of one table of one
+# case. Each unit has its own seed and output file, so the result is the
+# same whatever the number of processes or the order units finish in, and a
+# worker only ever holds one fetch of rows in memory.
+
+def plan_units(db_paths, shard_rows):
+    units = []
+    for db_path in db_paths:
+        units.append((db_path, None, 0, 0))
+        conn = sqlite3.connect(db_path)
+        try:
+            for table in ELEMENT_TEMPLATES:
+                try:
+                    lo, hi = conn.execute(f'SELECT MIN(rowid), MAX(rowid) FROM "{table}"').fetchone()
+                except sqlite3.OperationalError:
+                    continue
+                if lo is None:
+                    continue
+                for start in range(lo, hi + 1, shard_rows):
+                    units.append((db_path, table, start, min(start + shard_rows, hi + 1)))
+        finally:
+            conn.close()
+    return units
+
+def open_shard(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6)
+    return open(path, mode, encoding="utf-8")
+
+def generate_unit(job):
+    index, (db_path, table, lo, hi), out_dir, seed, per_element, compress = job
+    path = os.path.join(out_dir, f"part-{index:05d}.jsonl" + (".gz" if compress else ""))
+    rng = random.Random(f"{seed}:{os.path.basename(db_path)}:{table}:{lo}")
+    n = 0
+    with open_shard(path, "w") as f:
+        if table is None:
+            examples = case_examples(db_path)
+            conn = None
+        else:
+            conn = sqlite3.connect(db_path)
+            examples = element_examples(conn, table, lo, hi, rng, per_element)
+        for ex in examples:
+            f.write(json.dumps(ex, ensure_ascii=False))
+            f.write("\n")
+            n += 1
+        if conn is not None:
+            conn.close()
+    return {"file": os.path.basename(path), "examples": n, "db": db_path, "table": table, "rowids": [lo, hi]}
+
+def generate_dataset(db_paths, out_dir, seed=SEED, per_element=PER_ELEMENT, shard_rows=SHARD_ROWS,
+                     processes=None, compress=False):
+    """Write sharded JSONL for every element of every case plus a manifest.json; returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    units = plan_units(db_paths, shard_rows)
+    jobs = [(i, unit, out_dir, seed, per_element, compress) for i, unit in enumerate(units)]
+    start = time.perf_counter()
+    with mp.get_context("spawn").Pool(processes or os.cpu_count()) as pool:
+        shards = sorted(pool.imap_unordered(generate_unit, jobs), key=lambda s: s["file"])
+    elapsed = time.perf_counter() - start
+    total = sum(s["examples"] for s in shards)
+    manifest = {"seed": seed, "per_element": per_element, "dbs": db_paths, "examples": total, "shards": shards}
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"\n Wrote {total:,} examples in {len(shards)} shards to {out_dir} "
+          f"in {elapsed:.2f}s ({total / elapsed:,.0f} examples/s)")
+    return manifest
+
+def merge_shards(out_dir, manifest, out_file):
+    with open_shard(out_file, "w") as out:
+        for shard in manifest["shards"]:
+            with open_shard(os.path.join(out_dir, shard["file"]), "r") as f:
+                shutil.copyfileobj(f, out)
+    print(f" Dataset saved to {out_file}")
 
 
 # ----------------------
 # Main
 # ----------------------
 if __name__ == "__main__":
-    if not os.path.exists(DB_PATH):
-        print(f" Database not found: {DB_PATH}")
+    parser = argparse.ArgumentParser(description="Generate instruction data from one or more case databases.")
+    parser.add_argument("--db", nargs="+", default=[DB_PATH])
+    parser.add_argument("--out", default=OUT_FILE, help="single JSONL output (used when --out-dir is not given)")
+    parser.add_argument("--out-dir", help="keep the sharded output and manifest in this directory")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--per-element", type=int, default=PER_ELEMENT, help="phrasings per element")
+    parser.add_argument("--shard-rows", type=int, default=SHARD_ROWS)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--gzip", action="store_true", help="compress shards")
+    args = parser.parse_args()
+
+    missing = [p for p in args.db if not os.path.exists(p)]
+    if missing:
+        print(f" Database not found: {', '.join(missing)}")
         print("  Please upload a .pwb file first to populate the database.")
+    elif args.out_dir:
+        generate_dataset(args.db, args.out_dir, args.seed, args.per_element, args.shard_rows, args.processes, args.gzip)
     else:
-        generate_examples()
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = generate_dataset(args.db, tmp, args.seed, args.per_element, args.shard_rows,
+                                        args.processes, args.gzip)
+            merge_shards(tmp, manifest, args.out)
@@ -0,0 +1,238 @@
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+TRACE_MODES = ("off", "trace", "profile")
+TRACE_KEEP = int(os.environ.get("METRICS_TRACE_KEEP", 50))
+PROFILE_LINES = 25
+
+HELP = {
+    "pw_http_requests_total": "HTTP requests by endpoint, method and status.",
+    "pw_http_request_seconds": "HTTP request time including the streamed body.",
+    "pw_response_bytes_total": "Bytes streamed in /view, /download and export responses.",
+    "pw_stage_seconds": "Time spent in request stages (routing, DB queries, rendering).",
+    "pw_cache_requests_total": "Per-case cache lookups by cache and result.",
+    "pw_ingest_stage_seconds": "Time spent in case ingestion stages per object type.",
+    "pw_ingest_rows_total": "Rows loaded per object type.",
+    "pw_ingest_jobs_total": "Ingestion jobs by result.",
+}
+
+# ----------------------
+# Registry
+# ----------------------
+# Counters and fixed-bucket histograms keyed by (name, labels). Recording is
+# a dict lookup and a few additions under one lock, cheap enough for the
+# per-batch and per-request hot paths. Extraction runs in worker processes,
+# which drain their registry after each job and send it to the pool (see
+# simauto_pool.py), where it is merged into the app's registry.
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items())) if labels else ()
+
+
+class MetricsRegistry:
+    """Counters and histograms rendered in the Prometheus text format."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            hist[0][bisect_left(self.buckets, seconds)] += 1
+            hist[1] += seconds
+
+    def add_collector(self, collect):
+        """collect() is called at render time and returns (name, type, labels, value) samples."""
+        self._collectors.append(collect)
+
+    def drain(self):
+        """Snapshot of all samples, clearing the registry."""
+        with self._lock:
+            snapshot = {"counters": self._counters, "histograms": self._histograms}
+            self._counters, self._histograms = {}, {}
+        return snapshot
+
+    def merge(self, snapshot):
+        with self._lock:
+            for key, value in snapshot["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+            for key, (counts, total) in snapshot["histograms"].items():
+                hist = self._histograms.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+                hist[0] = [a + b for a, b in zip(hist[0], counts)]
+                hist[1] += total
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((k, (list(c), s)) for k, (c, s) in self._histograms.items())
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), (counts, total) in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        for collect in self._collectors:
+            for name, kind, labels, value in collect():
+                header(name, kind)
+                lines.append(f"{name}{_labels(tuple(sorted(labels.items())))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+def inc(name, value=1, **labels):
+    REGISTRY.inc(name, value, **labels)
+
+
+# ----------------------
+# Traces
+# ----------------------
+# With the trace mode on, each HTTP request collects the stages it ran
+# through (every timed() block) with their offsets and durations; in
+# profile mode it is also run under cProfile. Finished traces are kept in
+# a short ring buffer. The mode can be changed at runtime (POST
+# /metrics/trace) and defaults to METRICS_TRACE.
+
+_trace_mode = os.environ.get("METRICS_TRACE", "off")
+_current = contextvars.ContextVar("trace", default=None)
+_profile_lock = threading.Lock()
+traces = deque(maxlen=TRACE_KEEP)
+
+def trace_mode():
+    return _trace_mode
+
+def set_trace_mode(mode):
+    global _trace_mode
+    if mode not in TRACE_MODES:
+        raise ValueError(f"Unknown trace mode {mode!r}; use one of {', '.join(TRACE_MODES)}")
+    _trace_mode = mode
+
+def start_trace(**info):
+    """Begin a trace for the current request if the trace mode is on."""
+    if _trace_mode == "off":
+        return None
+    trace = dict(info, start=time.perf_counter(), spans=[], profiler=None)
+    # Only one profiler can be active per process, so concurrent requests are traced without one.
+    if _trace_mode == "profile" and _profile_lock.acquire(blocking=False):
+        trace["profiler"] = cProfile.Profile()
+        trace["profiler"].enable()
+    _current.set(trace)
+    return trace
+
+def end_trace(**info):
+    trace = _current.get()
+    if trace is None:
+        return None
+    _current.set(None)
+    profiler = trace.pop("profiler")
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        trace["profile"] = out.getvalue()
+    trace.update(info, seconds=round(time.perf_counter() - trace.pop("start"), 6))
+    traces.append(trace)
+    return trace
+
+def current_spans():
+    trace = _current.get()
+    return trace["spans"] if trace else []
+
+
+# ----------------------
+# Timing hooks
+# ----------------------
+class timed:
+    """Context manager that records its block's time in a histogram (and the current trace).
+
+        with timed("pw_stage_seconds", stage="route") as t:
+            ...
+        t.seconds
+    """
+
+    __slots__ = ("name", "labels", "start", "seconds")
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        REGISTRY.observe(self.name, self.seconds, **self.labels)
+        trace = _current.get()
+        if trace is not None:
+            trace["spans"].append({"name": self.name, **self.labels,
+                                   "offset": round(self.start - trace["start"], 6),
+                                   "seconds": round(self.seconds, 6)})
+        return False
+
+def counted(chunks, name="pw_response_bytes_total", **labels):
+    """Pass a stream of str/bytes chunks through, counting the bytes sent."""
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk.encode() if isinstance(chunk, str) else chunk)
+            yield chunk
+    finally:
+        REGISTRY.inc(name, sent, **labels)
+
+def timed_chunks(chunks, stage):
+    """Pass a generator through, timing the work done to produce each chunk."""
+    chunks = iter(chunks)
+    while True:
+        with timed("pw_stage_seconds", stage=stage):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
@@ -0,0 +1,221 @@
+import json
+import os
+import re
+import sqlite3
+
+SEARCH_TABLE = "ElementSearch"
+VOCAB_TABLE = "ElementSearchVocab"
+TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", 20))
+CONTEXT_TOKENS = int(os.environ.get("RETRIEVAL_CONTEXT_TOKENS", 1000))
+# Terms found in more documents than this say little about the question and
+# make BM25 ranking walk huge posting lists, so they are dropped.
+MAX_TERM_DOCS = int(os.environ.get("RETRIEVAL_MAX_TERM_DOCS", 2000))
+
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "by", "can", "do", "does", "for", "from", "give", "has", "have",
+    "how", "i", "in", "is", "it", "list", "me", "many", "much", "of", "on", "or", "please", "show",
+    "tell", "than", "that", "the", "there", "this", "to", "what", "which", "who", "with",
+}
+WORD_RE = re.compile(r"[a-z0-9]+")
+NUMBER = r"(\d+(?:\.\d+)?)"
+RANGE_PATTERNS = [
+    (re.compile(rf"between {NUMBER} and {NUMBER} ?(\w+)"), "between"),
+    (re.compile(rf"(?:above|over|more than|greater than|at least|>=?) ?{NUMBER} ?(\w+)"), "min"),
+    (re.compile(rf"(?:below|under|less than|at most|<=?) ?{NUMBER} ?(\w+)"), "max"),
+    (re.compile(rf"{NUMBER} ?(\w+)"), "eq"),
+]
+
+# ----------------------
+# Index build
+# ----------------------
+# Every element becomes one short document rendered from the object's
+# "search" template in case_schema.json in an FTS5 table, ranked with BM25
+# at query time. Templates glue identifiers to their object tag ("bus5000",
+# "area3"), so "bus 5000" in a question becomes one rare token instead of
+# two common ones. Numeric questions ("gens over 500 MW", "345 kV buses")
+# go to the B-tree indexes on the "ranges" columns instead. Both are built
+# inside the ingest transaction.
+
+def _template_sql(template):
+    parts = []
+    for i, piece in enumerate(re.split(r"\{([^}]+)\}", template)):
+        if i % 2:
+            parts.append(f"COALESCE(\"{piece}\", '')")
+        elif piece:
+            parts.append("'" + piece.replace("'", "''") + "'")
+    return " || ".join(parts) or "''"
+
+def build_search_index(conn, search_spec):
+    conn.execute(f'DROP TABLE IF EXISTS "{SEARCH_TABLE}"')
+    conn.execute(f'CREATE VIRTUAL TABLE "{SEARCH_TABLE}" USING fts5(doc, obj UNINDEXED, ref UNINDEXED)')
+    total = 0
+    for obj, spec in search_spec.items():
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (obj,)).fetchone()
+        if not exists:
+            continue
+        cur = conn.execute(
+            f'INSERT INTO "{SEARCH_TABLE}" (doc, obj, ref) SELECT {_template_sql(spec["template"])}, ?, rowid FROM "{obj}"',
+            (obj,),
+        )
+        total += cur.rowcount
+    conn.execute(f'INSERT INTO "{SEARCH_TABLE}" ("{SEARCH_TABLE}") VALUES (\'optimize\')')
+    conn.execute(f'DROP TABLE IF EXISTS "{VOCAB_TABLE}"')
+    conn.execute(f'CREATE VIRTUAL TABLE "{VOCAB_TABLE}" USING fts5vocab("{SEARCH_TABLE}", \'row\')')
+    return total
+
+def update_search_index(conn, search_spec, changes):
+    """Re-render the documents of changed rows after an incremental load.
+
+    changes maps an object to (stale rowids, fresh rowids): documents of
+    stale rows are removed, fresh rows (updated or inserted) are indexed
+    again. Returns the number of documents written.
+    """
+    total = 0
+    for obj, (stale, fresh) in changes.items():
+        spec = search_spec.get(obj)
+        if spec is None:
+            continue
+        if stale:
+            conn.execute(f'DELETE FROM "{SEARCH_TABLE}" WHERE obj = ? AND ref IN (SELECT value FROM json_each(?))',
+                         (obj, json.dumps(stale)))
+        if fresh:
+            cur = conn.execute(
+                f'INSERT INTO "{SEARCH_TABLE}" (doc, obj, ref) SELECT {_template_sql(spec["template"])}, ?, rowid '
+                f'FROM "{obj}" WHERE rowid IN (SELECT value FROM json_each(?))',
+                (obj, json.dumps(fresh)),
+            )
+            total += cur.rowcount
+    return total
+
+
+# ----------------------
+# Queries
+# ----------------------
+def parse_question(question, search_spec):
+    """Split a question into tagged identifiers, FTS terms, mentioned objects and range filters."""
+    text = question.lower()
+    object_words = {w: obj for obj, spec in search_spec.items() for w in spec["words"]}
+    objects = [object_words[w] for w in WORD_RE.findall(text) if w in object_words]
+    units = {}
+    for obj, spec in search_spec.items():
+        for col, unit in spec["ranges"].items():
+            units.setdefault(unit, []).append((obj, col))
+
+    ranges = []
+    for pattern, kind in RANGE_PATTERNS:
+        for m in pattern.finditer(text):
+            unit = m.group(m.lastindex)
+            if unit not in units:
+                continue
+            a = float(m.group(1))
+            lo, hi = {"between": (a, float(m.group(2)) if kind == "between" else None),
+                      "min": (a, None), "max": (None, a), "eq": (a * 0.99, a * 1.01)}[kind]
+            if kind == "between" and hi < lo:
+                lo, hi = hi, lo
+            targets = [t for t in units[unit] if not objects or t[0] in objects] or units[unit]
+            ranges += [(obj, col, lo, hi) for obj, col in targets]
+            text = text[:m.start()] + " " * (m.end() - m.start()) + text[m.end():]
+
+    tagged, terms = [], []
+    words = text.split()
+    skip = False
+    for word, following in zip(words, words[1:] + [""]):
+        if skip:
+            skip = False
+            continue
+        parts = WORD_RE.findall(word)
+        if not parts:
+            continue
+        if len(parts) == 1 and parts[0] in object_words:
+            ident = WORD_RE.findall(following)
+            if len(ident) == 1 and any(ch.isdigit() for ch in ident[0]):
+                tagged.append(search_spec[object_words[parts[0]]]["tag"] + ident[0])
+                skip = True
+            continue
+        if len(parts) > 1:
+            # Names like BUS77_138 are split by the tokenizer; keep them as a phrase.
+            terms.append(" ".join(parts))
+        elif parts[0] not in STOPWORDS and parts[0] not in units:
+            terms.append(parts[0])
+    return list(dict.fromkeys(tagged)), list(dict.fromkeys(terms)), list(dict.fromkeys(objects)), ranges
+
+def _rows(conn, obj, where, params, order, k):
+    cur = conn.execute(f'SELECT * FROM "{obj}" WHERE {where} {order} LIMIT ?', params + [k])
+    cols = [d[0] for d in cur.description]
+    return [(obj, dict(zip(cols, row))) for row in cur]
+
+def _selective(conn, terms):
+    """Drop single-word terms that occur in more than MAX_TERM_DOCS documents."""
+    single = [t for t in terms if " " not in t]
+    if not single:
+        return terms
+    rows = conn.execute(
+        f'SELECT term, doc FROM "{VOCAB_TABLE}" WHERE term IN ({", ".join("?" * len(single))})', single
+    ).fetchall()
+    common = {term for term, docs in rows if docs > MAX_TERM_DOCS}
+    return [t for t in terms if t not in common]
+
+def _search(conn, query, objects, k):
+    sql = f'SELECT obj, ref FROM "{SEARCH_TABLE}" WHERE "{SEARCH_TABLE}" MATCH ?'
+    params = [query]
+    if objects:
+        sql += f" AND obj IN ({', '.join('?' * len(objects))})"
+        params += objects
+    return conn.execute(sql + " ORDER BY rank LIMIT ?", params + [k]).fetchall()
+
+def retrieve(conn, question, search_spec, k=TOP_K):
+    """Top-k elements for a question as (object, {column: value}) pairs, best first."""
+    tagged, terms, objects, ranges = parse_question(question, search_spec)
+    hits = []
+    for obj, col, lo, hi in ranges:
+        if lo is not None and hi is not None:
+            where, params = f'"{col}" BETWEEN ? AND ?', [lo, hi]
+        elif lo is not None:
+            where, params = f'"{col}" >= ?', [lo]
+        else:
+            where, params = f'"{col}" <= ?', [hi]
+        order = f'ORDER BY "{col}" ASC' if lo is None else f'ORDER BY "{col}" DESC'
+        hits += _rows(conn, obj, where, params, order, k)
+    try:
+        terms = _selective(conn, terms)
+        queries = []
+        if len(tagged) > 1:
+            # Elements matching every identifier ("generator 2 at bus 5000") first.
+            queries.append(" AND ".join(f'"{t}"' for t in tagged))
+        if tagged or terms:
+            queries.append(" OR ".join(f'"{t}"' for t in tagged + terms))
+        seen = set()
+        for query in queries:
+            if len(hits) >= k:
+                break
+            # Tagged identifiers already name the object, so only filter plain term searches,
+            # but list elements of the mentioned objects first.
+            refs = _search(conn, query, [] if tagged else objects, k - len(hits))
+            refs.sort(key=lambda r: r[0] not in objects)
+            for obj, ref in refs:
+                if (obj, ref) not in seen:
+                    seen.add((obj, ref))
+                    hits += _rows(conn, obj, "rowid = ?", [ref], "", 1)
+    except sqlite3.OperationalError:
+        # Databases ingested before the search index existed.
+        pass
+    return hits[:k]
+
+def format_row(obj, row):
+    return obj + " " + " ".join(f"{col}={value}" for col, value in row.items() if value not in (None, ""))
+
+def approx_tokens(text):
+    # About four characters per token for this kind of text.
+    return len(text) // 4 + 1
+
+def retrieval_context(conn, question, search_spec, k=TOP_K, budget=CONTEXT_TOKENS):
+    """Relevant elements as compact lines, stopping before the token budget is exceeded."""
+    lines, used = [], 0
+    for obj, row in retrieve(conn, question, search_spec, k):
+        line = format_row(obj, row)
+        cost = approx_tokens(line)
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
@@ -0,0 +1,292 @@
+import argparse
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future
+
+from case_sources import SimAutoSource
+from ingest import STAGE_METRIC, ingest_case
+from metrics import REGISTRY, inc, timed
+
+POOL_WORKERS = int(os.environ.get("SIMAUTO_WORKERS", 2))
+MAX_JOBS_PER_WORKER = int(os.environ.get("SIMAUTO_MAX_JOBS", 50))
+JOB_TIMEOUT = float(os.environ.get("SIMAUTO_JOB_TIMEOUT", 1800))
+HEALTH_INTERVAL = 1.0
+
+
+# ----------------------
+# Worker process
+# ----------------------
+def open_backend(backend):
+    if backend == "fake":
+        from fake_simauto import FakeSimAuto
+        return FakeSimAuto()
+    import pythoncom
+    from win32com.client import Dispatch
+    pythoncom.CoInitialize()
+    return Dispatch("pwrworld.SimulatorAuto")
+
+def session_healthy(pw):
+    try:
+        pw.CurrentDir
+        return True
+    except Exception:
+        return False
+
+def extract_and_store_case_data(pw, db_path, progress=None, base_path=None):
+    return ingest_case(SimAutoSource(pw), db_path, progress, base_path=base_path)
+
+def run_job(pw, pwb_path, db_path, progress=None, base_path=None):
+    print(f"Trying to open case: {pwb_path}")
+    with timed(STAGE_METRIC, stage="open_case", object="case"):
+        result = pw.OpenCase(pwb_path)
+    print("OpenCase result:", result)
+    error = result[0] if isinstance(result, (tuple, list)) else result
+    if error:
+        raise RuntimeError(f"OpenCase failed: {error}")
+    try:
+        return extract_and_store_case_data(pw, db_path, progress, base_path)
+    finally:
+        pw.CloseCase()
+
+def worker_main(worker_id, backend, tasks, results, max_jobs):
+    """Own one automation session and run extraction jobs until recycled."""
+    pw = open_backend(backend)
+    for _ in range(max_jobs):
+        if not session_healthy(pw):
+            print(f"Worker {worker_id}: SimAuto session unhealthy, exiting")
+            sys.exit(1)
+        job = tasks.get()
+        if job is None:
+            break
+        job_id, pwb_path, db_path, base_path = job
+        results.put(("started", worker_id, job_id, None))
+
+        def progress(obj, state, rows, job_id=job_id):
+            results.put(("progress", worker_id, job_id, (obj, state, rows)))
+
+        try:
+            result = run_job(pw, pwb_path, db_path, progress, base_path)
+        except Exception as e:
+            traceback.print_exc()
+            results.put(("metrics", worker_id, job_id, REGISTRY.drain()))
+            results.put(("error", worker_id, job_id, str(e)))
+        else:
+            # Stage timings go to the pool first, so they are in /metrics when the job finishes.
+            results.put(("metrics", worker_id, job_id, REGISTRY.drain()))
+            results.put(("done", worker_id, job_id, result))
+
+
+# ----------------------
+# Pool
+# ----------------------
+class SimAutoPool:
+    """Long-lived extraction workers, each holding one SimAuto session.
+
+    Workers are restarted after max_jobs_per_worker jobs, when they crash,
+    or when a job runs past job_timeout. Each worker has its own task queue
+    and is handed one job at a time, so the pool always knows which job a
+    worker holds: if a worker dies before starting its job, the job is
+    queued again; if it dies while running it, the job fails. submit() returns a Future that
+    resolves to the per-object ingest stats; on_progress, if given, is
+    called from the pool's monitor thread with ingest progress events.
+    base_path, if given, is the database of a previous version of the case
+    to load incrementally on top of (see ingest_case). Workers send their
+    stage timings back after each job and they are merged into this
+    process's metrics registry.
+    """
+
+    def __init__(self, backend="simauto", workers=POOL_WORKERS,
+                 max_jobs_per_worker=MAX_JOBS_PER_WORKER, job_timeout=JOB_TIMEOUT):
+        self.backend = backend
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.job_timeout = job_timeout
+        self._ctx = mp.get_context("spawn")
+        self._results = self._ctx.Queue()
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._callbacks = {}
+        self._workers = {}
+        self._queues = {}     # worker_id -> its task queue
+        self._handed = {}     # worker_id -> jobs handed to it so far
+        self._assigned = {}   # worker_id -> job tuple it holds, started or not
+        self._running = {}    # worker_id -> (job_id, start time) once started
+        self._pending = deque()
+        self._job_ids = itertools.count(1)
+        self._worker_ids = itertools.count(1)
+        self._closed = False
+        self.counters = {"submitted": 0, "done": 0, "failed": 0, "restarts": 0}
+        for _ in range(workers):
+            self._spawn()
+        self._monitor = threading.Thread(target=self._supervise, daemon=True)
+        self._monitor.start()
+
+    def _spawn(self):
+        worker_id = next(self._worker_ids)
+        tasks = self._ctx.Queue()
+        proc = self._ctx.Process(
+            target=worker_main,
+            args=(worker_id, self.backend, tasks, self._results, self.max_jobs_per_worker),
+            daemon=True,
+        )
+        proc.start()
+        with self._lock:
+            self._workers[worker_id] = proc
+            self._queues[worker_id] = tasks
+            self._handed[worker_id] = 0
+
+    def _dispatch(self):
+        # Caller holds self._lock. A worker that has been handed max_jobs_per_worker
+        # jobs is about to exit and gets nothing more.
+        for worker_id, tasks in self._queues.items():
+            if not self._pending:
+                return
+            if worker_id in self._assigned or self._handed[worker_id] >= self.max_jobs_per_worker:
+                continue
+            job = self._pending.popleft()
+            self._assigned[worker_id] = job
+            self._handed[worker_id] += 1
+            tasks.put(job)
+
+    def submit(self, pwb_path, db_path, on_progress=None, base_path=None):
+        future = Future()
+        job_id = next(self._job_ids)
+        with self._lock:
+            self._futures[job_id] = future
+            if on_progress:
+                self._callbacks[job_id] = on_progress
+            self.counters["submitted"] += 1
+            self._pending.append((job_id, pwb_path, db_path, base_path))
+            self._dispatch()
+        return future
+
+    def _finish(self, job_id, result=None, error=None):
+        with self._lock:
+            future = self._futures.pop(job_id, None)
+            self._callbacks.pop(job_id, None)
+            self.counters["failed" if error else "done"] += 1
+        inc("pw_ingest_jobs_total", result="failed" if error else "done")
+        if future is None:
+            return
+        if error:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(result)
+
+    def _handle(self, kind, worker_id, job_id, payload):
+        if kind == "started":
+            self._running[worker_id] = (job_id, time.monotonic())
+            return
+        if kind == "metrics":
+            REGISTRY.merge(payload)
+            return
+        if kind == "progress":
+            callback = self._callbacks.get(job_id)
+            if callback:
+                try:
+                    callback(*payload)
+                except Exception:
+                    traceback.print_exc()
+            return
+        self._running.pop(worker_id, None)
+        with self._lock:
+            self._assigned.pop(worker_id, None)
+            self._dispatch()
+        if kind == "done":
+            self._finish(job_id, result=payload)
+        else:
+            self._finish(job_id, error=payload)
+
+    def _drain(self, timeout=0):
+        try:
+            self._handle(*self._results.get(timeout=timeout))
+        except queue.Empty:
+            return
+        while True:
+            try:
+                self._handle(*self._results.get_nowait())
+            except queue.Empty:
+                return
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for worker_id, proc in list(self._workers.items()):
+            running = self._running.get(worker_id)
+            if running and now - running[1] > self.job_timeout:
+                print(f"Worker {worker_id}: job {running[0]} timed out, terminating")
+                proc.terminate()
+                proc.join()
+            if proc.is_alive():
+                continue
+            proc.join()
+            self._drain()
+            running = self._running.pop(worker_id, None)
+            with self._lock:
+                job = self._assigned.pop(worker_id, None)
+                del self._workers[worker_id], self._queues[worker_id], self._handed[worker_id]
+                if job is not None and running is None:
+                    # Never started: give it to another worker.
+                    self._pending.appendleft(job)
+            if running:
+                self._finish(running[0], error=f"extraction worker exited with code {proc.exitcode}")
+            if not self._closed:
+                self.counters["restarts"] += 1
+                self._spawn()
+            with self._lock:
+                self._dispatch()
+
+    def _supervise(self):
+        while not self._closed:
+            self._drain(timeout=HEALTH_INTERVAL)
+            self._check_workers()
+
+    def status(self):
+        with self._lock:
+            workers = list(self._workers.values())
+        return {
+            "backend": self.backend,
+            "workers": sum(1 for p in workers if p.is_alive()),
+            "busy": len(self._running),
+            "queued": len(self._pending),
+            "pending": len(self._futures),
+            **self.counters,
+        }
+
+    def close(self):
+        self._closed = True
+        self._monitor.join()
+        for tasks in self._queues.values():
+            tasks.put(None)
+        for proc in self._workers.values():
+            proc.join(timeout=10)
+            if proc.is_alive():
+                proc.terminate()
+
+
+# ----------------------
+# Load test
+# ----------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the extraction pool with the fake SimAuto backend.")
+    parser.add_argument("--workers", type=int, default=POOL_WORKERS)
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--max-jobs-per-worker", type=int, default=MAX_JOBS_PER_WORKER)
+    args = parser.parse_args()
+
+    pool = SimAutoPool(backend="fake", workers=args.workers, max_jobs_per_worker=args.max_jobs_per_worker)
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        futures = [pool.submit(f"case{i}.pwb", os.path.join(tmp, f"case{i}.db")) for i in range(args.jobs)]
+        for f in futures:
+            f.result()
+        elapsed = time.perf_counter() - start
+        pool.close()
+    print(f"\n {args.jobs} jobs on {args.workers} workers in {elapsed:.2f}s ({args.jobs / elapsed:.2f} jobs/s)")
+    print(f" Pool status: {pool.status()}")
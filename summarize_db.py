@@ -1,49 +1,69 @@
-import sqlite3
 import os
+import sqlite3
+import time
+
+from case_stats import load_stats, table_exists
+
+def case_description(db_path):
+    """(description, created) from the case's CaseInformation table, else from the case store index."""
+    conn = sqlite3.connect(db_path)
+    try:
+        if table_exists(conn, "CaseInformation"):
+            row = conn.execute('SELECT * FROM "CaseInformation" LIMIT 1').fetchone()
+            if row and len(row) >= 2:
+                return row[0], row[1]
+    finally:
+        conn.close()
+    index_path = os.path.join(os.path.dirname(db_path), "index.db")
+    if not os.path.exists(index_path):
+        return None
+    conn = sqlite3.connect(index_path)
+    try:
+        row = conn.execute("SELECT filename, created FROM cases WHERE case_id=?",
+                           (os.path.splitext(os.path.basename(db_path))[0],)).fetchone()
+    except sqlite3.Error:
+        row = None
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    return row[0], time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row[1]))
 
 def summarize_db(db_path):
     if not os.path.exists(db_path):
         return "[Missing database]", "[No summary generated.]"
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    stats = load_stats(db_path)
+    counts = stats.get("counts", {})
 
     raw_summary = []
     explanation = []
 
-    def safe_query(query):
-        try:
-            cursor.execute(query)
-            return cursor.fetchall()
-        except:
-            return []
-
     # --- Basic Table Summaries ---
-    tables = ["Bus", "Branch", "Generator", "Load", "CaseInformation"]
-    for table in tables:
-        rows = safe_query(f"SELECT COUNT(*) FROM '{table}'")
-        count = rows[0][0] if rows else 0
+    for table, count in counts.items():
         raw_summary.append(f"{table}: {count} rows")
 
     # --- Explanation ---
-    bus_count = safe_query("SELECT COUNT(*) FROM Bus")
-    load_count = safe_query("SELECT COUNT(*) FROM Load")
-    gen_count = safe_query("SELECT COUNT(*) FROM Generator")
-    branch_count = safe_query("SELECT COUNT(*) FROM Branch")
-
     explanation.append("This PowerWorld case includes:")
-    if bus_count: explanation.append(f"- {bus_count[0][0]} buses")
-    if gen_count: explanation.append(f"- {gen_count[0][0]} generators")
-    if load_count: explanation.append(f"- {load_count[0][0]} loads")
-    if branch_count: explanation.append(f"- {branch_count[0][0]} branches")
-
-    # --- Try to extract case name and date ---
-    case_info = safe_query("SELECT * FROM CaseInformation")
-    if case_info and len(case_info[0]) >= 2:
-        explanation.append(f"- Case description: {case_info[0][0]}")
-        explanation.append(f"- File created: {case_info[0][1]}")
-
-    conn.close()
+    for table, noun in [("Bus", "buses"), ("Gen", "generators"), ("Load", "loads"), ("Branch", "branches")]:
+        if table in counts:
+            explanation.append(f"- {counts[table]} {noun}")
+
+    gen = stats.get("gen")
+    if gen:
+        explanation.append(f"- {gen['total_mw']} MW of generation ({gen['online']} units in service, {gen['offline']} out of service)")
+    load = stats.get("load")
+    if load:
+        explanation.append(f"- {load['total_mw']} MW / {load['total_mvar']} Mvar of load")
+    kv_levels = stats.get("bus", {}).get("kv_levels")
+    if kv_levels:
+        explanation.append("- Voltage levels: " + ", ".join(f"{kv} kV ({n} buses)" for kv, n in kv_levels.items()))
+
+    # --- Case name and date ---
+    info = case_description(db_path)
+    if info:
+        explanation.append(f"- Case description: {info[0]}")
+        explanation.append(f"- File created: {info[1]}")
 
     return {
         "raw": "\n".join(raw_summary)
@@ -0,0 +1,147 @@
+import base64
+import json
+from collections import namedtuple
+
+from ingest import CASE_SCHEMA
+
+PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+RESERVED_ARGS = {"case_id", "after", "limit", "sort", "dir", "format"}
+
+PageQuery = namedtuple("PageQuery", ["sql", "params", "limit", "sort", "desc"])
+
+# ----------------------
+# Keyset pagination
+# ----------------------
+# Pages are ordered by (sort column, rowid) and the next page starts after
+# the last (value, rowid) pair sent, so each page is an index range scan no
+# matter how deep the user has scrolled.
+
+def case_tables(conn):
+    """Element tables (those in CASE_SCHEMA) present in this case, by name.
+
+    Statistics, search and topology tables live in the same database but are
+    internal; they are never viewed or exported.
+    """
+    existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    return sorted(t for t in CASE_SCHEMA if t in existing)
+
+def table_columns(conn, table):
+    """Column names of `table`, or None if it is not an element table in this case."""
+    if table not in CASE_SCHEMA:
+        return None
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    if row is None:
+        return None
+    return [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')]
+
+def encode_cursor(value, rowid):
+    return base64.urlsafe_b64encode(json.dumps([value, rowid]).encode()).decode()
+
+def decode_cursor(token):
+    try:
+        value, rowid = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return value, int(rowid)
+    except Exception:
+        raise ValueError("Invalid page cursor")
+
+def parse_filters(args, cols):
+    """Translate col=value (with * wildcards), col.min=x and col.max=x into SQL."""
+    where, params = [], []
+    for key, value in args.items():
+        if key in RESERVED_ARGS or value == "":
+            continue
+        name, op = key, "eq"
+        if key.endswith((".min", ".max")):
+            name, op = key[:-4], key[-3:]
+        if name not in cols:
+            raise ValueError(f"Unknown column: {name}")
+        col = f'"{name}"'
+        if op == "min":
+            where.append(f"{col} >= ?")
+        elif op == "max":
+            where.append(f"{col} <= ?")
+        elif "*" in value:
+            where.append(f"{col} LIKE ?")
+            value = value.replace("*", "%")
+        else:
+            where.append(f"{col} = ?")
+        params.append(value)
+    return where, params
+
+def keyset_condition(sort, desc, value, rowid):
+    if sort is None:
+        return ("rowid < ?" if desc else "rowid > ?"), [rowid]
+    col = f'"{sort}"'
+    # SQLite sorts NULLs first ascending and last descending.
+    if not desc:
+        if value is None:
+            return f"(({col} IS NULL AND rowid > ?) OR {col} IS NOT NULL)", [rowid]
+        return f"({col} > ? OR ({col} = ? AND rowid > ?))", [value, value, rowid]
+    if value is None:
+        return f"({col} IS NULL AND rowid < ?)", [rowid]
+    return f"({col} < ? OR ({col} = ? AND rowid < ?) OR {col} IS NULL)", [value, value, rowid]
+
+def page_query(table, cols, args):
+    try:
+        limit = min(max(int(args.get("limit", PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    sort = args.get("sort") or None
+    if sort is not None and sort not in cols:
+        raise ValueError(f"Unknown column: {sort}")
+    desc = args.get("dir") == "desc"
+    where, params = parse_filters(args, cols)
+    if args.get("after"):
+        value, rowid = decode_cursor(args["after"])
+        cond, cond_params = keyset_condition(sort, desc, value, rowid)
+        where.append(cond)
+        params += cond_params
+    direction = "DESC" if desc else "ASC"
+    order = f"rowid {direction}" if sort is None else f'"{sort}" {direction}, rowid {direction}'
+    col_list = ", ".join(f'"{c}"' for c in cols)
+    sql = f'SELECT rowid, {col_list} FROM "{table}"'
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    # One extra row tells us whether another page follows.
+    sql += f" ORDER BY {order} LIMIT ?"
+    return PageQuery(sql, params + [limit + 1], limit, sort, desc)
+
+def count_query(table, cols, args):
+    """COUNT(*) over the rows matching the same filters as page_query, ignoring the cursor."""
+    where, params = parse_filters(args, cols)
+    sql = f'SELECT COUNT(*) FROM "{table}"'
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql, params
+
+def iter_page(cursor, query, cols, chunk_size=200):
+    """Yield chunks of rows (without rowid) for one page.
+
+    Returns the cursor token for the next page (or None) as the generator's
+    return value, so callers can `yield from` it while streaming.
+    """
+    sort_idx = None if query.sort is None else cols.index(query.sort) + 1
+    sent = 0
+    last = None
+    cursor.execute(query.sql, query.params)
+    while sent < query.limit:
+        chunk = cursor.fetchmany(min(chunk_size, query.limit - sent))
+        if not chunk:
+            return None
+        sent += len(chunk)
+        last = chunk[-1]
+        yield [r[1:] for r in chunk]
+    if cursor.fetchone() is None:
+        return None
+    return encode_cursor(None if sort_idx is None else last[sort_idx], last[0])
+
+def fetch_page(cursor, query, cols):
+    """Collect one page as a list of rows; returns (rows, next_cursor)."""
+    rows = []
+    pages = iter_page(cursor, query, cols)
+    while True:
+        try:
+            rows.extend(next(pages))
+        except StopIteration as stop:
+            return rows, stop.value
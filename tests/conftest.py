@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Keep the default case store (created when app is imported) out of the checkout.
+os.environ.setdefault("CASE_STORE_DIR", os.path.join(tempfile.gettempdir(), "pw_test_cases"))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Flask test client whose case store and uploads live under tmp_path."""
+    monkeypatch.chdir(tmp_path)
+    import app
+    from case_store import CaseStore
+
+    monkeypatch.setattr(app, "store", CaseStore(root=str(tmp_path / "cases")))
+    monkeypatch.setitem(app.app.config, "UPLOAD_FOLDER", str(tmp_path))
+    return app.app.test_client()
+
+@pytest.fixture
+def case_id(client, tmp_path):
+    """A small synthetic case ingested straight into the test client's store."""
+    import app
+    from case_sources import AuxSource
+    from fake_simauto import synthetic_case, write_aux
+    from ingest import ingest_case
+
+    aux = tmp_path / "case.aux"
+    write_aux(synthetic_case(60), aux)
+    ingest_case(AuxSource(str(aux)), app.store.staging_path("testcase"))
+    app.store.add("testcase", "case.aux")
+    return "testcase"
@@ -0,0 +1,22 @@
+import json
+
+from aux_to_dataset import make_dataset
+from fake_simauto import synthetic_case, write_aux
+
+
+def test_make_dataset_leaves_no_database(tmp_path):
+    aux = tmp_path / "case.aux"
+    write_aux(synthetic_case(30), aux)
+    out = tmp_path / "dataset.jsonl"
+    make_dataset(str(aux), str(out))
+    with open(out, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert rows[0]["output"].startswith("This case contains 30 buses")
+    assert len(rows) == 11 and all(r["output"].endswith("kV.") for r in rows[1:])
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["case.aux", "dataset.jsonl"]
+
+def test_make_dataset_keeps_requested_database(tmp_path):
+    aux = tmp_path / "case.aux"
+    write_aux(synthetic_case(30), aux)
+    make_dataset(str(aux), str(tmp_path / "dataset.jsonl"), str(tmp_path / "kept.db"))
+    assert (tmp_path / "kept.db").exists()
@@ -0,0 +1,49 @@
+import json
+import os
+
+from clean_dataset import clean, dedup_tokens
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAIRS = [
+    ("Number of lines?", "There are 12 branches (lines) in this case."),
+    ("Number of lines please?", "There are 12 branches (lines) in this case."),
+    ("Count of generators please?", "There are 4 generators in this case."),
+    ("Count of generators?", "There are 4 generators in this case."),
+    ("What is the nominal voltage of bus 5 please?", "Bus 5 (SURF69) operates at 69.0 kV."),
+    ("What is the nominal voltage of bus 5?", "Bus 5 (SURF69) operates at 69.0 kV."),
+    ("Voltage rating of turtle69 please?", "Bus 7 (TURTLE69) operates at 69.0 kV."),
+    ("Voltage rating of TURTLE69?", "Bus 7 (TURTLE69) operates at 69.0 kV."),
+    # Different facts are never duplicates.
+    ("What is the nominal voltage of bus 6?", "Bus 6 (WAVE69) operates at 69.0 kV."),
+]
+
+
+def run_clean(tmp_path, rows):
+    src, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    with open(src, "w", encoding="utf-8") as f:
+        for instruction, output in rows:
+            f.write(json.dumps({"instruction": instruction, "input": "", "output": output}) + "\n")
+    clean([str(src)], str(out), processes=1, partitions=1)
+    with open(out, encoding="utf-8") as f:
+        return [json.loads(line)["instruction"] for line in f]
+
+def test_dedup_tokens_ignore_punctuation_and_politeness():
+    assert dedup_tokens("Number of lines, please?") == dedup_tokens("number of lines")
+
+def test_politeness_variants_collapse(tmp_path):
+    assert run_clean(tmp_path, PAIRS) == [
+        "Number of lines?",
+        "Count of generators please?",
+        "What is the nominal voltage of bus 5 please?",
+        "Voltage rating of turtle69 please?",
+        "What is the nominal voltage of bus 6?",
+    ]
+
+def test_repo_dataset_keeps_no_politeness_variants(tmp_path):
+    out = tmp_path / "out.jsonl"
+    clean([os.path.join(REPO, "dataset.jsonl")], str(out), processes=1)
+    with open(out, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    kept = {" ".join(dedup_tokens(f"{r['instruction']} {r['output']}")) for r in rows}
+    assert len(kept) == len(rows)
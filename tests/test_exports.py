@@ -0,0 +1,52 @@
+import io
+import sqlite3
+import zipfile
+
+import pytest
+
+from exports import EXPORT_FORMATS
+from ingest import CASE_SCHEMA
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def row_counts(client, case_id):
+    import app
+
+    conn = sqlite3.connect(app.store.db_path(case_id))
+    try:
+        names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        return {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in CASE_SCHEMA if t in names}
+    finally:
+        conn.close()
+
+def read_rows(fmt, data):
+    if fmt == "csv":
+        return data.decode("utf-8").count("\n") - 1
+    if fmt == "parquet":
+        return pq.read_table(io.BytesIO(data)).num_rows
+    return pa.ipc.open_stream(data).read_all().num_rows
+
+@pytest.mark.parametrize("fmt", list(EXPORT_FORMATS))
+def test_whole_case_export(client, case_id, fmt):
+    counts = row_counts(client, case_id)
+    response = client.get(f"/download?case_id={case_id}&format={fmt}")
+    assert response.status_code == 200
+    ext = EXPORT_FORMATS[fmt][0]
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as zf:
+        # Only element tables are exported, never the search, stats or topology tables.
+        assert sorted(zf.namelist()) == sorted(f"{t}.{ext}" for t in counts)
+        for table, n in counts.items():
+            assert read_rows(fmt, zf.read(f"{table}.{ext}")) == n, table
+
+@pytest.mark.parametrize("fmt", list(EXPORT_FORMATS))
+def test_table_export(client, case_id, fmt):
+    response = client.get(f"/download/Gen?case_id={case_id}&format={fmt}")
+    assert response.status_code == 200
+    assert read_rows(fmt, response.get_data()) == row_counts(client, case_id)["Gen"]
+
+@pytest.mark.parametrize("table", ["CaseStats", "ElementSearch", "Topology", "sqlite_master"])
+def test_internal_tables_are_not_served(client, case_id, table):
+    assert client.get(f"/download/{table}?case_id={case_id}").status_code == 404
+    assert client.get(f"/view/{table}?case_id={case_id}&format=json").status_code == 404
@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+from ingest import apply_changes, create_table, same_row, stored_rows, typed_rows
+
+NAN = float("nan")
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_table(conn, "Gen")
+    yield conn
+    conn.close()
+
+def load(conn, rows):
+    return apply_changes(conn, "Gen", list(typed_rows("Gen", rows)))
+
+def test_apply_changes_counts(conn):
+    load(conn, [["1", "1", "10", "1", "Closed"], ["2", "1", "20", "2", "Closed"], ["3", "1", "30", "3", "Open"]])
+    counts, (old_rowids, new_rowids) = load(conn, [
+        ["1", "1", "10", "1", "Closed"],     # unchanged
+        ["2", "1", "25", "2", "Closed"],     # changed
+        ["4", "1", "40", "4", "Closed"],     # added; bus 3 is removed
+    ])
+    assert counts == {"added": 1, "removed": 1, "changed": 1, "unchanged": 1, "fields": {"GenMW": 1}}
+    assert sorted(row for _, row in stored_rows(conn, "Gen")) == [
+        (1, "1", 10.0, 1.0, "Closed"), (2, "1", 25.0, 2.0, "Closed"), (4, "1", 40.0, 4.0, "Closed")]
+    assert len(old_rowids) == 2 and len(new_rowids) == 2
+
+def test_repeated_keys_pair_in_order(conn):
+    rows = [["1", "1", str(mw), "0", "Closed"] for mw in range(5)]
+    load(conn, rows)
+    counts, _ = load(conn, rows[:3] + [["1", "1", "99", "0", "Closed"]])
+    assert counts == {"added": 0, "removed": 1, "changed": 1, "unchanged": 3, "fields": {"GenMW": 1}}
+
+def test_nan_rows_are_unchanged(conn):
+    rows = [["1", "1", "nan", "", "Closed"], ["2", "1", "NaN", "5", "Closed"]]
+    load(conn, rows)
+    counts, _ = load(conn, rows)
+    assert counts == {"added": 0, "removed": 0, "changed": 0, "unchanged": 2, "fields": {}}
+
+def test_same_row():
+    assert same_row((1, NAN, None), (1, None, NAN))
+    assert same_row((1, NAN), (1, NAN))
+    assert not same_row((1, NAN), (1, 0.0))
+    assert not same_row((1, None), (1, ""))
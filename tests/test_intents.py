@@ -0,0 +1,131 @@
+import sqlite3
+
+import pytest
+
+from case_sources import AuxSource
+from case_stats import ONLINE_STATUS
+from fake_simauto import synthetic_case, write_aux
+from ingest import ingest_case
+from intents import INTENT_PATTERNS, CaseIndex, Route, answer_question, extract_entities, route_question
+
+INDEX = CaseIndex([(101, "BUS101_138"), (202, "North Tap")])
+
+ROUTES = [
+    ("what is the mw output of generator 1 at bus 5?", "gen_mw"),
+    ("how much does load 2 at bus 7 consume?", "load_mw"),
+    ("what is the nominal voltage of bus 42?", "bus_kv"),
+    ("summarize the case", "summary"),
+    ("how many buses are there?", "count_bus"),
+    ("how many generators are in the system?", "count_gen"),
+    ("number of loads?", "count_load"),
+    ("how many branches are there?", "count_branch"),
+    ("how many areas are in the case?", "count_area"),
+    ("number of zones?", "count_zone"),
+    ("how many transformers are online?", "count_transformer"),
+    ("count of shunts", "count_shunt"),
+    ("how many interfaces are defined?", "count_interface"),
+    ("total generation in area 1", "gen_total"),
+    ("total load in zone 12", "load_total"),
+    ("largest 5 generators", "largest_gens"),
+    ("top 10 loads", "top_elements"),
+    ("average generator output in area 1", "aggregate"),
+    ("histogram of bus voltages", "histogram"),
+    ("path from bus 1 to bus 900", "bus_path"),
+    ("which buses are connected to bus 42?", "bus_neighbors"),
+    ("how many islands are there?", "islands"),
+]
+
+
+@pytest.mark.parametrize("question,intent", ROUTES)
+def test_route_question(question, intent):
+    assert route_question(question, INDEX).intent == intent
+
+def test_every_intent_is_covered():
+    assert {intent for _, intent in ROUTES} == set(INTENT_PATTERNS)
+
+
+# ----------------------
+# Entities
+# ----------------------
+@pytest.mark.parametrize("question,expected", [
+    ("what is the nominal voltage of bus 42?", {"bus": 42}),
+    ("bus number 7 nominal kv?", {"bus": 7}),
+    ("voltage of bus #15", {"bus": 15}),
+    ("status and mw of generator 1a at bus 5?", {"gen_id": "1A", "bus": 5}),
+    ("output of gen '2'", {"gen_id": "2"}),
+    ("what is the mw of load 3 at bus 9?", {"load_id": "3", "bus": 9}),
+    ("total generation in area 4", {"area": "4"}),
+    ("top 10 loads", {"top": 10}),
+    ("path from bus 1 to bus 900", {"bus": 1, "bus2": 900}),
+    ("buses within 3 hops of bus 42", {"bus": 42, "hops": 3}),
+    ("total load in zone 12", {"zone": "12"}),
+    ("median branch flow", {"agg": "median", "measure": ("Branch", "MW")}),
+    ("average output of online generators", {"agg": "mean", "online": True, "measure": ("Gen", "GenMW")}),
+    ("how many generators are in service?", {"online": True}),
+])
+def test_extract_entities(question, expected):
+    entities = extract_entities(question)
+    assert {k: entities.get(k) for k in expected} == expected
+
+def test_bus_name_from_index():
+    assert route_question("at what kv does bus101_138 operate?", INDEX) == \
+        Route("bus_kv", {"bus": 101, "bus_name": "BUS101_138"})
+    # Multi-word names match on their tokens.
+    route = route_question("what buses are adjacent to north tap?", INDEX)
+    assert route.intent == "bus_neighbors"
+    assert route.entities["bus"] == 202 and route.entities["bus_name"] == "North Tap"
+
+def test_bus_number_wins_over_name():
+    entities = extract_entities("voltage of bus 7 near bus101_138", INDEX)
+    assert entities["bus"] == 7 and "bus_name" not in entities
+
+
+# ----------------------
+# Fallback
+# ----------------------
+def test_no_match():
+    assert route_question("tell me a joke", INDEX) == Route(None, {})
+
+def test_missing_required_entity():
+    # These phrases match an intent, but not the entity that intent needs.
+    for question in ["what is the nominal voltage?", "path from here to there", "how much power is produced by it?"]:
+        assert route_question(question).intent is None
+
+
+# ----------------------
+# Counts
+# ----------------------
+@pytest.fixture
+def case_conn(tmp_path):
+    aux = tmp_path / "case.aux"
+    write_aux(synthetic_case(60), aux)
+    ingest_case(AuxSource(str(aux)), str(tmp_path / "case.db"))
+    conn = sqlite3.connect(tmp_path / "case.db")
+    yield conn
+    conn.close()
+
+@pytest.mark.parametrize("question,table,noun", [
+    ("how many generators are online?", "Gen", "generators"),
+    ("how many loads are in service?", "Load", "loads"),
+    ("how many branches are online?", "Branch", "branches (lines)"),
+    ("how many transformers are in service?", "Transformer", "transformers"),
+])
+def test_online_counts(case_conn, question, table, noun):
+    rows = case_conn.execute(f'SELECT "Status" FROM "{table}"').fetchall()
+    online = sum(1 for (status,) in rows if status.strip().lower() in ONLINE_STATUS)
+    answer = answer_question(case_conn, route_question(question), question)
+    assert answer == f"{online} of the {len(rows)} {noun} in this case are in service."
+
+@pytest.mark.parametrize("question,table,noun", [
+    ("how many areas are there?", "Area", "areas"),
+    ("number of zones?", "Zone", "zones"),
+    ("how many shunts are online?", "Shunt", "shunts"),
+    ("how many interfaces are there?", "Interface", "interfaces"),
+])
+def test_object_counts(case_conn, question, table, noun):
+    n = case_conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+    answer = answer_question(case_conn, route_question(question), question)
+    if table == "Shunt":
+        assert answer.endswith(f"of the {n} {noun} in this case are in service.")
+    else:
+        assert answer == f"There are {n} {noun} in this case."
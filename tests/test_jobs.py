@@ -0,0 +1,29 @@
+import threading
+
+from jobs import JobRegistry
+
+
+def test_get_or_create_starts_one_job_per_case():
+    jobs = JobRegistry()
+    barrier = threading.Barrier(2)
+    results = []
+
+    def upload():
+        barrier.wait()
+        results.append(jobs.get_or_create("case1", "case.pwb"))
+
+    threads = [threading.Thread(target=upload) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    (a, a_created), (b, b_created) = results
+    assert a is b
+    assert sorted([a_created, b_created]) == [False, True]
+
+def test_get_or_create_after_finish_starts_a_new_job():
+    jobs = JobRegistry()
+    job, _ = jobs.get_or_create("case1", "case.pwb")
+    jobs.finish(job.job_id)
+    again, created = jobs.get_or_create("case1", "case.pwb")
+    assert created and again is not job
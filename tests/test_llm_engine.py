@@ -0,0 +1,105 @@
+import threading
+import time
+
+from llm_engine import InferenceEngine, PrefixCache, StubBackend, build_prefix
+
+CASE_A = "Bus: 10, Gen: 2\n" + "case data " * 50
+CASE_B = "Bus: 20, Gen: 4\n" + "case data " * 50
+
+
+class GatedBackend(StubBackend):
+    """Stub backend whose calls wait for the test to open the gate."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+        self.calls = []
+
+    def generate(self, prefix, requests, max_tokens):
+        assert self.gate.wait(5)
+        self.calls.append((prefix, [r.suffix for r in requests]))
+        return super().generate(prefix, requests, max_tokens)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+def test_requests_queued_together_share_a_batch_and_prefix():
+    backend = GatedBackend()
+    engine = InferenceEngine(backend, max_batch=8, batch_wait=0.05)
+    try:
+        first = engine.submit(CASE_A, "q0?")
+        wait_until(first.running)
+        # While the backend is busy, five more questions about two cases queue up.
+        futures = [engine.submit(CASE_A if i % 2 else CASE_B, f"q{i}?") for i in range(1, 6)]
+        backend.gate.set()
+        answers = [f.result(5) for f in [first] + futures]
+    finally:
+        engine.close()
+
+    for i, answer in enumerate(answers):
+        assert answer.endswith(f"q{i}?")
+    assert [len(suffixes) for _, suffixes in backend.calls] == [1, 3, 2]
+    assert [prefix for prefix, _ in backend.calls] == [build_prefix(CASE_A), build_prefix(CASE_A), build_prefix(CASE_B)]
+    status = engine.status()
+    assert status["batches"] == 2 and status["largest_batch"] == 5 and status["groups"] == 3
+    assert status["done"] == 6 and status["failed"] == 0
+    # Each case prefix is evaluated once; the batched group for case A reuses it.
+    assert status["prefix_misses"] == 2 and status["prefix_hits"] == 1
+    suffix_tokens = sum(len(s.split()) for _, suffixes in backend.calls for s in suffixes)
+    prefix_tokens = len(build_prefix(CASE_A).split()) + len(build_prefix(CASE_B).split())
+    assert status["prompt_tokens"] == prefix_tokens + suffix_tokens
+
+def test_tokens_stream_and_max_tokens_caps_the_answer():
+    engine = InferenceEngine(StubBackend(), batch_wait=0, max_tokens=6)
+    pieces = []
+    try:
+        answer = engine.generate(CASE_A, "how many buses?", timeout=5, max_tokens=100, on_token=pieces.append)
+    finally:
+        engine.close()
+    assert "".join(pieces) == answer
+    assert len(answer.split()) == 6
+
+def test_cancelled_request_is_dropped():
+    backend = GatedBackend()
+    engine = InferenceEngine(backend, batch_wait=0.05)
+    try:
+        first = engine.submit(CASE_A, "q0?")
+        wait_until(first.running)
+        dropped = engine.submit(CASE_A, "q1?")
+        assert dropped.cancel()
+        backend.gate.set()
+        first.result(5)
+    finally:
+        engine.close()
+    assert engine.status()["cancelled"] == 1
+    assert all("q1?" not in s for _, suffixes in backend.calls for s in suffixes)
+
+def test_ask_timeout_cancels_the_generation(client, case_id, monkeypatch):
+    import app
+    backend = GatedBackend()
+    engine = InferenceEngine(backend, batch_wait=0.05)
+    monkeypatch.setattr(app, "get_engine", lambda: engine)
+    monkeypatch.setattr(app, "LLM_TIMEOUT", 0.05)
+    try:
+        first = engine.submit(CASE_A, "q0?")
+        wait_until(first.running)
+        response = client.post("/ask", json={"question": "tell me a joke", "case_id": case_id})
+        assert response.status_code == 200
+        backend.gate.set()
+        first.result(5)
+    finally:
+        engine.close()
+    assert engine.status()["cancelled"] == 1
+    assert all("joke" not in s for _, suffixes in backend.calls for s in suffixes)
+
+def test_prefix_cache_evicts_least_recently_used():
+    cache = PrefixCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and len(cache) == 2
@@ -0,0 +1,35 @@
+import pytest
+
+from intents import CaseIndex, route_question
+from make_dataset import COUNT_QUESTIONS, ELEMENT_TEMPLATES, SUMMARY_QUESTIONS
+
+ROW = {"BusNum": 42, "BusName": "BUS42_138", "NomKV": 138.0, "GenID": "1A", "GenMW": 10.0,
+       "LoadID": "2", "LoadMW": 5.0, "Status": "Closed"}
+INDEX = CaseIndex([(42, "BUS42_138")])
+ELEMENT_INTENTS = {"Bus": "bus_kv", "Gen": "gen_mw", "Load": "load_mw"}
+
+
+ELEMENT_QUESTIONS = [pytest.param(table, template.format(**ROW), id=template)
+                     for table, spec in ELEMENT_TEMPLATES.items() for template in spec["questions"]]
+
+
+@pytest.mark.parametrize("table,question", ELEMENT_QUESTIONS)
+def test_element_templates_route_to_their_intent(table, question):
+    route = route_question(question.lower(), INDEX)
+    assert route.intent == ELEMENT_INTENTS[table]
+    assert route.entities["bus"] == 42
+    if table == "Gen":
+        assert route.entities["gen_id"] == "1A"
+    if table == "Load":
+        assert route.entities["load_id"] == "2"
+
+@pytest.mark.parametrize("question", SUMMARY_QUESTIONS)
+def test_summary_templates_route_to_summary(question):
+    assert route_question(question.lower()).intent == "summary"
+
+@pytest.mark.parametrize("table,question", [(t, q) for t, _, qs in COUNT_QUESTIONS for q in qs])
+def test_count_templates_route_to_their_count(table, question):
+    assert route_question(question.lower()).intent == f"count_{table.lower()}"
+
+def test_element_templates_cover_every_table():
+    assert set(ELEMENT_TEMPLATES) == set(ELEMENT_INTENTS)
@@ -0,0 +1,35 @@
+import sqlite3
+
+from case_store import CaseStore
+from ingest import create_table
+from summarize_db import summarize_db
+
+
+def make_case(path, info=None):
+    conn = sqlite3.connect(path)
+    create_table(conn, "Bus")
+    conn.executemany('INSERT INTO "Bus" VALUES (?, ?, ?, ?, ?)', [(1, "ONE", 138.0, 1, 1), (2, "TWO", 69.0, 1, 1)])
+    if info:
+        conn.execute('CREATE TABLE "CaseInformation" ("Description" TEXT, "Created" TEXT)')
+        conn.execute('INSERT INTO "CaseInformation" VALUES (?, ?)', info)
+    conn.commit()
+    conn.close()
+
+def test_header_from_case_information(tmp_path):
+    make_case(tmp_path / "case.db", ("Summer peak 2030", "2024-05-01"))
+    _, explanation = summarize_db(str(tmp_path / "case.db"))
+    assert "- 2 buses" in explanation
+    assert "- Case description: Summer peak 2030" in explanation
+    assert "- File created: 2024-05-01" in explanation
+
+def test_header_from_case_store(tmp_path):
+    store = CaseStore(root=str(tmp_path))
+    make_case(store.staging_path("abc"))
+    store.add("abc", "plan.pwb")
+    _, explanation = summarize_db(store.db_path("abc"))
+    assert "- Case description: plan.pwb" in explanation
+    assert "- File created: " in explanation
+
+def test_no_header_without_metadata(tmp_path):
+    make_case(tmp_path / "case.db")
+    assert "Case description" not in summarize_db(str(tmp_path / "case.db"))[1]
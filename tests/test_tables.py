@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+from tables import count_query, fetch_page, page_query, table_columns
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute('CREATE TABLE "Gen" ("BusNum" INTEGER, "GenID" TEXT, "GenMW" REAL)')
+    conn.executemany('INSERT INTO "Gen" VALUES (?, ?, ?)',
+                     [(b, str(g), None if b % 7 == 0 else float(b * g)) for b in range(1, 41) for g in (1, 2)])
+    yield conn
+    conn.close()
+
+def all_pages(conn, cols, args):
+    rows, after = [], None
+    while True:
+        page, after = fetch_page(conn.cursor(), page_query("Gen", cols, dict(args, after=after or "")), cols)
+        rows += page
+        if after is None:
+            return rows
+
+@pytest.mark.parametrize("args", [
+    {},
+    {"GenID": "2"},
+    {"GenMW.min": "20", "GenMW.max": "50"},
+    {"GenID": "1", "BusNum.max": "10", "sort": "GenMW", "dir": "desc"},
+])
+def test_total_counts_filtered_rows(conn, args):
+    cols = table_columns(conn, "Gen")
+    sql, params = count_query("Gen", cols, dict(args, limit="7"))
+    total = conn.execute(sql, params).fetchone()[0]
+    assert total == len(all_pages(conn, cols, dict(args, limit="7")))
+
+def test_total_ignores_page_cursor(conn):
+    cols = table_columns(conn, "Gen")
+    _, after = fetch_page(conn.cursor(), page_query("Gen", cols, {"GenID": "1", "limit": "5"}), cols)
+    sql, params = count_query("Gen", cols, {"GenID": "1", "after": after})
+    assert conn.execute(sql, params).fetchone()[0] == 40
+
+def test_unknown_filter_column(conn):
+    with pytest.raises(ValueError):
+        count_query("Gen", table_columns(conn, "Gen"), {"Nope": "1"})
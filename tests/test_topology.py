@@ -0,0 +1,85 @@
+import sqlite3
+
+import numpy as np
+import pytest
+
+from case_sources import AuxSource
+from fake_simauto import synthetic_case, write_aux
+from ingest import ingest_case
+from intents import islands_answer
+from topology import Topology, build_arrays, read_topology
+
+
+def ingest(tmp_path, case, name, base=None):
+    aux = tmp_path / f"{name}.aux"
+    write_aux(case, aux)
+    db = tmp_path / f"{name}.db"
+    ingest_case(AuxSource(str(aux)), str(db), base_path=base and str(base))
+    return db
+
+def same_islands(a, b):
+    """Two labellings describe the same islands (labels themselves may differ)."""
+    pairs = set(zip(a.tolist(), b.tolist()))
+    return len(pairs) == len(set(a.tolist())) == len(set(b.tolist()))
+
+def isolate(case, bus, status):
+    """Set the status of every branch and transformer at one bus."""
+    for obj in ("Branch", "Transformer"):
+        fields = case[obj]
+        for i, (f, t) in enumerate(zip(fields["BusNum"], fields["BusNum:1"])):
+            if bus in (f, t):
+                fields["Status"][i] = status
+    return case
+
+@pytest.fixture
+def topo(tmp_path):
+    db = ingest(tmp_path, synthetic_case(60), "base")
+    with sqlite3.connect(db) as conn:
+        return Topology(build_arrays(conn))
+
+
+def test_set_online_open_and_close(topo):
+    online = np.flatnonzero(topo.edge_online)
+    e = int(online[0])
+    u, v = int(topo.buses[topo.edge_from[e]]), int(topo.buses[topo.edge_to[e]])
+    assert e in topo.find_edges(u, v, "Branch") + topo.find_edges(u, v, "Transformer")
+    before = topo.labels().copy()
+
+    # Open every in-service edge at u so it becomes an island of its own.
+    at_u = [int(x) for x in online if topo.index_of(u) in (topo.edge_from[x], topo.edge_to[x])]
+    for x in at_u:
+        topo.set_online(x, False)
+    assert same_islands(topo.labels(), topo._compute_labels())
+    assert np.sum(topo.labels() == topo.island_of(u)) == 1
+    assert len(topo.islands()) == len(np.unique(before)) + 1
+    isolated = sum(1 for _, size in topo.islands() if size == 1)
+    assert islands_answer(topo, {}).endswith(
+        "1 bus is isolated." if isolated == 1 else f"{isolated} buses are isolated.")
+
+    for x in at_u:
+        topo.set_online(x, True)
+    assert same_islands(topo.labels(), topo._compute_labels())
+    assert same_islands(topo.labels(), before)
+
+def test_status_only_reingest_switches_stored_topology(tmp_path, capsys):
+    case = synthetic_case(60)
+    base = ingest(tmp_path, case, "base")
+    with sqlite3.connect(base) as conn:
+        islands = len(Topology(read_topology(conn)).islands())
+    bus = case["Bus"]["BusNum"][5]
+    opened = ingest(tmp_path, isolate(case, bus, "Open"), "opened", base)
+    assert "Switched" in capsys.readouterr().out
+    with sqlite3.connect(opened) as conn:
+        stored = Topology(read_topology(conn))
+        fresh = Topology(build_arrays(conn))
+    assert same_islands(stored.labels(), fresh._compute_labels())
+    assert np.sum(stored.labels() == stored.island_of(int(bus))) == 1
+    assert len(stored.islands()) == islands + 1
+
+    closed = ingest(tmp_path, synthetic_case(60), "closed", opened)
+    assert "Switched" in capsys.readouterr().out
+    with sqlite3.connect(closed) as conn:
+        stored = Topology(read_topology(conn))
+        fresh = Topology(build_arrays(conn))
+    assert same_islands(stored.labels(), fresh._compute_labels())
+    assert len(stored.islands()) == islands
@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+import pytest
+
+from token_cache import IGNORE_INDEX, build_tokenized
+from train_lora import Collator, pack_examples
+
+MAX_LENGTH = 48
+EXAMPLES = [
+    ("How many buses are there?", "There are 10 buses in this case."),
+    ("Number of lines?", "There are 12 branches (lines) in this case."),
+    ("What is the nominal voltage of bus 5?", "Bus 5 (SURF69) operates at 69.0 kV."),
+    ("Summarize the case.", "This case contains 10 buses, 4 generators, 6 loads, and 12 branches."),
+    ("Status and MW of generator 1 at bus 2?", "Generator 1 at bus 2 produces 50.0 MW. Status: Closed."),
+    ("Count of loads?", "There are 6 loads in this case."),
+]
+
+
+class WordTokenizer:
+    """Whitespace tokenizer with the parts of the transformers interface token_cache uses."""
+
+    name_or_path = "words"
+    pad_token_id, bos_token_id, eos_token_id = 0, 1, 2
+
+    def __init__(self):
+        self.vocab = {}
+
+    def __call__(self, texts, add_special_tokens=False):
+        return {"input_ids": [[self.vocab.setdefault(w, len(self.vocab) + 3) for w in t.split()] for t in texts]}
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "data.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for instruction, output in EXAMPLES:
+            f.write(json.dumps({"instruction": instruction, "input": "", "output": output}) + "\n")
+    return build_tokenized([str(path)], WordTokenizer(), max_length=MAX_LENGTH, cache_root=str(tmp_path / "cache"))
+
+def test_labels_mask_prompt_tokens(dataset):
+    for i, (_, output) in enumerate(EXAMPLES):
+        item = dataset[i]
+        trained = item["labels"] != IGNORE_INDEX
+        # Only the response words and EOS are trained on, at the end of the example.
+        assert trained.sum() == len(output.split()) + 1
+        assert trained[-trained.sum():].all()
+        assert (item["labels"][trained] == item["input_ids"][trained]).all()
+        assert item["input_ids"][-1] == WordTokenizer.eos_token_id
+
+def test_packing_uses_every_example_once(dataset):
+    packed = pack_examples(dataset, max_length=MAX_LENGTH)
+    assert sorted(i for row in packed.bins for i in row) == list(range(len(dataset)))
+    assert len(packed) < len(dataset)
+    for i in range(len(packed)):
+        row = packed[i]
+        assert sum(row["lengths"]) == len(row["input_ids"]) == packed.lengths[i] <= MAX_LENGTH
+
+def test_packed_batch_is_block_diagonal(dataset):
+    torch = pytest.importorskip("torch")
+    packed = pack_examples(dataset, max_length=MAX_LENGTH)
+    features = [packed[i] for i in range(len(packed))]
+    batch = Collator(pad_id=WordTokenizer.pad_token_id)(features)
+    rows, width = batch["input_ids"].shape
+    assert batch["attention_mask"].shape == (rows, 1, width, width)
+    allowed = batch["attention_mask"][:, 0] == 0
+
+    for r, f in enumerate(features):
+        segment = np.full(width, -1)
+        start = 0
+        for s, n in enumerate(f["lengths"]):
+            segment[start:start + n] = s
+            assert batch["position_ids"][r, start:start + n].tolist() == list(range(n))
+            start += n
+        for i in range(width):
+            for j in range(width):
+                if segment[i] < 0:
+                    expected = i == j
+                else:
+                    expected = segment[i] == segment[j] and j <= i
+                assert bool(allowed[r, i, j]) == expected, (r, i, j)
+        # Prompt tokens and padding are never trained on.
+        labels = batch["labels"][r]
+        assert labels[:start].tolist() == f["labels"].tolist()
+        assert (labels[start:] == IGNORE_INDEX).all()
+        assert (batch["input_ids"][r, start:] == WordTokenizer.pad_token_id).all()
+    assert batch["labels"].dtype == torch.long
+
+def test_unpacked_batch_gets_padding_mask(dataset):
+    pytest.importorskip("torch")
+    features = [dataset[i] for i in range(3)]
+    batch = Collator(pad_id=WordTokenizer.pad_token_id)(features)
+    width = batch["input_ids"].shape[1]
+    assert width % 8 == 0 and width >= max(len(f["input_ids"]) for f in features)
+    for r, f in enumerate(features):
+        n = len(f["input_ids"])
+        assert batch["attention_mask"][r].tolist() == [1] * n + [0] * (width - n)
+        assert (batch["labels"][r, n:] == IGNORE_INDEX).all()
+    assert "position_ids" not in batch
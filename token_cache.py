@@ -0,0 +1,200 @@
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from clean_dataset import input_files
+from make_dataset import open_shard
+
+# ----------------------
+# Config
+# ----------------------
+CACHE_DIR = os.environ.get("TOKEN_CACHE_DIR", ".token_cache")
+MAX_LENGTH = 1024
+IGNORE_INDEX = -100
+TOKENIZE_BATCH = 1000
+
+PROMPT_TEMPLATE = "[INST] <<SYS>>\nUse this power system info.\n<</SYS>>\n{instruction}\n{input} [/INST]"
+
+# ----------------------
+# Layout
+# ----------------------
+# CACHE_DIR/<hash of tokenizer id, template, max length>/
+#     <shard content hash>.ids.npy     int32 token ids of every example, back to back
+#     <shard content hash>.off.npy     int64 offsets, one per example plus the end
+#     <shard content hash>.prompt.npy  int32 prompt length per example (not trained on)
+#     dataset-<hash of shard hashes>.json
+# Shards are keyed by content, so adding a shard to a dataset only tokenizes
+# that shard. Arrays are opened with mmap, so loading costs a few page
+# faults no matter how large the corpus is.
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+def shard_hashes(files, cache_root=CACHE_DIR):
+    """Content hash per file, remembered by (path, size, mtime) so unchanged files are not re-read."""
+    index_path = os.path.join(cache_root, "files.json")
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    hashes = []
+    for path in files:
+        st = os.stat(path)
+        stamp = f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+        if stamp not in index:
+            index[stamp] = sha256_file(path)
+        hashes.append(index[stamp])
+    os.makedirs(cache_root, exist_ok=True)
+    _write_json(index_path, index)
+    return hashes
+
+def cache_key(tokenizer_id, template=PROMPT_TEMPLATE, max_length=MAX_LENGTH):
+    return hashlib.sha256(f"{tokenizer_id}\x1f{template}\x1f{max_length}".encode("utf-8")).hexdigest()[:16]
+
+def _write_json(path, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+def _save(path, array):
+    # np.save appends .npy to names without it, so keep it on the temp name too.
+    tmp = path[:-4] + ".tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+# ----------------------
+# Tokenization
+# ----------------------
+# Each example becomes BOS + prompt + response + EOS. Only the response and
+# EOS are trained on; the prompt positions get IGNORE_INDEX labels.
+
+def tokenize_batch(tokenizer, examples, template=PROMPT_TEMPLATE, max_length=MAX_LENGTH):
+    """(input_ids, prompt length) per example, using the tokenizer's batch call."""
+    prompts = tokenizer([template.format(instruction=ex["instruction"], input=ex.get("input", ""))
+                         for ex in examples], add_special_tokens=False)["input_ids"]
+    responses = tokenizer([" " + ex["output"] for ex in examples], add_special_tokens=False)["input_ids"]
+    out = []
+    for prompt, response in zip(prompts, responses):
+        ids = [tokenizer.bos_token_id] + prompt + response + [tokenizer.eos_token_id]
+        out.append((ids[:max_length], 1 + len(prompt)))
+    return out
+
+def read_batches(path, size=TOKENIZE_BATCH):
+    batch = []
+    with open_shard(path, "r") as f:
+        for line in f:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) >= size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+def tokenize_shard(path, out_prefix, tokenizer, template=PROMPT_TEMPLATE, max_length=MAX_LENGTH):
+    ids, offsets, prompt_lens = [], [0], []
+    for batch in read_batches(path):
+        for example_ids, prompt_len in tokenize_batch(tokenizer, batch, template, max_length):
+            ids.append(np.asarray(example_ids, dtype=np.int32))
+            offsets.append(offsets[-1] + len(example_ids))
+            prompt_lens.append(prompt_len)
+    # The offsets file is written last and marks the shard as complete.
+    _save(out_prefix + ".ids.npy", np.concatenate(ids) if ids else np.zeros(0, dtype=np.int32))
+    _save(out_prefix + ".prompt.npy", np.asarray(prompt_lens, dtype=np.int32))
+    _save(out_prefix + ".off.npy", np.asarray(offsets, dtype=np.int64))
+    return len(prompt_lens)
+
+
+class TokenizedDataset:
+    """Examples of cached shards, sliced straight out of the memory-mapped arrays."""
+
+    def __init__(self, shards):
+        self.shards = shards
+        self.starts = np.cumsum([0] + [len(off) - 1 for _, off, _ in shards])
+        self.lengths = np.concatenate([np.diff(off) for _, off, _ in shards]) if shards else np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        s = bisect.bisect_right(self.starts, i) - 1
+        ids, off, prompt_lens = self.shards[s]
+        j = i - self.starts[s]
+        input_ids = ids[off[j]:off[j + 1]]
+        labels = input_ids.astype(np.int64)
+        labels[:prompt_lens[j]] = IGNORE_INDEX
+        return {"input_ids": input_ids, "labels": labels}
+
+
+def open_shard_arrays(prefix):
+    return tuple(np.load(prefix + suffix, mmap_mode="r") for suffix in (".ids.npy", ".off.npy", ".prompt.npy"))
+
+def load_tokenized(paths, tokenizer_id, template=PROMPT_TEMPLATE, max_length=MAX_LENGTH, cache_root=CACHE_DIR):
+    """Open an already built cache without a tokenizer; None if any shard is missing."""
+    files = input_files(paths)
+    cache_dir = os.path.join(cache_root, cache_key(tokenizer_id, template, max_length))
+    prefixes = [os.path.join(cache_dir, h) for h in shard_hashes(files, cache_root)]
+    if not all(os.path.exists(p + ".off.npy") for p in prefixes):
+        return None
+    return TokenizedDataset([open_shard_arrays(p) for p in prefixes])
+
+def build_tokenized(paths, tokenizer, template=PROMPT_TEMPLATE, max_length=MAX_LENGTH, cache_root=CACHE_DIR):
+    """Tokenize the shards not cached yet for this tokenizer/template, then open the whole dataset."""
+    start = time.perf_counter()
+    files = input_files(paths)
+    key = cache_key(tokenizer.name_or_path, template, max_length)
+    cache_dir = os.path.join(cache_root, key)
+    os.makedirs(cache_dir, exist_ok=True)
+    hashes = shard_hashes(files, cache_root)
+
+    built = examples = 0
+    for path, shard in zip(files, hashes):
+        prefix = os.path.join(cache_dir, shard)
+        if not os.path.exists(prefix + ".off.npy"):
+            examples += tokenize_shard(path, prefix, tokenizer, template, max_length)
+            built += 1
+    tokenize_seconds = time.perf_counter() - start
+
+    dataset = TokenizedDataset([open_shard_arrays(os.path.join(cache_dir, h)) for h in hashes])
+    dataset_hash = hashlib.sha256(" ".join(hashes).encode("utf-8")).hexdigest()[:16]
+    _write_json(os.path.join(cache_dir, f"dataset-{dataset_hash}.json"), {
+        "tokenizer": tokenizer.name_or_path, "max_length": max_length, "template": template,
+        "shards": [{"file": p, "hash": h} for p, h in zip(files, hashes)],
+        "examples": len(dataset), "tokens": int(dataset.lengths.sum()),
+    })
+    print(f" Token cache {key}: {len(files) - built} shards reused, {built} tokenized "
+          f"({examples:,} examples in {tokenize_seconds:.2f}s); {len(dataset):,} examples, "
+          f"{int(dataset.lengths.sum()):,} tokens ready in {time.perf_counter() - start:.2f}s")
+    return dataset
+
+
+# ----------------------
+# Main
+# ----------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-tokenize instruction JSONL into the memory-mapped token cache.")
+    parser.add_argument("--data", nargs="+", required=True, help="JSONL files or make_dataset.py shard dirs")
+    parser.add_argument("--tokenizer", required=True)
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    build_tokenized(args.data, AutoTokenizer.from_pretrained(args.tokenizer), PROMPT_TEMPLATE,
+                    args.max_length, args.cache_dir)
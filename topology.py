@@ -0,0 +1,380 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from case_stats import ONLINE_STATUS, table_exists
+from metrics import inc
+
+TOPOLOGY_TABLE = "Topology"
+EDGE_TABLES = ("Branch", "Transformer")
+END_FIELDS = {"BusNum", "BusNum:1"}   # edge columns whose change moves an edge
+CACHE_SIZE = 8
+
+# ----------------------
+# Adjacency index
+# ----------------------
+# Buses are remapped to dense indices 0..n-1 (bus numbers sorted, looked up
+# with searchsorted). Branches and transformers are edges; the adjacency is
+# kept in CSR form: the neighbours of bus index i are
+# indices[indptr[i]:indptr[i+1]], and edges[...] holds the edge each
+# neighbour entry came from, so edge status can mask any query. The arrays
+# are built once at ingest and stored as BLOBs in the Topology table, the
+# same way case statistics are stored in CaseStats, along with the island
+# label of every bus. A re-ingest that only switches branches in or out of
+# service patches the stored arrays instead (see update_edge_status).
+
+ARRAYS = {
+    "buses": np.int64,        # bus number per index, sorted
+    "edge_from": np.int32,    # bus index of each edge end
+    "edge_to": np.int32,
+    "edge_table": np.int8,    # position in EDGE_TABLES
+    "edge_rowid": np.int64,   # rowid in that table
+    "edge_online": np.bool_,
+    "indptr": np.int64,
+    "indices": np.int32,
+    "edges": np.int32,
+    "labels": np.int64,       # island label per bus index: the smallest index in its island
+}
+STATUS_CHUNK = 500
+
+
+def _online_flags(statuses):
+    values, inverse = np.unique(np.array([str(s) for s in statuses], dtype=object), return_inverse=True)
+    return np.array([v.strip().lower() in ONLINE_STATUS for v in values], dtype=bool)[inverse.ravel()]
+
+def build_arrays(conn):
+    """CSR arrays for the buses and in-/out-of-service edges in conn."""
+    buses = np.array(sorted({r[0] for r in conn.execute('SELECT "BusNum" FROM "Bus" WHERE "BusNum" IS NOT NULL')}),
+                     dtype=np.int64) if table_exists(conn, "Bus") else np.zeros(0, dtype=np.int64)
+    ends, tables, rowids, statuses = [], [], [], []
+    for t, table in enumerate(EDGE_TABLES):
+        if not table_exists(conn, table):
+            continue
+        rows = conn.execute(f'SELECT rowid, "BusNum", "BusNum:1", "Status" FROM "{table}" '
+                            f'WHERE "BusNum" IS NOT NULL AND "BusNum:1" IS NOT NULL').fetchall()
+        if not rows:
+            continue
+        rowid, a, b, status = zip(*rows)
+        ends.append(np.array([a, b], dtype=np.int64))
+        tables.append(np.full(len(rows), t, dtype=np.int8))
+        rowids.append(np.array(rowid, dtype=np.int64))
+        statuses += status
+
+    if ends:
+        ends = np.concatenate(ends, axis=1)
+        # Edges to buses missing from the Bus table are dropped.
+        if len(buses):
+            pos = np.searchsorted(buses, ends).clip(max=len(buses) - 1)
+            known = (buses[pos] == ends).all(axis=0)
+        else:
+            pos, known = ends, np.zeros(ends.shape[1], dtype=bool)
+        edge_from, edge_to = pos[0][known].astype(np.int32), pos[1][known].astype(np.int32)
+        edge_table = np.concatenate(tables)[known]
+        edge_rowid = np.concatenate(rowids)[known]
+        edge_online = _online_flags(statuses)[known]
+    else:
+        edge_from = edge_to = np.zeros(0, dtype=np.int32)
+        edge_table, edge_rowid, edge_online = np.zeros(0, np.int8), np.zeros(0, np.int64), np.zeros(0, bool)
+
+    # Each edge appears in the adjacency of both of its ends.
+    src = np.concatenate([edge_from, edge_to])
+    dst = np.concatenate([edge_to, edge_from])
+    eid = np.concatenate([np.arange(len(edge_from), dtype=np.int32)] * 2)
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(len(buses) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(buses)), out=indptr[1:])
+    return {
+        "buses": buses, "edge_from": edge_from, "edge_to": edge_to, "edge_table": edge_table,
+        "edge_rowid": edge_rowid, "edge_online": edge_online,
+        "indptr": indptr, "indices": dst[order].astype(np.int32), "edges": eid[order],
+    }
+
+def write_topology(conn, arrays):
+    conn.execute(f'DROP TABLE IF EXISTS "{TOPOLOGY_TABLE}"')
+    conn.execute(f'CREATE TABLE "{TOPOLOGY_TABLE}" ("key" TEXT PRIMARY KEY, "value" BLOB)')
+    conn.executemany(
+        f'INSERT INTO "{TOPOLOGY_TABLE}" VALUES (?, ?)',
+        [(key, np.ascontiguousarray(arrays[key], dtype=dtype).tobytes())
+         for key, dtype in ARRAYS.items() if key in arrays],
+    )
+
+def update_edge_status(conn, topo, rowids):
+    """Re-read Status for the given rows ({edge table: rowids}) and switch their edges.
+
+    Returns the number of edges switched in or out of service.
+    """
+    switched = 0
+    for table, ids in rowids.items():
+        ids = list(ids)
+        for start in range(0, len(ids), STATUS_CHUNK):
+            chunk = ids[start:start + STATUS_CHUNK]
+            rows = conn.execute(f'SELECT rowid, "Status" FROM "{table}" WHERE rowid IN '
+                                f'({", ".join(["?"] * len(chunk))})', chunk).fetchall()
+            if not rows:
+                continue
+            rowid, status = zip(*rows)
+            online = dict(zip(rowid, _online_flags(status).tolist()))
+            for e in topo.edges_for_rows(table, rowid):
+                if bool(topo.edge_online[e]) != online[int(topo.edge_rowid[e])]:
+                    topo.set_online(e, online[int(topo.edge_rowid[e])])
+                    switched += 1
+    return switched
+
+def read_topology(conn):
+    """Stored arrays for the case in conn, or None if it has none."""
+    try:
+        rows = conn.execute(f'SELECT "key", "value" FROM "{TOPOLOGY_TABLE}"').fetchall()
+    except sqlite3.Error:
+        return None
+    return {key: np.frombuffer(value, dtype=ARRAYS[key]) for key, value in rows if key in ARRAYS}
+
+
+# ----------------------
+# Queries
+# ----------------------
+class Topology:
+    """Neighbour, island, k-hop and path queries over one case's network.
+
+    Queries only follow in-service edges unless asked otherwise. Island
+    labels are loaded with the arrays (or computed on first use) and kept
+    up to date by set_online.
+    """
+
+    def __init__(self, arrays):
+        self.buses = arrays["buses"]
+        self.edge_from = arrays["edge_from"]
+        self.edge_to = arrays["edge_to"]
+        self.edge_table = arrays["edge_table"]
+        self.edge_rowid = arrays["edge_rowid"]
+        self.edge_online = np.array(arrays["edge_online"], dtype=bool)   # writable copy
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.edges = arrays["edges"]
+        # Databases written before labels were stored compute them on first use.
+        self._labels = np.array(arrays["labels"], dtype=np.int64) if "labels" in arrays else None
+        self._lock = threading.Lock()
+
+    @property
+    def n_buses(self):
+        return len(self.buses)
+
+    def index_of(self, bus):
+        """Dense index of a bus number, or None."""
+        i = int(np.searchsorted(self.buses, bus))
+        return i if i < len(self.buses) and self.buses[i] == bus else None
+
+    def _expand(self, frontier, online_only):
+        """(neighbour, edge) pairs of every bus in frontier, vectorized over the CSR rows."""
+        starts, ends = self.indptr[frontier], self.indptr[frontier + 1]
+        lens = ends - starts
+        if lens.sum() == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        pos = np.arange(lens.sum()) - np.repeat(np.cumsum(lens) - lens, lens) + np.repeat(starts, lens)
+        nbrs, edges = self.indices[pos], self.edges[pos]
+        if online_only:
+            keep = self.edge_online[edges]
+            nbrs, edges = nbrs[keep], edges[keep]
+        return nbrs, edges
+
+    def neighbors(self, bus, online_only=True):
+        """[(neighbour bus, edge)] of a bus number, or None if the bus is unknown."""
+        i = self.index_of(bus)
+        if i is None:
+            return None
+        nbrs, edges = self._expand(np.array([i]), online_only)
+        return [(int(self.buses[n]), int(e)) for n, e in zip(nbrs, edges)]
+
+    def within_hops(self, bus, hops, online_only=True):
+        """{bus number: hop distance} for buses reachable within `hops` edges (the bus itself excluded)."""
+        i = self.index_of(bus)
+        if i is None:
+            return None
+        dist = np.full(self.n_buses, -1, dtype=np.int32)
+        dist[i] = 0
+        frontier = np.array([i])
+        for h in range(1, hops + 1):
+            nbrs, _ = self._expand(frontier, online_only)
+            nbrs = np.unique(nbrs[dist[nbrs] < 0])
+            if len(nbrs) == 0:
+                break
+            dist[nbrs] = h
+            frontier = nbrs
+        reached = np.flatnonzero(dist > 0)
+        return dict(zip(self.buses[reached].tolist(), dist[reached].tolist()))
+
+    def path(self, source, target, online_only=True):
+        """Fewest-edge path between two bus numbers as [(bus, edge into it)], [] if none, None if unknown."""
+        s, t = self.index_of(source), self.index_of(target)
+        if s is None or t is None:
+            return None
+        if s == t:
+            return [(int(source), None)]
+        parent = np.full(self.n_buses, -1, dtype=np.int64)
+        via = np.full(self.n_buses, -1, dtype=np.int64)
+        parent[s] = s
+        frontier = np.array([s])
+        while len(frontier) and parent[t] < 0:
+            starts, ends = self.indptr[frontier], self.indptr[frontier + 1]
+            owners = np.repeat(frontier, ends - starts)
+            nbrs, edges = self._expand(frontier, False)
+            keep = parent[nbrs] < 0
+            if online_only:
+                keep &= self.edge_online[edges]
+            nbrs, edges, owners = nbrs[keep], edges[keep], owners[keep]
+            nbrs, first = np.unique(nbrs, return_index=True)
+            parent[nbrs], via[nbrs] = owners[first], edges[first]
+            frontier = nbrs
+        if parent[t] < 0:
+            return []
+        steps, node = [], t
+        while node != s:
+            steps.append((int(self.buses[node]), int(via[node])))
+            node = parent[node]
+        steps.append((int(source), None))
+        return steps[::-1]
+
+    # Islands -------------------------------------------------------------
+
+    def _compute_labels(self):
+        """Connected components over in-service edges by min-label hooking and pointer jumping."""
+        parent = np.arange(self.n_buses, dtype=np.int64)
+        u, v = self.edge_from[self.edge_online], self.edge_to[self.edge_online]
+        while True:
+            pu, pv = parent[u], parent[v]
+            moving = pu != pv
+            if not moving.any():
+                return parent
+            lo, hi = np.minimum(pu, pv)[moving], np.maximum(pu, pv)[moving]
+            np.minimum.at(parent, hi, lo)
+            while True:
+                grand = parent[parent]
+                if np.array_equal(grand, parent):
+                    break
+                parent = grand
+
+    def labels(self):
+        with self._lock:
+            if self._labels is None:
+                self._labels = self._compute_labels()
+            return self._labels
+
+    def islands(self):
+        """Island sizes, largest first, as a list of (label, bus count)."""
+        labels, counts = np.unique(self.labels(), return_counts=True)
+        order = np.argsort(-counts, kind="stable")
+        return list(zip(labels[order].tolist(), counts[order].tolist()))
+
+    def island_of(self, bus):
+        i = self.index_of(bus)
+        return None if i is None else int(self.labels()[i])
+
+    def edges_for_rows(self, table, rowids):
+        """Edge numbers of the given rows of an edge table (rows not in the index are skipped)."""
+        mask = (self.edge_table == EDGE_TABLES.index(table)) & np.isin(self.edge_rowid, np.asarray(rowids, np.int64))
+        return np.flatnonzero(mask)
+
+    def find_edges(self, from_bus, to_bus, table="Branch"):
+        """Edge numbers of the given table between two bus numbers (either direction)."""
+        a, b = self.index_of(from_bus), self.index_of(to_bus)
+        if a is None or b is None:
+            return []
+        nbrs, edges = self._expand(np.array([a]), False)
+        t = EDGE_TABLES.index(table)
+        return [int(e) for n, e in zip(nbrs, edges) if n == b and self.edge_table[e] == t]
+
+    def set_online(self, edge, online):
+        """Switch one edge in or out of service, updating island labels incrementally.
+
+        Closing an edge between two islands relabels the smaller one; opening
+        an edge searches from one end and splits off what it can no longer
+        reach. Labels are the smallest bus index in each island.
+        """
+        with self._lock:
+            if bool(self.edge_online[edge]) == bool(online):
+                return
+            self.edge_online[edge] = online
+            labels = self._labels
+            if labels is None:
+                return
+            u, v = int(self.edge_from[edge]), int(self.edge_to[edge])
+            if online:
+                a, b = labels[u], labels[v]
+                if a != b:
+                    labels[labels == max(a, b)] = min(a, b)
+                return
+            seen = np.zeros(self.n_buses, dtype=bool)
+            seen[u] = True
+            frontier = np.array([u])
+            while len(frontier) and not seen[v]:
+                nbrs, _ = self._expand(frontier, True)
+                nbrs = np.unique(nbrs[~seen[nbrs]])
+                seen[nbrs] = True
+                frontier = nbrs
+            if not seen[v]:
+                # Finish the search so the whole of u's side is known.
+                while len(frontier):
+                    nbrs, _ = self._expand(frontier, True)
+                    nbrs = np.unique(nbrs[~seen[nbrs]])
+                    seen[nbrs] = True
+                    frontier = nbrs
+                old = labels[u]
+                side = seen & (labels == old)
+                rest = (labels == old) & ~side
+                labels[side] = np.flatnonzero(side)[0]
+                labels[rest] = np.flatnonzero(rest)[0]
+
+    def arrays(self):
+        """The arrays to store for this topology, island labels included."""
+        return {
+            "buses": self.buses, "edge_from": self.edge_from, "edge_to": self.edge_to,
+            "edge_table": self.edge_table, "edge_rowid": self.edge_rowid, "edge_online": self.edge_online,
+            "indptr": self.indptr, "indices": self.indices, "edges": self.edges, "labels": self.labels(),
+        }
+
+    def edge_rows(self, conn, edges):
+        """{edge: (table, LineCircuit, Status)} for a few edges, read from the element tables."""
+        out = {}
+        for e in edges:
+            table = EDGE_TABLES[self.edge_table[e]]
+            row = conn.execute(f'SELECT "LineCircuit", "Status" FROM "{table}" WHERE rowid=?',
+                               (int(self.edge_rowid[e]),)).fetchone()
+            if row:
+                out[e] = (table, row[0], row[1])
+        return out
+
+
+# ----------------------
+# Per-case cache
+# ----------------------
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def database_path(conn):
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+def topology_for(conn):
+    """Topology of the case in conn, loaded once per database file version.
+
+    Databases ingested before the Topology table existed are indexed on the fly.
+    """
+    path = database_path(conn)
+    mtime = os.path.getmtime(path) if path else None
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == mtime:
+            _cache.move_to_end(path)
+            inc("pw_cache_requests_total", cache="topology", result="hit")
+            return cached[1]
+    inc("pw_cache_requests_total", cache="topology", result="miss")
+    arrays = read_topology(conn) or build_arrays(conn)
+    topo = Topology(arrays)
+    if path:
+        with _cache_lock:
+            _cache[path] = (mtime, topo)
+            _cache.move_to_end(path)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return topo
@@ -1,47 +1,261 @@
-from peft import LoraConfig, get_peft_model
-from transformers import AutoTokenizer, AutoModelForCausalLM, Trainer, TrainingArguments
-from datasets import load_dataset
-
-model_id = "meta-llama/Llama-2-13b-hf"
-tokenizer = AutoTokenizer.from_pretrained(model_id)
-model = AutoModelForCausalLM.from_pretrained(model_id, device_map="auto", torch_dtype=torch.float16)
-
-lora_config = LoraConfig(
-    r=8,
-    lora_alpha=16,
-    target_modules=["q_proj", "v_proj"],
-    lora_dropout=0.05,
-    bias="none",
-    task_type="CAUSAL_LM"
-)
-model = get_peft_model(model, lora_config)
-
-dataset = load_dataset("json", data_files="training/dataset.jsonl", split="train")
-
-def preprocess(ex):
-    prompt = f"<s>[INST] <<SYS>>\\nUse this power system info.\\n<</SYS>>\\n{ex['instruction']}\\n{ex['input']} [/INST] {ex['output']}"
-    return tokenizer(prompt, padding="max_length", truncation=True, max_length=1024)
-
-tokenized = dataset.map(preprocess, batched=True)
-
-training_args = TrainingArguments(
-    output_dir="llama2_lora_out",
-    per_device_train_batch_size=1,
-    gradient_accumulation_steps=4,
-    num_train_epochs=3,
-    learning_rate=2e-5,
-    logging_steps=10,
-    save_steps=100,
-    save_total_limit=2,
-    bf16=True
-)
-
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=tokenized,
-    tokenizer=tokenizer
-)
-
-trainer.train()
-model.save_pretrained("llama2_lora_out")
+import argparse
+import bisect
+import os
+import random
+import time
+
+import numpy as np
+
+from token_cache import IGNORE_INDEX, PROMPT_TEMPLATE, build_tokenized
+
+# ----------------------
+# Config
+# ----------------------
+MODEL_ID = os.environ.get("TRAIN_MODEL_ID", "meta-llama/Llama-2-13b-hf")
+DATA_FILE = "training/dataset.jsonl"
+OUTPUT_DIR = "llama2_lora_out"
+MAX_LENGTH = 1024
+BATCH_SIZE = 4
+PAD_MULTIPLE = 8
+
+
+# ----------------------
+# Batching
+# ----------------------
+# Examples come from the token cache (token_cache.py) as memory-mapped
+# slices. "pack" fills each sequence with several examples (best fit, so
+# sequences come out nearly full) and keeps them from attending to each other
+# with a block-diagonal causal mask; position ids restart at every example,
+# so the model sees exactly what it would unpacked. "bucket" keeps one
+# example per row and lets the Trainer group rows of similar length, padding
+# each batch only to its longest row. "pad" is the old fixed-length padding,
+# kept as a baseline.
+
+class PackedDataset:
+    """Rows made of several cached examples, concatenated when a batch asks for them."""
+
+    def __init__(self, examples, bins):
+        self.examples = examples
+        self.bins = bins
+        self.lengths = np.array([examples.lengths[b].sum() for b in bins], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.bins)
+
+    def __getitem__(self, i):
+        rows = [self.examples[j] for j in self.bins[i]]
+        return {
+            "input_ids": np.concatenate([r["input_ids"] for r in rows]),
+            "labels": np.concatenate([r["labels"] for r in rows]),
+            "lengths": [len(r["input_ids"]) for r in rows],
+        }
+
+def pack_examples(examples, max_length=MAX_LENGTH, seed=0):
+    """Best-fit-decreasing packing into rows of at most max_length tokens, in shuffled order."""
+    lengths = examples.lengths.tolist()
+    bins, free = [], []   # free: sorted (remaining capacity, bin index)
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        n = lengths[i]
+        pos = bisect.bisect_left(free, (n, -1))
+        if pos < len(free):
+            remaining, b = free.pop(pos)
+        else:
+            remaining, b = max_length, len(bins)
+            bins.append([])
+        bins[b].append(i)
+        if remaining - n > 0:
+            bisect.insort(free, (remaining - n, b))
+    random.Random(seed).shuffle(bins)
+    return PackedDataset(examples, bins)
+
+def padding_efficiency(lengths, mode, batch_size=BATCH_SIZE, max_length=MAX_LENGTH):
+    """Share of real tokens in the batches a mode would produce, without building them."""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    real = int(lengths.sum())
+    if mode == "pad":
+        return real / (len(lengths) * max_length)
+    if mode == "bucket":
+        lengths = np.sort(lengths)
+    total = 0
+    for i in range(0, len(lengths), batch_size):
+        batch = lengths[i:i + batch_size]
+        total += len(batch) * -(-int(batch.max()) // PAD_MULTIPLE) * PAD_MULTIPLE
+    return real / total
+
+
+class Collator:
+    """Pads a batch to its longest row and counts real vs padded tokens for reporting.
+
+    Packed rows carry "lengths" and get a 4D additive attention mask plus
+    per-example position ids; other rows get an ordinary 2D mask.
+    """
+
+    def __init__(self, pad_id, mask_dtype=None, fixed_length=None):
+        self.pad_id = pad_id
+        self.mask_dtype = mask_dtype
+        self.fixed_length = fixed_length
+        self.real_tokens = 0
+        self.total_tokens = 0
+
+    def __call__(self, features):
+        import torch
+
+        width = self.fixed_length or -(-max(len(f["input_ids"]) for f in features) // PAD_MULTIPLE) * PAD_MULTIPLE
+        rows = len(features)
+        input_ids = torch.full((rows, width), self.pad_id, dtype=torch.long)
+        labels = torch.full((rows, width), IGNORE_INDEX, dtype=torch.long)
+        for r, f in enumerate(features):
+            n = len(f["input_ids"])
+            input_ids[r, :n] = torch.as_tensor(np.asarray(f["input_ids"], dtype=np.int64))
+            labels[r, :n] = torch.as_tensor(np.asarray(f["labels"], dtype=np.int64))
+            self.real_tokens += n
+        self.total_tokens += rows * width
+        batch = {"input_ids": input_ids, "labels": labels}
+
+        if "lengths" not in features[0]:
+            attention = torch.zeros((rows, width), dtype=torch.long)
+            for r, f in enumerate(features):
+                attention[r, :len(f["input_ids"])] = 1
+            batch["attention_mask"] = attention
+            return batch
+
+        dtype = self.mask_dtype or torch.float32
+        mask = torch.full((rows, 1, width, width), torch.finfo(dtype).min, dtype=dtype)
+        position_ids = torch.zeros((rows, width), dtype=torch.long)
+        for r, f in enumerate(features):
+            start = 0
+            for n in f["lengths"]:
+                block = mask[r, 0, start:start + n, start:start + n]
+                block.masked_fill_(torch.ones(n, n, dtype=torch.bool).tril(), 0)
+                position_ids[r, start:start + n] = torch.arange(n)
+                start += n
+            # Padding rows attend to themselves only, so no row is fully masked.
+            idx = torch.arange(start, width)
+            mask[r, 0, idx, idx] = 0
+        batch["attention_mask"] = mask
+        batch["position_ids"] = position_ids
+        return batch
+
+    def efficiency(self):
+        return self.real_tokens / self.total_tokens if self.total_tokens else 0.0
+
+
+def throughput_callback(collator):
+    from transformers import TrainerCallback
+
+    class ThroughputCallback(TrainerCallback):
+        """Prints real (non-padding) tokens/sec and padding efficiency at every log step."""
+
+        def on_train_begin(self, args, state, control, **kwargs):
+            self.start = time.perf_counter()
+
+        def on_log(self, args, state, control, logs=None, **kwargs):
+            elapsed = time.perf_counter() - self.start
+            print(f" step {state.global_step}: {collator.real_tokens / elapsed:,.0f} tokens/s, "
+                  f"padding efficiency {collator.efficiency():.1%}")
+
+    return ThroughputCallback()
+
+
+# ----------------------
+# Training
+# ----------------------
+def load_model(model_id, cpu):
+    import torch
+    from peft import LoraConfig, get_peft_model
+    from transformers import AutoModelForCausalLM
+
+    if cpu or not torch.cuda.is_available():
+        dtype, kwargs = torch.float32, {}
+    else:
+        dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        kwargs = {"device_map": "auto"}
+    # Packed batches use a custom 4D mask, which the eager and SDPA attention paths accept.
+    model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=dtype, attn_implementation="sdpa", **kwargs)
+
+    lora_config = LoraConfig(
+        r=8,
+        lora_alpha=16,
+        target_modules=["q_proj", "v_proj"],
+        lora_dropout=0.05,
+        bias="none",
+        task_type="CAUSAL_LM"
+    )
+    return get_peft_model(model, lora_config), dtype
+
+def train(args):
+    import torch
+    from transformers import AutoTokenizer, Trainer, TrainingArguments
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+    features = build_tokenized(args.data, tokenizer, PROMPT_TEMPLATE, args.max_length)
+    packed = pack_examples(features, args.max_length, args.seed)
+    print(f" Packed into {len(packed):,} sequences of up to {args.max_length} tokens")
+    for mode in ("pad", "bucket", "pack"):
+        lengths = packed.lengths if mode == "pack" else features.lengths
+        print(f"  {mode}: padding efficiency {padding_efficiency(lengths, mode, args.batch_size, args.max_length):.1%}")
+    if args.dry_run:
+        return
+
+    model, dtype = load_model(args.model, args.cpu)
+    collator = Collator(pad_id, dtype, args.max_length if args.mode == "pad" else None)
+    train_data = packed if args.mode == "pack" else features
+
+    on_gpu = not args.cpu and torch.cuda.is_available()
+    training_args = TrainingArguments(
+        output_dir=args.output_dir,
+        per_device_train_batch_size=args.batch_size,
+        gradient_accumulation_steps=args.grad_accum,
+        num_train_epochs=args.epochs,
+        max_steps=args.max_steps,
+        learning_rate=2e-5,
+        logging_steps=10,
+        save_steps=100,
+        save_total_limit=2,
+        bf16=on_gpu and dtype == torch.bfloat16,
+        fp16=on_gpu and dtype == torch.float16,
+        use_cpu=not on_gpu,
+        group_by_length=args.mode == "bucket",
+        remove_unused_columns=False,
+        seed=args.seed,
+        report_to=[],
+    )
+
+    trainer = Trainer(
+        model=model,
+        args=training_args,
+        train_dataset=train_data,
+        data_collator=collator,
+        tokenizer=tokenizer,
+        callbacks=[throughput_callback(collator)],
+    )
+
+    start = time.perf_counter()
+    trainer.train()
+    elapsed = time.perf_counter() - start
+    print(f"\n Trained on {collator.real_tokens:,} tokens in {elapsed:.1f}s "
+          f"({collator.real_tokens / elapsed:,.0f} tokens/s, padding efficiency {collator.efficiency():.1%})")
+    model.save_pretrained(args.output_dir)
+
+
+# ----------------------
+# Main
+# ----------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LoRA fine-tuning on instruction JSONL.")
+    parser.add_argument("--model", default=MODEL_ID,
+                        help="e.g. hf-internal-testing/tiny-random-LlamaForCausalLM for a quick CPU run")
+    parser.add_argument("--data", nargs="+", default=[DATA_FILE], help="JSONL files or make_dataset.py shard dirs")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--mode", choices=["pack", "bucket", "pad"], default="pack")
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--grad-accum", type=int, default=1)
+    parser.add_argument("--epochs", type=float, default=3)
+    parser.add_argument("--max-steps", type=int, default=-1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cpu", action="store_true", help="train on CPU in float32")
+    parser.add_argument("--dry-run", action="store_true", help="only tokenize and report padding efficiency")
+    train(parser.parse_args())